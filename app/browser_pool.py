@@ -0,0 +1,288 @@
+"""Pool of long-lived Chromium browsers shared across form submissions"""
+
+import asyncio
+import importlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, AsyncIterator, TYPE_CHECKING
+
+from .config import get_settings
+from .telemetry import span
+
+if TYPE_CHECKING:
+    # browser_use (and playwright) load on the first launch, not at import
+    from browser_use import Browser
+    from browser_use.browser.context import BrowserContext
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PooledBrowser:
+    """A browser owned by the pool and its usage counters"""
+    browser: "Browser"
+    launch_seconds: float
+    uses: int = 0
+    leases: int = 0
+    retiring: bool = False
+    launched_at: float = field(default_factory=time.time)
+
+
+def _read_rss_mb(pid: int) -> float:
+    """Read the resident set size of a process from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0.0
+
+
+class BrowserPool:
+    """
+    Keeps a small number of Chromium processes alive between jobs
+
+    Each lease gets a fresh, isolated browser context (own cookies and
+    storage) on one of the pooled browsers. A browser is recycled once it
+    has served `max_uses` leases or its process tree grows beyond
+    `max_memory_mb`.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        contexts_per_browser: int,
+        max_uses: int,
+        max_memory_mb: int,
+        headless: bool = True,
+    ):
+        self.size = max(1, size)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.headless = headless
+
+        self._browsers: List[PooledBrowser] = []
+        self._launching = 0
+        self._cond = asyncio.Condition()
+        self._closed = False
+        self._background: set = set()
+        # Set once start() has finished (pre-warmed or not); see /ready
+        self.warm = False
+
+        # Stats
+        self.launches = 0
+        self.recycled = 0
+        self.last_launch_ms: Optional[float] = None
+        self._total_launch_ms = 0.0
+
+    async def start(self, prewarm: bool = True) -> None:
+        """Launch browsers up front so the first jobs skip the cold start"""
+        if not prewarm:
+            self.warm = True
+            return
+        # Counted as launching so leases taken meanwhile wait for these browsers
+        self._launching += self.size
+        try:
+            results = await asyncio.gather(
+                *(self._launch() for _ in range(self.size)),
+                return_exceptions=True,
+            )
+        finally:
+            self._launching -= self.size
+        async with self._cond:
+            for result in results:
+                if isinstance(result, PooledBrowser):
+                    self._browsers.append(result)
+                else:
+                    logger.error(f"Browser pre-warm failed: {result}")
+            self._cond.notify_all()
+        self.warm = True
+        logger.info(f"Browser pool pre-warmed: {len(self._browsers)}/{self.size} browsers")
+
+    async def close(self) -> None:
+        """Close every pooled browser"""
+        async with self._cond:
+            self._closed = True
+            browsers, self._browsers = self._browsers, []
+            self._cond.notify_all()
+        await asyncio.gather(*(self._close_browser(b) for b in browsers), return_exceptions=True)
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        logger.info("Browser pool closed")
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator["BrowserContext"]:
+        """
+        Lease an isolated browser context
+
+        Yields:
+            browser-use BrowserContext; it is closed when the block exits
+        """
+        with span("browser_lease"):
+            pooled = await self._acquire()
+            context = await pooled.browser.new_context()
+        try:
+            yield context
+        finally:
+            try:
+                await context.close()
+            except Exception as e:
+                logger.debug(f"Failed to close leased context: {e}")
+            await self._release(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool statistics for /health"""
+        busy = sum(1 for b in self._browsers if b.leases > 0)
+        return {
+            "warm": self.warm,
+            "size": self.size,
+            "browsers": len(self._browsers),
+            "idle": len(self._browsers) - busy,
+            "busy": busy,
+            "active_leases": sum(b.leases for b in self._browsers),
+            "launches": self.launches,
+            "recycled": self.recycled,
+            "last_launch_ms": self.last_launch_ms,
+            "avg_launch_ms": (
+                round(self._total_launch_ms / self.launches, 1) if self.launches else None
+            ),
+        }
+
+    def _pick(self) -> Optional[PooledBrowser]:
+        candidates = [
+            b for b in self._browsers
+            if not b.retiring
+            and b.leases < self.contexts_per_browser
+            and self._is_connected(b)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda b: b.leases)
+
+    async def _acquire(self) -> PooledBrowser:
+        while True:
+            async with self._cond:
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+
+                self._retire_disconnected()
+                pooled = self._pick()
+                if pooled is not None:
+                    pooled.leases += 1
+                    return pooled
+
+                if len(self._browsers) + self._launching >= self.size:
+                    await self._cond.wait()
+                    continue
+                self._launching += 1
+
+            # Launch outside the lock so other leases are not blocked
+            try:
+                pooled = await self._launch()
+            finally:
+                async with self._cond:
+                    self._launching -= 1
+                    self._cond.notify_all()
+
+            async with self._cond:
+                self._browsers.append(pooled)
+                self._cond.notify_all()
+
+    async def _release(self, pooled: PooledBrowser) -> None:
+        pooled.uses += 1
+        if not pooled.retiring:
+            if pooled.uses >= self.max_uses:
+                logger.info(f"Recycling browser after {pooled.uses} uses")
+                pooled.retiring = True
+            elif self.max_memory_mb > 0:
+                rss = await self._memory_mb(pooled)
+                if rss > self.max_memory_mb:
+                    logger.info(f"Recycling browser at {rss:.0f}MB RSS")
+                    pooled.retiring = True
+
+        async with self._cond:
+            pooled.leases -= 1
+            if pooled.retiring and pooled.leases == 0 and pooled in self._browsers:
+                self._browsers.remove(pooled)
+                self.recycled += 1
+                self._spawn(self._close_browser(pooled))
+            self._cond.notify_all()
+
+    def _retire_disconnected(self) -> None:
+        for pooled in list(self._browsers):
+            if not self._is_connected(pooled) and pooled.leases == 0:
+                logger.warning("Dropping disconnected browser from pool")
+                self._browsers.remove(pooled)
+                self.recycled += 1
+                self._spawn(self._close_browser(pooled))
+
+    @staticmethod
+    def _is_connected(pooled: PooledBrowser) -> bool:
+        pw_browser = pooled.browser.playwright_browser
+        return pw_browser is not None and pw_browser.is_connected()
+
+    async def _launch(self) -> PooledBrowser:
+        # The first import takes seconds; keep the event loop (and /health) responsive
+        browser_use = await asyncio.to_thread(importlib.import_module, "browser_use")
+
+        started = time.perf_counter()
+        browser = browser_use.Browser(config=browser_use.BrowserConfig(headless=self.headless))
+        await browser.get_playwright_browser()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.launches += 1
+        self.last_launch_ms = round(elapsed_ms, 1)
+        self._total_launch_ms += elapsed_ms
+        logger.info(f"Launched pooled browser in {elapsed_ms:.0f}ms")
+        return PooledBrowser(browser=browser, launch_seconds=elapsed_ms / 1000)
+
+    async def _close_browser(self, pooled: PooledBrowser) -> None:
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.debug(f"Failed to close pooled browser: {e}")
+
+    async def _memory_mb(self, pooled: PooledBrowser) -> float:
+        """Sum the RSS of all Chromium processes belonging to a browser"""
+        pw_browser = pooled.browser.playwright_browser
+        if pw_browser is None:
+            return 0.0
+        try:
+            session = await pw_browser.new_browser_cdp_session()
+            try:
+                info = await session.send("SystemInfo.getProcessInfo")
+            finally:
+                await session.detach()
+        except Exception as e:
+            logger.debug(f"Could not read browser process info: {e}")
+            return 0.0
+        return sum(_read_rss_mb(proc["id"]) for proc in info.get("processInfo", []))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+
+# Singleton instance
+_browser_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Get or create BrowserPool singleton"""
+    global _browser_pool
+    if _browser_pool is None:
+        settings = get_settings()
+        _browser_pool = BrowserPool(
+            size=settings.browser_pool_size,
+            contexts_per_browser=settings.browser_contexts_per_browser,
+            max_uses=settings.browser_max_uses,
+            max_memory_mb=settings.browser_max_memory_mb,
+            headless=settings.headless,
+        )
+    return _browser_pool
@@ -0,0 +1,158 @@
+"""Bulk ingestion: CSV/JSONL rows in, JSONL results out, in input order"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import tempfile
+from collections import deque
+from typing import Optional, Iterator, AsyncIterator, Tuple, Union, Dict, Any, IO, Deque
+
+from pydantic import ValidationError
+
+from .models import FormSubmissionStatus, FormSubmissionRequest, FormSubmissionResponse
+from .executor import BatchExecutor
+from .idempotency import key_for
+from .retry import FailureClass
+
+logger = logging.getLogger(__name__)
+
+# Uploads larger than this are spooled to disk instead of memory
+SPOOL_MAX_BYTES = 1024 * 1024
+
+Row = Union[FormSubmissionRequest, FormSubmissionResponse]
+
+
+def detect_format(content_type: Optional[str], format: Optional[str] = None) -> str:
+    """'csv' or 'jsonl' from an explicit format or the Content-Type header"""
+    if format:
+        return "csv" if format.lower() == "csv" else "jsonl"
+    return "csv" if "csv" in (content_type or "").lower() else "jsonl"
+
+
+def _invalid(raw: Dict[str, Any], error: str) -> FormSubmissionResponse:
+    return FormSubmissionResponse(
+        status=FormSubmissionStatus.ERROR,
+        url=str(raw.get("url") or ""),
+        message="Invalid row",
+        details=f"入力行が不正です: {error}",
+        tokens_used=0,
+        cost_estimate=0.0,
+        failure_class=FailureClass.PERMANENT.value,
+    )
+
+
+def _validate(raw: Dict[str, Any]) -> Row:
+    # Empty CSV cells mean "use the default", not an empty override
+    fields = {k: v for k, v in raw.items() if k in FormSubmissionRequest.model_fields and v not in ("", None)}
+    try:
+        return FormSubmissionRequest(**fields)
+    except ValidationError as e:
+        errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+        return _invalid(raw, errors)
+
+
+def parse_rows(stream: IO[bytes], format: str) -> Iterator[Row]:
+    """
+    Validate rows one at a time
+
+    JSONL rows are objects with the FormSubmissionRequest fields (extra
+    keys are ignored, blank lines skipped); CSV rows take them from a
+    header line. Invalid rows are yielded as error responses so every
+    input row gets exactly one output line.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="" if format == "csv" else None)
+    if format == "csv":
+        for raw in csv.DictReader(text):
+            yield _validate(raw)
+        return
+
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield _invalid({}, f"JSON: {e.msg}")
+        else:
+            if isinstance(raw, dict):
+                yield _validate(raw)
+            else:
+                yield _invalid({}, "not a JSON object")
+
+
+async def spool(chunks: AsyncIterator[bytes]) -> IO[bytes]:
+    """Copy a request body into a temporary file (memory up to SPOOL_MAX_BYTES, disk beyond)"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    async for chunk in chunks:
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+def _line(index: int, result: FormSubmissionResponse) -> str:
+    return json.dumps({"index": index, **result.model_dump(mode="json")}, ensure_ascii=False) + "\n"
+
+
+async def stream_results(
+    rows: Iterator[Row],
+    executor: BatchExecutor,
+    window: int,
+    idempotency_key: Optional[str] = None,
+    heartbeat: float = 15.0,
+) -> AsyncIterator[str]:
+    """
+    Run rows through the executor and yield one JSONL line per row, in input order
+
+    At most `window` rows are read ahead of the oldest unfinished one, so
+    memory stays flat however long the input is; the executor's worker,
+    per-domain and rate limits decide how many of them actually run.
+    Heartbeat lines ({"event": "heartbeat"}) keep idle connections open
+    while the head row is still running.
+    """
+    pending: Deque[Tuple[int, asyncio.Future]] = deque()
+    rows = iter(rows)
+    index = 0
+    exhausted = False
+
+    async def run(request: FormSubmissionRequest, position: int) -> FormSubmissionResponse:
+        try:
+            return await executor.run_one(request, idempotency_key=key_for(request, idempotency_key, position))
+        except Exception as e:
+            logger.error(f"Bulk row {position} failed: {e}")
+            return FormSubmissionResponse(
+                status=FormSubmissionStatus.ERROR,
+                url=str(request.url),
+                message=f"Error: {str(e)}",
+                details=f"エラーが発生しました: {str(e)}",
+            )
+
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                row = next(rows, None)
+                if row is None:
+                    exhausted = True
+                    break
+                if isinstance(row, FormSubmissionRequest):
+                    future = asyncio.ensure_future(run(row, index))
+                else:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result(row)
+                pending.append((index, future))
+                index += 1
+            if not pending:
+                return
+
+            position, head = pending[0]
+            done, _ = await asyncio.wait({head}, timeout=heartbeat)
+            if not done:
+                yield json.dumps({"event": "heartbeat"}) + "\n"
+                continue
+            pending.popleft()
+            yield _line(position, head.result())
+    finally:
+        # Client went away: stop the rows that are still queued or running
+        for _, future in pending:
+            future.cancel()
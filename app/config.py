@@ -28,6 +28,17 @@ class Settings:
         # Model Configuration
         self.default_model = os.environ.get("DEFAULT_MODEL", "claude-haiku-4-5-20251001")
         self.complex_model = os.environ.get("COMPLEX_MODEL", "claude-sonnet-4-5-20250514")
+        # JSON price overrides in USD per 1M tokens, keyed by model name prefix
+        self.model_prices = os.environ.get("MODEL_PRICES", "")
+        # Model routing: start forms with at least this many visible fields on
+        # COMPLEX_MODEL, and escalate a DEFAULT_MODEL run after this many failed
+        # agent steps (0 disables escalation)
+        self.router_field_threshold = int(os.environ.get("ROUTER_FIELD_THRESHOLD", "15"))
+        self.router_escalate_after = int(os.environ.get("ROUTER_ESCALATE_AFTER", "2"))
+        # Model that last succeeded per domain
+        self.model_router_db_path = os.environ.get("MODEL_ROUTER_DB_PATH", "/tmp/formai/model_routes.db")
+        # Mark the system prompt and fixed task prefix for Anthropic prompt caching
+        self.prompt_caching_enabled = os.environ.get("PROMPT_CACHING_ENABLED", "true").lower() == "true"
 
         # Sender Information
         self.company_name = os.environ.get("COMPANY_NAME", "RECHANCE株式会社")
@@ -41,7 +52,127 @@ class Settings:
 
         # Browser Configuration
         self.headless = os.environ.get("HEADLESS", "true").lower() == "true"
-        self.timeout = int(os.environ.get("TIMEOUT", "60000"))
+        self.timeout = int(os.environ.get("TIMEOUT", "60000"))  # ms, also the navigation phase deadline
+
+        # Run Policy Configuration (per submission; keep RUN_BUDGET_SECONDS below JOB_TIMEOUT)
+        self.agent_max_steps = int(os.environ.get("AGENT_MAX_STEPS", "25"))
+        self.run_budget_seconds = float(os.environ.get("RUN_BUDGET_SECONDS", "240"))
+        self.phase_discovery_seconds = float(os.environ.get("PHASE_DISCOVERY_SECONDS", "90"))
+        self.phase_fill_seconds = float(os.environ.get("PHASE_FILL_SECONDS", "120"))
+        self.phase_submit_seconds = float(os.environ.get("PHASE_SUBMIT_SECONDS", "90"))
+
+        # Job Memory: "compact" keeps only the last screenshot and a step summary of the
+        # agent history ("full" keeps everything); JOB_MAX_MEMORY_MB caps page JS heap plus
+        # retained history per job (0 disables)
+        self.agent_history_retention = os.environ.get("AGENT_HISTORY_RETENTION", "compact").lower()
+        self.job_max_memory_mb = float(os.environ.get("JOB_MAX_MEMORY_MB", "512"))
+        # Final-page JPEG screenshots: never, failure or always
+        self.screenshots = os.environ.get("SCREENSHOTS", "failure").lower()
+        self.screenshot_dir = os.environ.get("SCREENSHOT_DIR", "/tmp/formai/screenshots")
+        self.screenshot_quality = int(os.environ.get("SCREENSHOT_QUALITY", "60"))
+        self.screenshot_retention_hours = float(os.environ.get("SCREENSHOT_RETENTION_HOURS", "72"))
+
+        # Batch Execution Configuration
+        self.batch_max_workers = int(os.environ.get("BATCH_MAX_WORKERS", "4"))
+        self.batch_per_domain_limit = int(os.environ.get("BATCH_PER_DOMAIN_LIMIT", "1"))
+        # Rows /api/bulk-submit reads ahead of the oldest unfinished one
+        self.bulk_window = int(os.environ.get("BULK_WINDOW", "50"))
+
+        # Retry Policy: transient failures (navigation timeouts, browser crashes) rerun the
+        # job in a fresh browser context; API overloads are retried per LLM call
+        self.retry_max_attempts = int(os.environ.get("RETRY_MAX_ATTEMPTS", "3"))
+        self.retry_backoff_seconds = float(os.environ.get("RETRY_BACKOFF_SECONDS", "2"))
+        self.retry_max_backoff_seconds = float(os.environ.get("RETRY_MAX_BACKOFF_SECONDS", "30"))
+        self.llm_retry_attempts = int(os.environ.get("LLM_RETRY_ATTEMPTS", "5"))
+        self.llm_retry_max_backoff_seconds = float(os.environ.get("LLM_RETRY_MAX_BACKOFF_SECONDS", "30"))
+
+        # Per-domain Rate Limiting (keyed on the registrable domain, e.g. example.co.jp)
+        self.rate_limit_enabled = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self.rate_limit_per_minute = float(os.environ.get("RATE_LIMIT_PER_MINUTE", "6"))
+        self.rate_limit_burst = int(os.environ.get("RATE_LIMIT_BURST", "2"))
+        self.rate_limit_min_interval = float(os.environ.get("RATE_LIMIT_MIN_INTERVAL", "5"))
+        self.rate_limit_backoff_seconds = float(os.environ.get("RATE_LIMIT_BACKOFF_SECONDS", "30"))
+        self.rate_limit_max_backoff_seconds = float(os.environ.get("RATE_LIMIT_MAX_BACKOFF_SECONDS", "600"))
+        self.job_timeout = float(os.environ.get("JOB_TIMEOUT", "300"))
+
+        # Browser Pool Configuration
+        self.browser_pool_size = int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+        self.browser_contexts_per_browser = int(os.environ.get("BROWSER_CONTEXTS_PER_BROWSER", "2"))
+        self.browser_max_uses = int(os.environ.get("BROWSER_MAX_USES", "50"))
+        self.browser_max_memory_mb = int(os.environ.get("BROWSER_MAX_MEMORY_MB", "1024"))
+        self.browser_pool_prewarm = os.environ.get("BROWSER_POOL_PREWARM", "true").lower() == "true"
+
+        # Job Queue Configuration
+        self.jobs_db_path = os.environ.get("JOBS_DB_PATH", "/tmp/formai/jobs.db")
+        self.job_workers = int(os.environ.get("JOB_WORKERS", str(self.batch_max_workers)))
+
+        # Worker Mode: the API only queues jobs in JOBS_DB_PATH; `python -m app.worker`
+        # processes (WORKER_PROCESSES of them started by start.py) run them
+        self.worker_processes = int(os.environ.get("WORKER_PROCESSES", "0"))
+        self.worker_mode = (
+            os.environ.get("WORKER_MODE", "false").lower() == "true" or self.worker_processes > 0
+        )
+        self.worker_lease_seconds = float(os.environ.get("WORKER_LEASE_SECONDS", "60"))
+        self.worker_poll_interval = float(os.environ.get("WORKER_POLL_INTERVAL", "0.5"))
+
+        # Form Plan Cache Configuration
+        self.form_cache_enabled = os.environ.get("FORM_CACHE_ENABLED", "true").lower() == "true"
+        self.form_cache_path = os.environ.get("FORM_CACHE_PATH", "/tmp/formai/form_plans.db")
+        self.form_cache_ttl_hours = float(os.environ.get("FORM_CACHE_TTL_HOURS", "720"))
+        self.form_cache_max_entries = int(os.environ.get("FORM_CACHE_MAX_ENTRIES", "5000"))
+
+        # Heuristic Filler Configuration
+        self.heuristic_filler_enabled = os.environ.get("HEURISTIC_FILLER_ENABLED", "true").lower() == "true"
+        self.heuristic_min_confidence = float(os.environ.get("HEURISTIC_MIN_CONFIDENCE", "0.75"))
+        # Form builder templates (CF7, MW WP Form, HubSpot, formrun, Google Forms): the builder's
+        # markup settles field roles, so a lower confidence is enough
+        self.form_templates_enabled = os.environ.get("FORM_TEMPLATES_ENABLED", "true").lower() == "true"
+        self.form_template_min_confidence = float(os.environ.get("FORM_TEMPLATE_MIN_CONFIDENCE", "0.6"))
+
+        # Resource Blocking: agent browsers skip images, media, fonts and trackers
+        # (CAPTCHA widgets and embedded form providers are always allowed)
+        self.resource_blocking_enabled = os.environ.get("RESOURCE_BLOCKING_ENABLED", "true").lower() == "true"
+        self.resource_block_types = tuple(
+            t.strip() for t in os.environ.get("RESOURCE_BLOCK_TYPES", "image,media,font").split(",") if t.strip()
+        )
+        self.resource_block_trackers = os.environ.get("RESOURCE_BLOCK_TRACKERS", "true").lower() == "true"
+
+        # DOM Condensation: the agent reads only the form region or contact links
+        # (full page below DOM_CONDENSATION_MIN_CONFIDENCE)
+        self.dom_condensation_enabled = os.environ.get("DOM_CONDENSATION_ENABLED", "true").lower() == "true"
+        self.dom_condensation_min_confidence = float(os.environ.get("DOM_CONDENSATION_MIN_CONFIDENCE", "0.6"))
+
+        # Submission Verification: one cheap DEFAULT_MODEL call for pages that stay ambiguous
+        self.verify_llm_enabled = os.environ.get("VERIFY_LLM_ENABLED", "true").lower() == "true"
+
+        # HTTP Client Configuration (pre-flight checks and other non-browser fetches)
+        self.http_timeout = float(os.environ.get("HTTP_TIMEOUT", "15"))
+        self.http_max_connections = int(os.environ.get("HTTP_MAX_CONNECTIONS", "50"))
+        # Concurrent pre-flight/discovery fetches per registrable domain
+        self.http_per_site_limit = int(os.environ.get("HTTP_PER_SITE_LIMIT", "2"))
+
+        # Pre-flight Screening Configuration
+        self.preflight_enabled = os.environ.get("PREFLIGHT_ENABLED", "true").lower() == "true"
+        self.preflight_timeout = float(os.environ.get("PREFLIGHT_TIMEOUT", "10"))
+        self.preflight_concurrency = int(os.environ.get("PREFLIGHT_CONCURRENCY", "20"))
+
+        # Contact Discovery: homepage rows start on the contact form page found over plain HTTP
+        self.discovery_enabled = os.environ.get("DISCOVERY_ENABLED", "true").lower() == "true"
+        self.discovery_timeout = float(os.environ.get("DISCOVERY_TIMEOUT", "10"))
+        self.discovery_concurrency = int(os.environ.get("DISCOVERY_CONCURRENCY", "20"))
+        self.discovery_max_candidates = int(os.environ.get("DISCOVERY_MAX_CANDIDATES", "5"))
+        self.discovery_min_score = int(os.environ.get("DISCOVERY_MIN_SCORE", "4"))
+        self.discovery_db_path = os.environ.get("DISCOVERY_DB_PATH", "/tmp/formai/discovery.db")
+        self.discovery_cache_ttl_hours = float(os.environ.get("DISCOVERY_CACHE_TTL_HOURS", "168"))
+
+        # Idempotency: repeated submissions of the same message to the same form are answered once
+        self.idempotency_enabled = os.environ.get("IDEMPOTENCY_ENABLED", "true").lower() == "true"
+        self.idempotency_db_path = os.environ.get("IDEMPOTENCY_DB_PATH", "/tmp/formai/idempotency.db")
+        self.idempotency_retention_hours = float(os.environ.get("IDEMPOTENCY_RETENTION_HOURS", "168"))
+
+        # Telemetry: per-job span timelines kept in memory for GET /api/traces/{job_id}
+        self.tracing_enabled = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+        self.trace_retention = int(os.environ.get("TRACE_RETENTION", "1000"))
 
 
 @lru_cache()
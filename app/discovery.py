@@ -0,0 +1,400 @@
+"""Contact-form discovery: find the form page of a site from its homepage over plain HTTP"""
+
+import asyncio
+import codecs
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Optional, List, Dict, Tuple
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+from .config import get_settings
+from .form_cache import domain_key
+from .http_client import get_http_client
+from .rate_limiter import get_site_slots, registrable_domain
+from .verification import FORM_PROVIDER_HOSTS
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 2 * 1024 * 1024
+MAX_SITEMAPS = 3
+
+# <meta charset="Shift_JIS">, <meta http-equiv="Content-Type" content="text/html; charset=EUC-JP">
+# or an XML declaration; looked for in the first bytes only, as browsers do
+META_CHARSET = re.compile(
+    rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)|<\?xml[^>]+encoding\s*=\s*["']([\w.:-]+)""",
+    re.IGNORECASE,
+)
+CHARSET_SNIFF_BYTES = 4096
+# Labels browsers decode with a superset (WHATWG encoding standard)
+CHARSET_ALIASES = {"shift_jis": "cp932", "iso-8859-1": "cp1252"}
+
+# Inputs whose path is a site root ("/", "/index.html", "/ja/") get discovered;
+# anything deeper is taken to be the form page already
+HOMEPAGE_PATH = re.compile(r"^/?(?:(?:ja|jp|en)/?)?(?:index\.\w+)?$", re.IGNORECASE)
+
+# Probed directly when the homepage and sitemap give nothing better
+COMMON_PATHS = ("/contact/", "/inquiry/", "/contact-us/", "/otoiawase/", "/toiawase/", "/form/")
+
+CONTACT_TEXT = re.compile(r"お問い?合わ?せ|問合せ|お問合わせ|contact|inquiry|enquiry", re.IGNORECASE)
+SOFT_TEXT = re.compile(r"ご相談|相談|資料請求|見積|フォーム|form", re.IGNORECASE)
+CONTACT_PATH = re.compile(r"contact|inquiry|enquiry|toiawase|otoiawase|/form", re.IGNORECASE)
+# Forms that are not the general inquiry form
+OTHER_PURPOSE = re.compile(
+    r"recruit|career|採用|求人|entry|faq|privacy|プライバシー|login|ログイン|signin|cart|shop|mypage|newsletter|メルマガ",
+    re.IGNORECASE,
+)
+PLUGIN_MARKUP = re.compile(
+    r"wpcf7|mw_wp_form|hs-form|hbspt\.forms|formrun|snow-monkey-form|trust-form|mailform|form-mailer",
+    re.IGNORECASE,
+)
+TEXT_INPUT_TYPES = ("", "text", "email", "tel", "url", "number")
+
+
+def is_homepage(url: str) -> bool:
+    return bool(HOMEPAGE_PATH.match(urlparse(url).path or "/"))
+
+
+def _body_encoding(body: bytes, declared: Optional[str]) -> str:
+    """Charset from the Content-Type header, else the document's own declaration, else UTF-8"""
+    match = META_CHARSET.search(body[:CHARSET_SNIFF_BYTES])
+    sniffed = (match.group(1) or match.group(2)).decode("ascii", errors="ignore") if match else None
+    for label in (declared, sniffed):
+        if not label:
+            continue
+        try:
+            name = codecs.lookup(label.strip()).name
+        except LookupError:
+            continue
+        return CHARSET_ALIASES.get(name, name)
+    return "utf-8"
+
+
+class PageScan(HTMLParser):
+    """Links and form markup of one HTML document"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links: List[Tuple[str, str]] = []
+        self.textareas = 0
+        self.text_inputs = 0
+        self.provider_iframes = 0
+        self._href: Optional[str] = None
+        self._text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: v or "" for k, v in attrs}
+        if tag == "a" and attrs.get("href"):
+            self._href = attrs["href"]
+            self._text = [attrs.get("title", ""), attrs.get("aria-label", "")]
+        elif tag == "img" and self._href is not None:
+            self._text.append(attrs.get("alt", ""))
+        elif tag == "textarea":
+            self.textareas += 1
+        elif tag == "input" and attrs.get("type", "").lower() in TEXT_INPUT_TYPES:
+            if attrs.get("name", "").lower() not in ("q", "s", "search", "keyword"):
+                self.text_inputs += 1
+        elif tag == "iframe" and any(host in attrs.get("src", "") for host in FORM_PROVIDER_HOSTS):
+            self.provider_iframes += 1
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._href is not None:
+            self.links.append((self._href, " ".join(" ".join(self._text).split())))
+            self._href = None
+
+
+def scan(html: str) -> PageScan:
+    parser = PageScan()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        logger.debug(f"HTML parse stopped early: {e}")
+    return parser
+
+
+def link_score(url: str, text: str = "") -> int:
+    """How strongly a link's text and path point at the general contact form"""
+    path = urlparse(url).path + "?" + urlparse(url).query
+    if OTHER_PURPOSE.search(path) or OTHER_PURPOSE.search(text):
+        return -3
+    score = 0
+    if CONTACT_TEXT.search(text):
+        score += 3
+    elif SOFT_TEXT.search(text):
+        score += 1
+    if CONTACT_PATH.search(path):
+        score += 2
+    return score
+
+
+def markup_score(html: str, page: Optional[PageScan] = None) -> int:
+    """How much a page looks like a contact form (0 for no form at all)"""
+    page = page or scan(html)
+    score = 0
+    if page.textareas:
+        score += 4
+    if page.text_inputs >= 3:
+        score += 2
+    if page.provider_iframes:
+        score += 4
+    if PLUGIN_MARKUP.search(html):
+        score += 3
+    return score
+
+
+@dataclass
+class Candidate:
+    url: str
+    source: str
+    score: int = 0
+
+
+@dataclass
+class DiscoveryResult:
+    """Where a job should start"""
+    url: str
+    target_url: Optional[str] = None
+    score: int = 0
+    source: Optional[str] = None
+    cached: bool = False
+    elapsed_ms: float = 0.0
+    candidates: List[Candidate] = field(default_factory=list)
+
+    @property
+    def start_url(self) -> str:
+        return self.target_url or self.url
+
+
+class ContactDiscovery:
+    """
+    Finds the contact form page of sites given by their homepage
+
+    Candidates come from the homepage's links, the sitemap and a few
+    common paths; they are ranked by link text and path, and the best
+    few are fetched and scored by their form markup. The winner is
+    cached per host (SQLite, misses included) so later rows for the same
+    site, in this batch or the next, skip the crawl. Concurrent lookups
+    for one host share a single crawl.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float,
+        timeout: float,
+        concurrency: int,
+        max_candidates: int,
+        min_score: int,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.max_candidates = max(1, max_candidates)
+        self.min_score = min_score
+        self.hits = 0
+        self.misses = 0
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS contact_urls (
+                key TEXT PRIMARY KEY,
+                target_url TEXT,
+                score INTEGER NOT NULL,
+                source TEXT,
+                discovered_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _lookup(self, key: str) -> Optional[DiscoveryResult]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT target_url, score, source, discovered_at FROM contact_urls WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[3] > self.ttl_seconds:
+            return None
+        return DiscoveryResult(url="", target_url=row[0], score=row[1], source=row[2], cached=True)
+
+    def _store(self, key: str, result: DiscoveryResult) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contact_urls (key, target_url, score, source, discovered_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, result.target_url, result.score, result.source, time.time()),
+            )
+            self._conn.commit()
+
+    async def discover(self, url: str) -> DiscoveryResult:
+        """Start URL for a job; non-homepage inputs are returned unchanged"""
+        if not is_homepage(url):
+            return DiscoveryResult(url=url)
+        started = time.perf_counter()
+        key = domain_key(url)
+
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            self.hits += 1
+            cached.url = url
+            return cached
+
+        future = self._inflight.get(key)
+        if future is None:
+            self.misses += 1
+            future = self._inflight[key] = asyncio.ensure_future(self._crawl(url))
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            try:
+                found = await asyncio.shield(future)
+            except Exception as e:
+                logger.info(f"Contact discovery failed for {url}: {e}")
+                return DiscoveryResult(url=url)
+            await asyncio.to_thread(self._store, key, found)
+        else:
+            try:
+                found = await asyncio.shield(future)
+            except Exception:
+                return DiscoveryResult(url=url)
+
+        result = DiscoveryResult(
+            url=url,
+            target_url=found.target_url,
+            score=found.score,
+            source=found.source,
+            candidates=found.candidates,
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+        if result.target_url:
+            logger.info(f"Discovered contact form for {url}: {result.target_url} ({result.source}, score {result.score})")
+        return result
+
+    async def discover_many(self, urls: List[str]) -> Dict[str, DiscoveryResult]:
+        """Discover concurrently (duplicates are crawled once)"""
+        unique = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(self.discover(url) for url in unique))
+        return dict(zip(unique, results))
+
+    async def _fetch(self, url: str) -> Optional[Tuple[str, str]]:
+        """(final URL, text) of a successful text response, None otherwise"""
+        async with get_site_slots().hold(url), self._slots:
+            try:
+                async with get_http_client().stream("GET", url, timeout=self.timeout) as response:
+                    if response.status_code >= 400:
+                        return None
+                    content_type = response.headers.get("content-type", "")
+                    if content_type and not any(t in content_type for t in ("html", "xml")):
+                        return None
+                    buffer = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        buffer.extend(chunk)
+                        if len(buffer) >= MAX_BODY_BYTES:
+                            break
+                    body = bytes(buffer)
+                    return str(response.url), body.decode(_body_encoding(body, response.charset_encoding), errors="replace")
+            except httpx.HTTPError as e:
+                logger.debug(f"Discovery fetch failed for {url}: {e.__class__.__name__}")
+                return None
+
+    def _eligible(self, site: str, url: str) -> bool:
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            return False
+        host = (parsed.hostname or "").lower()
+        return registrable_domain(url) == site or any(p in host for p in FORM_PROVIDER_HOSTS)
+
+    async def _sitemap_urls(self, root: str) -> List[str]:
+        fetched = await self._fetch(urljoin(root, "/sitemap.xml"))
+        if fetched is None:
+            return []
+        locs = re.findall(r"<loc>\s*([^<\s]+)\s*</loc>", fetched[1])
+        if "<sitemapindex" not in fetched[1]:
+            return locs
+        nested = await asyncio.gather(*(self._fetch(loc) for loc in locs[:MAX_SITEMAPS]))
+        return [loc for page in nested if page for loc in re.findall(r"<loc>\s*([^<\s]+)\s*</loc>", page[1])]
+
+    async def _crawl(self, url: str) -> DiscoveryResult:
+        site = registrable_domain(url)
+        homepage, sitemap = await asyncio.gather(self._fetch(url), self._sitemap_urls(url))
+
+        candidates: Dict[str, Candidate] = {}
+
+        def add(link: str, source: str, score: int) -> None:
+            link = link.split("#")[0]
+            if score <= 0 or not self._eligible(site, link):
+                return
+            if link not in candidates or candidates[link].score < score:
+                candidates[link] = Candidate(link, source, score)
+
+        base = url
+        if homepage is not None:
+            base, html = homepage
+            page = scan(html)
+            if markup_score(html, page) >= self.min_score and page.textareas:
+                # The homepage carries the form itself
+                return DiscoveryResult(url=url, target_url=base, score=markup_score(html, page), source="homepage")
+            for href, text in page.links:
+                link = urljoin(base, href)
+                add(link, "link", link_score(link, text))
+        for loc in sitemap:
+            add(loc, "sitemap", link_score(loc))
+        if not candidates:
+            for path in COMMON_PATHS:
+                add(urljoin(base, path), "path", 1)
+
+        ranked = sorted(candidates.values(), key=lambda c: c.score, reverse=True)[: self.max_candidates]
+        pages = await asyncio.gather(*(self._fetch(c.url) for c in ranked))
+        scored: List[Candidate] = []
+        for candidate, page in zip(ranked, pages):
+            if page is None:
+                continue
+            final_url, html = page
+            scored.append(Candidate(final_url, candidate.source, candidate.score + markup_score(html)))
+        scored.sort(key=lambda c: c.score, reverse=True)
+
+        if scored and scored[0].score >= self.min_score:
+            best = scored[0]
+            return DiscoveryResult(url=url, target_url=best.url, score=best.score, source=best.source, candidates=scored)
+        return DiscoveryResult(url=url, candidates=scored)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM contact_urls").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses, "in_flight": len(self._inflight)}
+
+
+# Singleton instance
+_contact_discovery: Optional[ContactDiscovery] = None
+
+
+def get_contact_discovery() -> ContactDiscovery:
+    """Get or create ContactDiscovery singleton"""
+    global _contact_discovery
+    if _contact_discovery is None:
+        settings = get_settings()
+        _contact_discovery = ContactDiscovery(
+            path=settings.discovery_db_path,
+            ttl_seconds=settings.discovery_cache_ttl_hours * 3600,
+            timeout=settings.discovery_timeout,
+            concurrency=settings.discovery_concurrency,
+            max_candidates=settings.discovery_max_candidates,
+            min_score=settings.discovery_min_score,
+        )
+    return _contact_discovery
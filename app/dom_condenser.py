@@ -0,0 +1,233 @@
+"""DOM condensation: show the agent the form (or the way to it), not the whole page"""
+
+import dataclasses
+import logging
+import re
+from dataclasses import dataclass
+from typing import Optional, List, Any, Iterator
+
+from browser_use.dom.views import DOMBaseNode, DOMElementNode, DOMTextNode
+
+from .models import CondensationStep, CondensationReport
+
+logger = logging.getLogger(__name__)
+
+# browser-use's own estimate for page-state text
+CHARS_PER_TOKEN = 3
+
+FILLABLE_TAGS = ("input", "textarea", "select")
+NON_FILLABLE_TYPES = ("hidden", "submit", "button", "image", "reset", "checkbox", "radio", "file", "search")
+SEARCH_NAMES = ("q", "s", "search", "keyword", "keywords", "query")
+
+FORM_HINT_PATTERN = re.compile(
+    r"contact|inquiry|enquiry|toiawase|otoiawase|wpcf7|mw_wp_form|hs-form|hbspt|formrun|お問い?合わせ|問合せ",
+    re.IGNORECASE,
+)
+SEARCH_HINT_PATTERN = re.compile(r"search|検索|[?&]s=", re.IGNORECASE)
+CONTACT_LINK_PATTERN = re.compile(
+    r"お問い?合わ?せ|問合せ|お問合わせ|ご相談|資料請求|contact|inquiry|enquiry|toiawase|otoiawase",
+    re.IGNORECASE,
+)
+
+FORM_NOTE = (
+    "[Condensed page: only the contact form region is listed. "
+    "Other elements are omitted but still present on the page.]"
+)
+LINKS_NOTE = (
+    "[Condensed page: no contact form here; only links likely to lead to one are listed. "
+    "Other elements are omitted but still present on the page.]"
+)
+
+
+@dataclass
+class Region:
+    """Part of the page to keep, and how sure we are it is the right part"""
+    mode: str
+    nodes: List[DOMElementNode]
+    confidence: float
+
+
+def _walk(node: DOMBaseNode) -> Iterator[DOMBaseNode]:
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        if isinstance(current, DOMElementNode):
+            stack.extend(reversed(current.children))
+
+
+def _elements(node: DOMElementNode) -> Iterator[DOMElementNode]:
+    return (n for n in _walk(node) if isinstance(n, DOMElementNode))
+
+
+def _is_fillable(node: DOMElementNode) -> bool:
+    if node.tag_name not in FILLABLE_TAGS:
+        return False
+    attrs = node.attributes
+    if node.tag_name == "input" and attrs.get("type", "text").lower() in NON_FILLABLE_TYPES:
+        return False
+    return attrs.get("name", "").lower() not in SEARCH_NAMES and attrs.get("role") != "searchbox"
+
+
+def _hint_text(node: DOMElementNode) -> str:
+    attrs = node.attributes
+    return " ".join(attrs.get(key, "") for key in ("id", "class", "name", "action", "aria-label"))
+
+
+def _score_form(region: DOMElementNode, is_form: bool) -> float:
+    """Confidence that a subtree is the contact form"""
+    fillable = [n for n in _elements(region) if _is_fillable(n)]
+    if not any(n.highlight_index is not None for n in fillable):
+        # Nothing the agent could act on (e.g. below the extracted viewport)
+        return 0.0
+    hints = _hint_text(region)
+    if SEARCH_HINT_PATTERN.search(hints) and len(fillable) <= 1:
+        return 0.0
+    has_textarea = any(n.tag_name == "textarea" for n in fillable)
+    score = 0.3 + (0.3 if has_textarea else 0.0) + 0.075 * min(len(fillable), 4)
+    if FORM_HINT_PATTERN.search(hints):
+        score += 0.1
+    if not is_form:
+        score -= 0.1
+    return round(min(score, 1.0), 2)
+
+
+def _common_ancestor(nodes: List[DOMElementNode]) -> Optional[DOMElementNode]:
+    chains = []
+    for node in nodes:
+        chain = []
+        current: Optional[DOMElementNode] = node
+        while current is not None:
+            chain.append(current)
+            current = current.parent
+        chains.append(list(reversed(chain)))
+    ancestor = None
+    for level in zip(*chains):
+        if all(n is level[0] for n in level):
+            ancestor = level[0]
+        else:
+            break
+    return ancestor
+
+
+def find_form_region(root: DOMElementNode) -> Optional[Region]:
+    """Best-scoring <form>, or the smallest subtree holding the fields of a form-less page"""
+    forms = [n for n in _elements(root) if n.tag_name == "form"]
+    scored = [(_score_form(form, True), form) for form in forms]
+    if not scored or max(s for s, _ in scored) == 0.0:
+        fields = [n for n in _elements(root) if _is_fillable(n)]
+        ancestor = _common_ancestor(fields) if len(fields) >= 2 else None
+        if ancestor is not None and ancestor is not root:
+            scored = [(_score_form(ancestor, False), ancestor)]
+    if not scored:
+        return None
+    score, best = max(scored, key=lambda item: item[0])
+    return Region("form", [best], score) if score > 0 else None
+
+
+def find_contact_links(root: DOMElementNode) -> Optional[Region]:
+    """Clickable elements whose text or href points at a contact page"""
+    links = []
+    for node in _elements(root):
+        if node.highlight_index is None or node.tag_name not in ("a", "button"):
+            continue
+        label = " ".join([node.get_all_text_till_next_clickable_element(), node.attributes.get("href", "")])
+        if CONTACT_LINK_PATTERN.search(label):
+            links.append(node)
+    if not links:
+        return None
+    return Region("contact_links", links, 0.7)
+
+
+def condensed_tree(region: Region) -> DOMElementNode:
+    """A detached root listing only the region's subtrees (original nodes are not modified)"""
+    root = DOMElementNode(
+        is_visible=True,
+        parent=None,
+        tag_name="body",
+        xpath="",
+        attributes={},
+        children=[],
+        is_top_element=True,
+    )
+    note = DOMTextNode(is_visible=True, parent=root, text=FORM_NOTE if region.mode == "form" else LINKS_NOTE)
+    root.children = [note, *region.nodes]
+    return root
+
+
+def _tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+class DomCondenser:
+    """
+    Prunes the page state an agent step sends to the LLM
+
+    Before each step the element tree is reduced to the contact form
+    region or, on pages without one, to the links that lead to it. The
+    full page is sent when neither is found with min_confidence, and for
+    the step after a failed action (the form might be covered by a banner
+    the condensed view does not show). Pruning only changes what the model
+    reads: element indices and the page itself are untouched.
+    """
+
+    def __init__(self, min_confidence: float):
+        self.min_confidence = min_confidence
+        self.steps: List[CondensationStep] = []
+
+    def attach(self, agent: Any) -> None:
+        """Condense every state message the agent builds from now on"""
+        manager = agent._message_manager
+        add_state_message = manager.add_state_message
+        include_attributes = manager.settings.include_attributes
+
+        def condensing_add_state_message(state, result=None, step_info=None, use_vision=True):
+            failed = any(r.error for r in result or [])
+            try:
+                state = self.condense(state, include_attributes, full_page=failed)
+            except Exception as e:
+                logger.info(f"DOM condensation failed, sending full page: {e}")
+            add_state_message(state, result, step_info, use_vision)
+
+        manager.add_state_message = condensing_add_state_message
+
+    def choose(self, root: DOMElementNode) -> Optional[Region]:
+        """Region to keep, None for the full page"""
+        form = find_form_region(root)
+        if form is not None and form.confidence >= self.min_confidence:
+            return form
+        links = find_contact_links(root)
+        if links is not None and links.confidence >= self.min_confidence:
+            return links
+        return None
+
+    def condense(self, state: Any, include_attributes: List[str], full_page: bool = False) -> Any:
+        full_text = state.element_tree.clickable_elements_to_string(include_attributes=include_attributes)
+        region = None if full_page else self.choose(state.element_tree)
+        if region is None:
+            self._record("full", 1.0 if full_page else 0.0, full_text, full_text)
+            return state
+
+        tree = condensed_tree(region)
+        text = tree.clickable_elements_to_string(include_attributes=include_attributes)
+        if len(text) >= len(full_text):
+            self._record("full", region.confidence, full_text, full_text)
+            return state
+        self._record(region.mode, region.confidence, full_text, text)
+        return dataclasses.replace(state, element_tree=tree)
+
+    def _record(self, mode: str, confidence: float, before: str, after: str) -> None:
+        self.steps.append(CondensationStep(
+            step=len(self.steps) + 1,
+            mode=mode,
+            confidence=confidence,
+            page_tokens_before=_tokens(before),
+            page_tokens_after=_tokens(after),
+        ))
+
+    def report(self) -> CondensationReport:
+        return CondensationReport(
+            steps=list(self.steps),
+            page_tokens_before=sum(s.page_tokens_before for s in self.steps),
+            page_tokens_after=sum(s.page_tokens_after for s in self.steps),
+        )
@@ -0,0 +1,370 @@
+"""Concurrent execution engine for form submissions"""
+
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, List
+from urllib.parse import urlparse
+
+from tenacity import RetryCallState
+
+from .config import get_settings
+from .models import (
+    FormSubmissionStatus,
+    FormSubmissionRequest,
+    FormSubmissionResponse,
+    BatchSubmissionResponse,
+)
+from .preflight import PreflightResult, get_preflight_checker
+from .discovery import DiscoveryResult, get_contact_discovery
+from .idempotency import get_idempotency_store
+from .rate_limiter import get_rate_limiter, registrable_domain
+from .retry import FailureClass, classify, job_retrying
+from .usage import get_metrics
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+def get_domain(url: str) -> str:
+    """Return the lowercase host name of a URL (used as the concurrency key)"""
+    return (urlparse(url).hostname or "").lower()
+
+
+class BatchExecutor:
+    """
+    Runs form submissions concurrently with bounded parallelism
+
+    - A global semaphore caps the number of jobs running at once.
+    - A per-domain semaphore caps the jobs hitting the same registrable
+      domain, so a large batch against one site cannot starve the others.
+    - A per-domain token bucket spaces those jobs out and backs off when
+      the site answers 429/503 or shows a CAPTCHA.
+    - Each job runs under its own timeout; transient failures (navigation
+      timeouts, browser crashes) are retried with jittered backoff.
+    - Rows that give a company homepage start on its contact form page,
+      found by a plain HTTP crawl (contact discovery) before the agent runs.
+    - Unreachable and CAPTCHA-protected sites are screened out by a plain
+      HTTP pre-flight check before they take a worker slot.
+    - Jobs given an idempotency key run at most once per key: duplicates
+      join the running job or get the stored result.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        per_domain_limit: int,
+        job_timeout: float,
+        preflight_enabled: bool = True,
+        discovery_enabled: bool = True,
+        rate_limit_enabled: bool = True,
+        retry_attempts: int = 1,
+        retry_backoff: float = 2.0,
+        retry_max_backoff: float = 30.0,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.per_domain_limit = max(1, per_domain_limit)
+        self.job_timeout = job_timeout
+        self.preflight_enabled = preflight_enabled
+        self.discovery_enabled = discovery_enabled
+        self.rate_limit_enabled = rate_limit_enabled
+        self.retry_attempts = max(1, retry_attempts)
+        self.retry_backoff = retry_backoff
+        self.retry_max_backoff = retry_max_backoff
+
+        self._workers = asyncio.Semaphore(self.max_workers)
+        self._domain_slots: Dict[str, asyncio.Semaphore] = {}
+        self._domain_users: Dict[str, int] = {}
+        self._running = 0
+
+    @property
+    def running(self) -> int:
+        """Number of jobs currently executing"""
+        return self._running
+
+    def domain_queues(self) -> Dict[str, int]:
+        """Jobs waiting or running per registrable domain"""
+        return dict(self._domain_users)
+
+    def _acquire_domain(self, domain: str) -> asyncio.Semaphore:
+        if domain not in self._domain_slots:
+            self._domain_slots[domain] = asyncio.Semaphore(self.per_domain_limit)
+            self._domain_users[domain] = 0
+        self._domain_users[domain] += 1
+        return self._domain_slots[domain]
+
+    def _release_domain(self, domain: str) -> None:
+        self._domain_users[domain] -= 1
+        if self._domain_users[domain] == 0:
+            # Drop idle semaphores so long-running processes do not
+            # accumulate one entry per host ever seen
+            del self._domain_users[domain]
+            del self._domain_slots[domain]
+
+    async def run_one(
+        self,
+        request: FormSubmissionRequest,
+        preflight: Optional[PreflightResult] = None,
+        idempotency_key: Optional[str] = None,
+        discovery: Optional[DiscoveryResult] = None,
+        job_id: Optional[str] = None,
+    ) -> FormSubmissionResponse:
+        """
+        Run a single submission under the concurrency limits
+
+        Args:
+            request: FormSubmissionRequest to execute
+            preflight: Result of an earlier pre-flight check of the start URL (checked here if omitted)
+            idempotency_key: Deduplication key (see idempotency.key_for); None runs unconditionally
+            discovery: Result of an earlier contact discovery (discovered here if omitted)
+            job_id: Id the job's timeline is stored under (generated if omitted)
+
+        Returns:
+            FormSubmissionResponse with elapsed_seconds set to the execution time
+        """
+        if idempotency_key is None:
+            return await self._traced(request, preflight, discovery, job_id)
+        return await get_idempotency_store().run(
+            idempotency_key, lambda: self._traced(request, preflight, discovery, job_id), force=request.force
+        )
+
+    async def _traced(
+        self,
+        request: FormSubmissionRequest,
+        preflight: Optional[PreflightResult],
+        discovery: Optional[DiscoveryResult],
+        job_id: Optional[str],
+    ) -> FormSubmissionResponse:
+        with telemetry.job_trace(str(request.url), job_id) as trace:
+            result = await self._run_one(request, preflight, discovery)
+            result.job_id = trace.job_id
+            telemetry.record_job(result)
+        return result
+
+    async def _run_one(
+        self,
+        request: FormSubmissionRequest,
+        preflight: Optional[PreflightResult],
+        discovery: Optional[DiscoveryResult],
+    ) -> FormSubmissionResponse:
+        url = str(request.url)
+        # The page the job actually starts on (and the site it hits)
+        start_url = url
+        if self.discovery_enabled:
+            if discovery is None:
+                with telemetry.span("discovery") as attrs:
+                    discovery = await get_contact_discovery().discover(url)
+                    attrs["cached"] = discovery.cached
+            start_url = discovery.start_url
+        domain = get_domain(start_url)
+
+        if self.preflight_enabled:
+            if preflight is None:
+                with telemetry.span("preflight"):
+                    preflight = await get_preflight_checker().check(start_url)
+            if not preflight.ok:
+                result = preflight.to_response()
+                result.elapsed_seconds = round(preflight.elapsed_ms / 1000, 3)
+                self._observe(start_url, result)
+                get_metrics().record(domain, result)
+                return self._attribute(result, url, start_url)
+
+        site = registrable_domain(start_url)
+        domain_slot = self._acquire_domain(site)
+        try:
+            result = await self._execute_with_retry(request, start_url, domain_slot)
+            self._observe(start_url, result)
+        finally:
+            self._release_domain(site)
+
+        get_metrics().record(domain, result)
+        return self._attribute(result, url, start_url)
+
+    @staticmethod
+    def _attribute(result: FormSubmissionResponse, url: str, start_url: str) -> FormSubmissionResponse:
+        """Report the job under the requested URL, noting where it actually ran"""
+        if start_url != url:
+            result.discovered_url = start_url
+        result.url = url
+        return result
+
+    def _observe(self, url: str, result: FormSubmissionResponse) -> None:
+        if self.rate_limit_enabled:
+            get_rate_limiter().observe(
+                url,
+                status_code=result.http_status,
+                captcha=result.status == FormSubmissionStatus.CAPTCHA_DETECTED,
+                success=result.status == FormSubmissionStatus.SUCCESS,
+            )
+
+    async def _execute_with_retry(
+        self,
+        request: FormSubmissionRequest,
+        url: str,
+        domain_slot: asyncio.Semaphore,
+    ) -> FormSubmissionResponse:
+        """
+        Run a job, rerunning it after transient failures
+
+        Every attempt takes the domain slot, waits for the domain's rate
+        limit and takes a worker slot of its own, and gives all three back
+        when it ends, so the backoff between attempts holds neither a worker
+        nor the domain. The domain slot comes first so a job waiting on a
+        busy domain never occupies a global worker. Each attempt leases a
+        fresh browser context; cached form plans are left in place. Tokens
+        and cost of failed attempts are added to the final response.
+        """
+        attempts: List[FormSubmissionResponse] = []
+
+        async def attempt() -> FormSubmissionResponse:
+            with telemetry.span("domain_wait"):
+                await domain_slot.acquire()
+            try:
+                if self.rate_limit_enabled:
+                    with telemetry.span("rate_limit"):
+                        await get_rate_limiter().acquire(url)
+                with telemetry.span("worker_wait"):
+                    await self._workers.acquire()
+                try:
+                    result = await self._execute(request, url)
+                finally:
+                    self._workers.release()
+            finally:
+                domain_slot.release()
+            attempts.append(result)
+            return result
+
+        def before_sleep(state: RetryCallState) -> None:
+            logger.warning(
+                f"Retrying {url} in {state.next_action.sleep:.1f}s "
+                f"(attempt {state.attempt_number} failed: {state.outcome.result().message})"
+            )
+
+        started = time.perf_counter()
+        retrying = job_retrying(
+            self.retry_attempts, self.retry_backoff, self.retry_max_backoff, before_sleep
+        )
+        result = await retrying(attempt)
+
+        result.attempts = len(attempts)
+        if len(attempts) > 1:
+            result.elapsed_seconds = round(time.perf_counter() - started, 3)
+            result.retry_seconds = round(result.elapsed_seconds - (attempts[-1].elapsed_seconds or 0.0), 3)
+            result.tokens_used = sum(r.tokens_used or 0 for r in attempts)
+            if all(r.cost_estimate is not None for r in attempts):
+                result.cost_estimate = round(sum(r.cost_estimate for r in attempts), 6)
+        return result
+
+    async def _execute(self, request: FormSubmissionRequest, url: str) -> FormSubmissionResponse:
+        # The browser automation stack is loaded on the first job, not at API startup
+        from .form_agent import get_form_agent
+
+        agent = get_form_agent()
+
+        self._running += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                agent.submit_form(
+                    url=url,
+                    message=request.message,
+                    use_complex_model=request.use_complex_model,
+                    company_name=request.company_name,
+                    contact_person=request.contact_person,
+                    email=request.email,
+                    phone=request.phone,
+                ),
+                timeout=self.job_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Job timed out after {self.job_timeout}s: {url}")
+            result = FormSubmissionResponse(
+                status=FormSubmissionStatus.TIMEOUT,
+                url=url,
+                message="Job timed out",
+                details=f"ジョブの実行時間が上限({self.job_timeout:.0f}秒)を超えました",
+                failure_class=FailureClass.SITE.value,
+            )
+        except Exception as e:
+            logger.error(f"Job failed: {url}: {e}")
+            result = FormSubmissionResponse(
+                status=FormSubmissionStatus.ERROR,
+                url=url,
+                message=f"Error: {str(e)}",
+                details=f"エラーが発生しました: {str(e)}",
+                failure_class=classify(e).value,
+            )
+        finally:
+            self._running -= 1
+
+        result.elapsed_seconds = round(time.perf_counter() - started, 3)
+        return result
+
+    async def run_batch(
+        self,
+        requests: List[FormSubmissionRequest],
+        keys: Optional[List[Optional[str]]] = None,
+    ) -> BatchSubmissionResponse:
+        """
+        Run a batch of submissions concurrently
+
+        Args:
+            requests: List of FormSubmissionRequest objects
+            keys: Idempotency key per request (None entries run unconditionally)
+
+        Returns:
+            BatchSubmissionResponse with results in request order
+        """
+        started = time.perf_counter()
+        keys = keys or [None] * len(requests)
+        urls = [str(r.url) for r in requests]
+        discoveries: Dict[str, DiscoveryResult] = {}
+        if self.discovery_enabled:
+            # Resolve homepages to their contact pages for the whole batch at
+            # once; rows of the same site share one crawl
+            discoveries = await get_contact_discovery().discover_many(urls)
+        start_urls = [discoveries[u].start_url if u in discoveries else u for u in urls]
+        preflights: Dict[str, PreflightResult] = {}
+        if self.preflight_enabled:
+            # Screen every URL up front, concurrently, so rejected rows come
+            # back without ever queueing for a worker
+            preflights = await get_preflight_checker().check_many(start_urls)
+        results = await asyncio.gather(
+            *(
+                self.run_one(req, preflights.get(start), key, discoveries.get(url))
+                for req, key, url, start in zip(requests, keys, urls, start_urls)
+            )
+        )
+        wall_clock = time.perf_counter() - started
+
+        total_job = sum(r.elapsed_seconds or 0.0 for r in results)
+        return BatchSubmissionResponse(
+            results=list(results),
+            total=len(results),
+            wall_clock_seconds=round(wall_clock, 3),
+            total_job_seconds=round(total_job, 3),
+            speedup=round(total_job / wall_clock, 2) if wall_clock > 0 else 0.0,
+        )
+
+
+# Singleton instance
+_batch_executor: Optional[BatchExecutor] = None
+
+
+def get_batch_executor() -> BatchExecutor:
+    """Get or create BatchExecutor singleton"""
+    global _batch_executor
+    if _batch_executor is None:
+        settings = get_settings()
+        _batch_executor = BatchExecutor(
+            max_workers=settings.batch_max_workers,
+            per_domain_limit=settings.batch_per_domain_limit,
+            job_timeout=settings.job_timeout,
+            preflight_enabled=settings.preflight_enabled,
+            discovery_enabled=settings.discovery_enabled,
+            rate_limit_enabled=settings.rate_limit_enabled,
+            retry_attempts=settings.retry_max_attempts,
+            retry_backoff=settings.retry_backoff_seconds,
+            retry_max_backoff=settings.retry_max_backoff_seconds,
+        )
+    return _batch_executor
@@ -1,28 +1,76 @@
 """Form submission agent using Browser Use and Claude API"""
 
 import asyncio
-import re
+import logging
 import os
-import sys
-from typing import Optional, Dict, Any
-from playwright.async_api import async_playwright, Page, Browser
-from langchain_anthropic import ChatAnthropic
+from typing import Optional, Dict, Any, Tuple, TYPE_CHECKING
 from browser_use import Agent
 
 from .config import get_settings
-from .models import FormSubmissionStatus, FormSubmissionResponse
-
-# Disable stdin to prevent EOF errors in non-interactive environments
-# Force stdin to /dev/null regardless of tty status
-try:
-    sys.stdin.close()
-except:
-    pass
-sys.stdin = open(os.devnull, 'r')
+from .models import FormSubmissionStatus, FormSubmissionResponse, SubmissionVerification
+from .browser_pool import get_browser_pool
+from .form_cache import get_form_cache
+from .form_plan import CLICK_ACTIONS, plan_from_history, replay_plan, PlanStep, ReplayResult
+from .heuristic_filler import HeuristicResult, analyze_page
+from .form_templates import (
+    TemplateMatch,
+    fingerprint,
+    hosted_form_url,
+    plan_for_template,
+    opens_confirm_page,
+    advance_template_confirm,
+)
+from .usage import get_price_table
+from .llm import UsageTracker, create_llm
+from .model_router import FormSignals, RouteDecision, collect_signals, get_model_router
+from .run_policy import Phase, RunPolicy, RunBudget, BudgetExceeded
+from .rate_limiter import THROTTLE_STATUSES
+from .retry import FailureClass, classify
+from .resource_blocking import ResourceBlocker
+from .dom_condenser import DomCondenser
+from .submission_flow import SubmissionFlow
+from .verification import SubmissionMonitor, verify_submission
+from .job_memory import JobMemory, MemoryCapExceeded, compact_history
+from .telemetry import span
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+# Static form-filling procedure, appended to browser-use's system prompt so it
+# is identical on every call and covered by the prompt cache
+FORM_TASK_INSTRUCTIONS = """
+# お問い合わせフォーム送信の手順
+1. 現在のページにフォームがあるか確認してください。
+2. もしフォームが見つからない場合は、ページ内の「お問い合わせ」「Contact」「問い合わせ」などのリンクをクリックしてフォームページに移動してください。
+3. フォームのフィールドに適切な情報を入力してください。フィールド名は日本語または英語の可能性があります（例：「会社名」「Company」「名前」「Name」など）。
+4. 必須フィールドをすべて入力し、最後に送信ボタン（「送信」「Submit」「Send」など）をクリックしてください。
+5. 「確認画面へ」などのボタンで入力内容の確認画面が表示された場合は、内容を修正せずに「送信」ボタンを押してください。「送信完了」「ありがとうございました」などの完了画面が表示されたら終了してください。
+"""
 
-# Set environment variable to disable interactive prompts
-os.environ["PYTHONUNBUFFERED"] = "1"
-os.environ["PLAYWRIGHT_BROWSERS_PATH"] = os.environ.get("PLAYWRIGHT_BROWSERS_PATH", "/ms-playwright")
+# Challenge iframes served by CAPTCHA providers (reCAPTCHA v3 has no anchor frame)
+CAPTCHA_FRAME_MARKERS = {
+    "recaptcha": "/recaptcha/api2/anchor",
+    "recaptcha_enterprise": "/recaptcha/enterprise/anchor",
+    "hcaptcha": "hcaptcha.com/captcha/",
+    "turnstile": "challenges.cloudflare.com/cdn-cgi/challenge-platform/",
+}
+
+# Visible widget containers, checked in one round trip
+CAPTCHA_DOM_JS = """
+() => {
+    const widgets = {
+        recaptcha: '.g-recaptcha:not([data-size="invisible"])',
+        hcaptcha: '.h-captcha:not([data-size="invisible"])',
+        turnstile: '.cf-turnstile',
+    };
+    for (const [provider, selector] of Object.entries(widgets)) {
+        if (document.querySelector(selector)) return provider;
+    }
+    return null;
+}
+"""
 
 
 class FormAgent:
@@ -33,41 +81,27 @@ class FormAgent:
         # Set Anthropic API key environment variable
         os.environ["ANTHROPIC_API_KEY"] = self.settings.anthropic_api_key
 
-    async def detect_captcha(self, page: Page) -> bool:
+    async def detect_captcha(self, page: "Page") -> Optional[str]:
         """
-        Detect if CAPTCHA is present on the page
+        Detect an interactive CAPTCHA widget on the loaded page
+
+        Looks for the providers' widget containers and challenge iframes
+        (scripts injected after load are included) instead of scanning the
+        serialized HTML, which is slow on large pages and flags any page that
+        mentions "captcha" in its text.
 
         Returns:
-            True if CAPTCHA detected, False otherwise
+            Provider name if a CAPTCHA was detected, None otherwise
         """
         try:
-            # Check for common CAPTCHA indicators
-            captcha_patterns = [
-                'recaptcha',
-                'g-recaptcha',
-                'captcha',
-                'hcaptcha',
-                'cf-turnstile'
-            ]
-
-            page_content = await page.content()
-            page_content_lower = page_content.lower()
-
-            for pattern in captcha_patterns:
-                if pattern in page_content_lower:
-                    return True
-
-            # Check for CAPTCHA iframes
-            frames = page.frames
-            for frame in frames:
-                frame_url = frame.url
-                if any(pattern in frame_url.lower() for pattern in captcha_patterns):
-                    return True
-
-            return False
+            for frame in page.frames:
+                for provider, marker in CAPTCHA_FRAME_MARKERS.items():
+                    if marker in frame.url:
+                        return provider
+            return await page.evaluate(CAPTCHA_DOM_JS)
         except Exception as e:
-            print(f"Error detecting CAPTCHA: {e}")
-            return False
+            logger.warning(f"Error detecting CAPTCHA: {e}")
+            return None
 
     async def submit_form(
         self,
@@ -85,7 +119,7 @@ class FormAgent:
         Args:
             url: URL of the contact form
             message: Message to send
-            use_complex_model: Use Sonnet instead of Haiku
+            use_complex_model: Start on the complex model instead of letting the router decide
             company_name: Company name (override default)
             contact_person: Contact person (override default)
             email: Email (override default)
@@ -100,94 +134,571 @@ class FormAgent:
         email_addr = email or self.settings.email
         phone_num = phone or self.settings.phone
 
-        # Select model based on complexity
-        model = (
-            self.settings.complex_model if use_complex_model
-            else self.settings.default_model
+        values = {
+            "company": company,
+            "person": person,
+            "email": email_addr,
+            "phone": phone_num,
+            "message": message,
+        }
+        form_cache = get_form_cache()
+        router = get_model_router()
+        decision: Optional[RouteDecision] = None
+        template: Optional[TemplateMatch] = None
+
+        # Records the usage metadata of every LLM call made for this job
+        tracker = UsageTracker(self.settings.default_model)
+        prices = get_price_table()
+        budget = RunBudget(RunPolicy.from_settings())
+        memory = JobMemory(self.settings.job_max_memory_mb)
+        flow = SubmissionFlow()
+
+        blocker: Optional[ResourceBlocker] = None
+        monitor: Optional[SubmissionMonitor] = None
+        condenser = (
+            DomCondenser(self.settings.dom_condensation_min_confidence)
+            if self.settings.dom_condensation_enabled else None
         )
 
+        def submitted() -> bool:
+            """A send/confirm click or a form POST happened: the form may have gone out"""
+            return flow.submitted or (monitor is not None and bool(monitor.responses))
+
+        async def finish(response: FormSubmissionResponse) -> FormSubmissionResponse:
+            response.submitted = response.submitted or submitted()
+            if response.submitted and response.failure_class == FailureClass.TRANSIENT.value:
+                # A crash or timeout after the send click: a retry would send the form twice
+                response.failure_class = FailureClass.SITE.value
+            if monitor is not None:
+                monitor.close()
+            await memory.finish(response)
+            response.phase_seconds = budget.finish()
+            if blocker is not None:
+                response.resources = blocker.summary()
+            if condenser is not None and condenser.steps:
+                response.condensation = condenser.report()
+            if flow.transitions:
+                response.submission_flow = flow.transitions
+            if template is not None:
+                response.form_template = template.template.name
+            if decision is not None:
+                response.model_used = decision.model
+                response.routing = decision.summary
+            if tracker.steps:
+                tracker.apply(response, prices)
+            return response
+
         try:
             # Force headless mode via environment variable
             os.environ["HEADLESS"] = "1"
 
-            # Create LLM instance with Claude
-            llm = ChatAnthropic(
-                model=model,
-                temperature=0.1,
-                anthropic_api_key=self.settings.anthropic_api_key
-            )
-
-            # Create agent - browser-use should respect HEADLESS env var
-            agent = Agent(
-                task=f"{self._create_task_prompt(message, company, person, email_addr, phone_num)}\n\nURL: {url}",
-                llm=llm,
-            )
-
-            # Execute task
-            result = await agent.run()
-
-            # Check if submission was successful based on result
-            result_str = str(result).lower() if result else ""
-
-            # Check for failure patterns first
-            failure_indicators = [
-                'stopping due to',
-                'consecutive failures',
-                'failed to',
-                'could not',
-                'unable to',
-                'error',
-                'exception',
-                'timeout'
-            ]
-
-            success_indicators = [
-                'thank you', 'ありがとう', '送信完了', '受付', 'received',
-                'success', '完了', 'sent', 'submitted', 'complete'
-            ]
-
-            is_failure = any(indicator in result_str for indicator in failure_indicators)
-            is_success = any(indicator in result_str for indicator in success_indicators)
-
-            if is_failure:
-                status = FormSubmissionStatus.FAILED
-                details = f"フォーム送信に失敗しました: {result}"
-            elif is_success:
+            # Lease an isolated context from the shared browser pool instead
+            # of launching a fresh Chromium for every submission
+            async with get_browser_pool().lease() as browser_context, memory.watch(browser_context):
+                page = await browser_context.get_current_page()
+                # Form POST responses feed the post-submit verification; the
+                # listener goes away with the leased context
+                monitor = SubmissionMonitor(page.context, url)
+                if self.settings.resource_blocking_enabled:
+                    blocker = await ResourceBlocker.install(page.context)
+                signals = FormSignals()
+                try:
+                    with span("navigation"):
+                        landing = await budget.run(
+                            page.goto(url, wait_until="domcontentloaded", timeout=self.settings.timeout),
+                            Phase.NAVIGATION,
+                        )
+                except BudgetExceeded:
+                    raise
+                except Exception as e:
+                    # Let the agent deal with slow or flaky pages
+                    logger.info(f"Initial navigation failed: {e}")
+                else:
+                    # A throttled site will not show its form; stop before any LLM work
+                    # and let the rate limiter back the domain off
+                    if landing is not None and landing.status in THROTTLE_STATUSES:
+                        return await finish(FormSubmissionResponse(
+                            status=FormSubmissionStatus.ERROR,
+                            url=url,
+                            message=f"Rate limited by site (HTTP {landing.status})",
+                            details=f"サイトからアクセス制限(HTTP {landing.status})を受けました",
+                            tokens_used=0,
+                            cost_estimate=0.0,
+                            handled_by="navigation",
+                            failure_class=FailureClass.SITE.value,
+                            http_status=landing.status,
+                        ))
+                    # Widgets injected by JavaScript are only visible in the rendered page
+                    with span("captcha_check"):
+                        captcha = await self.detect_captcha(page)
+                    if captcha:
+                        return await finish(FormSubmissionResponse(
+                            status=FormSubmissionStatus.CAPTCHA_DETECTED,
+                            url=url,
+                            message="CAPTCHA detected",
+                            details=f"CAPTCHA ({captcha}) を検出しました",
+                            tokens_used=0,
+                            cost_estimate=0.0,
+                            handled_by="captcha_check",
+                            failure_class=FailureClass.SITE.value,
+                        ))
+                    await flow.observe(page, "landing")
+                    signals = await collect_signals(page)
+                    if self.settings.form_templates_enabled:
+                        with span("fingerprint"):
+                            template = await self._fingerprint(page)
+
+                # Repeat form URLs: replay the cached plan without any LLM call
+                plan = await asyncio.to_thread(form_cache.get, url)
+                if plan is not None:
+                    with span("fill", path="cached_plan"):
+                        replay = await budget.run(replay_plan(page, plan, values), Phase.FILL)
+                    if replay.clicked:
+                        await flow.advance(page, "plan")
+                        with span("verify"):
+                            verification = await budget.run(
+                                verify_submission(page, plan.form_url, monitor, llm=self._verify_llm(tracker)),
+                                Phase.SUBMIT,
+                            )
+                        confirmed = verification.verdict == "success" and not flow.stuck_on_confirm
+                        if not confirmed or not replay.completed:
+                            await asyncio.to_thread(form_cache.invalidate, url)
+                        if not confirmed:
+                            # The form may have gone out; any other path would send it again
+                            return await finish(self._unconfirmed(url, message, "cached_plan", verification, flow))
+                        return await finish(FormSubmissionResponse(
+                            status=FormSubmissionStatus.SUCCESS,
+                            url=url,
+                            message=f"Submitted message: {message[:50]}...",
+                            details="キャッシュ済みのフォーム手順で送信しました",
+                            tokens_used=0,
+                            cost_estimate=0.0,
+                            handled_by="cached_plan",
+                            verification=verification,
+                        ))
+                    # Nothing was clicked: the plan no longer matches the page
+                    await asyncio.to_thread(form_cache.invalidate, url)
+
+                # Known form builders: their markup gives the plan, on first-time domains too
+                if template is not None:
+                    with span("fill", path="template", template=template.template.name):
+                        analysis, replay = await budget.run(
+                            self._try_template(page, url, values, template, flow, reload=plan is not None),
+                            Phase.FILL,
+                        )
+                    if replay.clicked:
+                        with span("verify"):
+                            verification = await budget.run(
+                                verify_submission(
+                                    page, analysis.plan.form_url, monitor, llm=self._verify_llm(tracker)
+                                ),
+                                Phase.SUBMIT,
+                            )
+                        if verification.verdict != "success" or flow.stuck_on_confirm:
+                            return await finish(self._unconfirmed(url, message, "template", verification, flow))
+                        if replay.completed:
+                            await asyncio.to_thread(form_cache.put, analysis.plan)
+                        return await finish(FormSubmissionResponse(
+                            status=FormSubmissionStatus.SUCCESS,
+                            url=url,
+                            message=f"Submitted message: {message[:50]}...",
+                            details=f"フォームテンプレート ({template.template.name}) で送信しました",
+                            tokens_used=0,
+                            cost_estimate=0.0,
+                            handled_by="template",
+                            verification=verification,
+                        ))
+
+                # Predictable forms: rule-based fill without any LLM call (a builder
+                # template applies the same rules with more knowledge, so it is not retried)
+                if self.settings.heuristic_filler_enabled and template is None:
+                    # A failed replay leaves a half-filled page behind; start clean
+                    with span("fill", path="heuristic"):
+                        analysis, replay = await budget.run(
+                            self._try_heuristic(page, url, values, flow, reload=plan is not None),
+                            Phase.FILL,
+                        )
+                    if replay.clicked:
+                        with span("verify"):
+                            verification = await budget.run(
+                                verify_submission(
+                                    page, analysis.plan.form_url, monitor, llm=self._verify_llm(tracker)
+                                ),
+                                Phase.SUBMIT,
+                            )
+                        if verification.verdict != "success" or flow.stuck_on_confirm:
+                            return await finish(self._unconfirmed(url, message, "heuristic", verification, flow))
+                        # Only plans with a confirmed submission are reused
+                        if replay.completed:
+                            await asyncio.to_thread(form_cache.put, analysis.plan)
+                        return await finish(FormSubmissionResponse(
+                            status=FormSubmissionStatus.SUCCESS,
+                            url=url,
+                            message=f"Submitted message: {message[:50]}...",
+                            details=f"ルールベースで送信しました (信頼度 {analysis.confidence:.2f})",
+                            tokens_used=0,
+                            cost_estimate=0.0,
+                            handled_by="heuristic",
+                            verification=verification,
+                        ))
+
+                # Start on the cheapest model likely to succeed, escalate if it struggles
+                decision = router.choose(url, signals, use_complex_model)
+                task = f"{self._create_task_prompt(message, company, person, email_addr, phone_num)}\n\nURL: {url}"
+                with span("agent", model=decision.model):
+                    result, failed_steps = await self._run_agent(
+                        browser_context, decision.model, task, tracker, budget, memory, flow, condenser
+                    )
+
+                # A run that got the form out must not be repeated on another model
+                escalation = self._escalation_reason(decision, result, failed_steps, submitted())
+                if escalation and budget.steps_left:
+                    logger.info(f"Escalating to {self.settings.complex_model}: {escalation}")
+                    page = await browser_context.get_current_page()
+                    try:
+                        with span("navigation"):
+                            await budget.run(
+                                page.goto(url, wait_until="domcontentloaded", timeout=self.settings.timeout),
+                                Phase.NAVIGATION,
+                            )
+                    except BudgetExceeded:
+                        raise
+                    except Exception as e:
+                        # Judge the first run rather than losing it to a navigation error
+                        logger.warning(f"Escalation skipped, navigation failed: {e}")
+                    else:
+                        router.escalate(decision, escalation)
+                        with span("agent", model=decision.model, escalated=True):
+                            result, failed_steps = await self._run_agent(
+                                browser_context, decision.model, task, tracker, budget, memory, flow, condenser
+                            )
+
+                if not result.is_done() and not flow.complete and not budget.steps_left:
+                    raise BudgetExceeded(budget.phase, "step budget")
+
+                # Judge the outcome from the live page, not from the agent's transcript;
+                # an agent that stopped on the 確認 screen gets its send click here
+                page = await browser_context.get_current_page()
+                await flow.advance(page, "final", clicked_since=_clicked(result))
+                agent_success = result.is_successful()
+                with span("verify"):
+                    verification = await budget.run(
+                        verify_submission(
+                            page, _form_url_from_history(result, url), monitor,
+                            agent_success=agent_success, llm=self._verify_llm(tracker),
+                        ),
+                        Phase.SUBMIT,
+                    )
+                succeeded = verification.verdict == "success" or (
+                    verification.verdict == "ambiguous" and bool(agent_success)
+                )
+                if flow.stuck_on_confirm:
+                    verification.signals.append("stopped_on_confirm")
+                    succeeded = False
+                await memory.screenshot(succeeded)
+
+            failure_class = None
+            if succeeded:
                 status = FormSubmissionStatus.SUCCESS
-                details = "フォーム送信が完了しました"
+                details = f"フォーム送信が完了しました (確信度 {verification.confidence:.2f})"
             else:
-                # Neither success nor failure indicators found - mark as success but with details
-                status = FormSubmissionStatus.SUCCESS
-                details = f"タスク実行完了: {result}"
+                status = FormSubmissionStatus.FAILED
+                details = f"フォーム送信を確認できませんでした ({', '.join(verification.signals) or '手がかりなし'})"
+                failure_class = FailureClass.SITE.value
+            await asyncio.to_thread(router.record, url, decision.model, succeeded)
 
-            # Estimate token usage and cost
-            tokens_used = self._estimate_tokens(result)
-            cost = self._estimate_cost(tokens_used, model)
+            # Remember how this form was filled so repeats skip the LLM
+            if succeeded:
+                learned = plan_from_history(result, values)
+                if learned is not None:
+                    await asyncio.to_thread(form_cache.put, learned)
 
-            return FormSubmissionResponse(
+            return await finish(FormSubmissionResponse(
                 status=status,
                 url=url,
                 message=f"Submitted message: {message[:50]}...",
                 details=details,
-                tokens_used=tokens_used,
-                cost_estimate=cost,
-                screenshot_path=None
-            )
-
+                handled_by="agent",
+                verification=verification,
+                failure_class=failure_class,
+            ))
+
+        except BudgetExceeded as e:
+            logger.warning(f"Run aborted: {e}")
+            return await finish(FormSubmissionResponse(
+                status=FormSubmissionStatus.TIMEOUT,
+                url=url,
+                message=f"Run aborted: {e}",
+                details=f"{e.phase.value} フェーズで上限 ({e.limit}) に達したため中断しました",
+                handled_by="agent" if decision else None,
+                timeout_phase=e.phase.value,
+                failure_class=classify(e).value,
+            ))
+        except MemoryCapExceeded as e:
+            logger.warning(f"Run aborted: {e}")
+            return await finish(FormSubmissionResponse(
+                status=FormSubmissionStatus.ERROR,
+                url=url,
+                message=f"Run aborted: {e}",
+                details=f"ジョブのメモリ使用量が上限 ({e.cap_mb:.0f}MB) を超えたため中断しました",
+                handled_by="agent" if decision else None,
+                failure_class=classify(e).value,
+            ))
         except asyncio.TimeoutError:
-            return FormSubmissionResponse(
+            return await finish(FormSubmissionResponse(
                 status=FormSubmissionStatus.TIMEOUT,
                 url=url,
                 message="Request timed out",
-                details="ページの読み込みがタイムアウトしました"
-            )
+                details="ページの読み込みがタイムアウトしました",
+                timeout_phase=budget.phase.value if budget.phase else None,
+                failure_class=FailureClass.TRANSIENT.value,
+            ))
         except Exception as e:
-            return FormSubmissionResponse(
+            return await finish(FormSubmissionResponse(
                 status=FormSubmissionStatus.ERROR,
                 url=url,
                 message=f"Error: {str(e)}",
-                details=f"エラーが発生しました: {str(e)}"
+                details=f"エラーが発生しました: {str(e)}",
+                failure_class=classify(e).value,
+            ))
+
+    async def _run_agent(
+        self,
+        browser_context: Any,
+        model: str,
+        task: str,
+        tracker: UsageTracker,
+        budget: RunBudget,
+        memory: JobMemory,
+        flow: SubmissionFlow,
+        condenser: Optional[DomCondenser] = None,
+    ) -> Tuple[Any, int]:
+        """
+        Run the browser-use agent on one model
+
+        On the default model the run is stopped early once it has produced
+        ROUTER_ESCALATE_AFTER failed steps, so the job can move on to the
+        complex model instead of failing slowly. Steps are capped by the
+        remaining step budget and the run is cancelled when a phase deadline
+        or the total budget runs out (BudgetExceeded). With a condenser the
+        page state of each step is pruned before it reaches the model.
+
+        Every step is summarized into `memory.steps` and sampled against the
+        per-job memory cap (MemoryCapExceeded). With compact history retention
+        only the newest screenshot is kept while the run is going and none
+        once it is over; the returned history still carries the URLs and
+        actions the form URL and the learned plan are read from.
+
+        After every step the submission flow observes the page: a 確認
+        screen is clicked through without asking the model, and the run
+        stops as soon as the completion page is reached.
+
+        Returns:
+            (AgentHistoryList, number of steps whose actions returned an error)
+        """
+        tracker.model = model
+        llm = create_llm(model, callbacks=[tracker])
+        escalate_after = (
+            self.settings.router_escalate_after
+            if model != self.settings.complex_model else 0
+        )
+
+        # Fixed instructions extend the system prompt so they sit in the
+        # cached prefix; only the sender data and message vary per job
+        agent = Agent(
+            task=task,
+            extend_system_message=FORM_TASK_INSTRUCTIONS,
+            llm=llm,
+            browser=browser_context.browser,
+            browser_context=browser_context,
+        )
+        if condenser is not None:
+            condenser.attach(agent)
+
+        failed_steps = 0
+        compact = self.settings.agent_history_retention == "compact"
+
+        async def on_step_end(running: Agent) -> None:
+            nonlocal failed_steps
+            budget.observe_step(running)
+            history = running.state.history
+            memory.record_step(history)
+            if compact:
+                compact_history(history)
+            await memory.sample(history)
+            await flow.advance(
+                await running.browser_context.get_current_page(), "agent_step", clicked_since=_clicked(history)
             )
+            if flow.complete:
+                running.stop()
+            if any(r.error for r in running.state.last_result or []):
+                failed_steps += 1
+                if escalate_after and failed_steps >= escalate_after:
+                    running.stop()
+
+        budget.enter(Phase.DISCOVERY)
+        result = await budget.run(agent.run(max_steps=budget.steps_left, on_step_end=on_step_end))
+        if compact:
+            compact_history(result, keep_screenshots=0)
+        return result, failed_steps
+
+    def _escalation_reason(
+        self, decision: RouteDecision, result: Any, failed_steps: int, submitted: bool = False
+    ) -> Optional[str]:
+        """
+        Why a run on the default model should be retried on the complex model
+
+        Never once the run submitted something (a form POST, a confirm screen
+        or a completion page): the retry would send the form a second time.
+        """
+        if decision.model == self.settings.complex_model or submitted:
+            return None
+        escalate_after = self.settings.router_escalate_after
+        if escalate_after and failed_steps >= escalate_after:
+            return f"{failed_steps} failed steps on {decision.model}"
+        if not result.is_done():
+            return f"{decision.model} did not finish the task"
+        return None
+
+    async def _try_heuristic(
+        self,
+        page: "Page",
+        url: str,
+        values: Dict[str, str],
+        flow: SubmissionFlow,
+        reload: bool = False,
+    ) -> Tuple[Optional[HeuristicResult], ReplayResult]:
+        """
+        Fill and submit the form with the rule-based filler if it is confident
+
+        Returns:
+            (analysis, replay). Once replay.clicked the form may have been
+            sent and the plan includes any confirm-screen click; otherwise
+            nothing was submitted and the job moves on to the agent.
+        """
+        try:
+            if reload or page.url.rstrip("/") != url.rstrip("/"):
+                await page.goto(url, wait_until="domcontentloaded", timeout=self.settings.timeout)
+            analysis = await analyze_page(page)
+        except Exception as e:
+            logger.warning(f"Heuristic analysis failed: {e}")
+            return None, ReplayResult()
+
+        if analysis.plan is None or analysis.confidence < self.settings.heuristic_min_confidence:
+            logger.info(f"Heuristic filler escalating ({analysis.reason}, confidence {analysis.confidence})")
+            return None, ReplayResult()
+
+        plan = analysis.plan
+        replay = await replay_plan(page, plan, values)
+        if replay.clicked:
+            send_selector = await flow.advance(page, "plan")
+            if send_selector:
+                plan.steps.append(PlanStep(action="click", selector=send_selector))
+        return analysis, replay
+
+    async def _fingerprint(self, page: "Page") -> Optional[TemplateMatch]:
+        try:
+            return await fingerprint(page)
+        except Exception as e:
+            logger.warning(f"Form builder fingerprinting failed: {e}")
+            return None
+
+    async def _try_template(
+        self,
+        page: "Page",
+        url: str,
+        values: Dict[str, str],
+        match: TemplateMatch,
+        flow: SubmissionFlow,
+        reload: bool = False,
+    ) -> Tuple[Optional[HeuristicResult], ReplayResult]:
+        """
+        Fill and submit a form builder's form from its template, 確認画面 included
+
+        Hosted forms embedded in an iframe (Google Forms, formrun) are opened
+        on their own URL first.
+
+        Returns:
+            (analysis, replay) as for _try_heuristic
+        """
+        name = match.template.name
+        try:
+            hosted = hosted_form_url(match)
+            if hosted:
+                await page.goto(hosted, wait_until="domcontentloaded", timeout=self.settings.timeout)
+                match = await fingerprint(page)
+                if match is None:
+                    logger.info(f"No {name} form at {hosted}")
+                    return None, ReplayResult()
+            elif reload or page.url.rstrip("/") != url.rstrip("/"):
+                await page.goto(url, wait_until="domcontentloaded", timeout=self.settings.timeout)
+            analysis = await plan_for_template(page, match)
+        except Exception as e:
+            logger.warning(f"Template analysis failed ({name}): {e}")
+            return None, ReplayResult()
+
+        if analysis.plan is None or analysis.confidence < self.settings.form_template_min_confidence:
+            logger.info(f"Template {name} escalating ({analysis.reason}, confidence {analysis.confidence})")
+            return None, ReplayResult()
+
+        plan = analysis.plan
+        confirm = opens_confirm_page(match, analysis)
+        replay = await replay_plan(page, plan, values)
+        if not replay.clicked:
+            return analysis, replay
+
+        send_selector = None
+        if replay.completed:
+            try:
+                send_selector = await advance_template_confirm(page, match, confirm)
+            except Exception as e:
+                logger.warning(f"Confirm page handling failed ({name}): {e}")
+        if send_selector:
+            plan.steps.append(PlanStep(action="click", selector=send_selector))
+        # Confirm screens the template does not know go through the generic state machine
+        send_selector = await flow.advance(page, "plan")
+        if send_selector:
+            plan.steps.append(PlanStep(action="click", selector=send_selector))
+        return analysis, replay
+
+    def _verify_llm(self, tracker: UsageTracker) -> Any:
+        """Cheap model that settles ambiguous verifications (None when disabled)"""
+        if not self.settings.verify_llm_enabled:
+            return None
+        return create_llm(self.settings.default_model, callbacks=[tracker], max_tokens=64)
+
+    def _unconfirmed(
+        self,
+        url: str,
+        message: str,
+        handled_by: str,
+        verification: Optional[SubmissionVerification],
+        flow: SubmissionFlow,
+    ) -> FormSubmissionResponse:
+        """
+        Final answer for a rule-based submission whose outcome is not confirmed
+
+        The submit click has already fired, so the form may have been sent;
+        handing the job to another path would send the inquiry twice.
+        """
+        signals = list(verification.signals) if verification is not None else []
+        if flow.stuck_on_confirm:
+            signals.append("stopped_on_confirm")
+        return FormSubmissionResponse(
+            status=FormSubmissionStatus.FAILED,
+            url=url,
+            message=f"Submission not confirmed: {message[:50]}...",
+            details=(
+                f"送信ボタンを押しましたが送信を確認できませんでした ({', '.join(signals) or '手がかりなし'})。"
+                "二重送信を避けるため再送信していません"
+            ),
+            tokens_used=0,
+            cost_estimate=0.0,
+            handled_by=handled_by,
+            verification=verification,
+            failure_class=FailureClass.SITE.value,
+            submitted=True,
+        )
 
     def _create_task_prompt(
         self,
@@ -197,7 +708,7 @@ class FormAgent:
         email: str,
         phone: str
     ) -> str:
-        """Create task prompt for the agent"""
+        """Create the per-job part of the task (instructions live in FORM_TASK_INSTRUCTIONS)"""
         return f"""
 お問い合わせフォームに以下の情報を入力して送信してください:
 
@@ -207,35 +718,29 @@ class FormAgent:
 【電話番号】{phone}
 【お問い合わせ内容/メッセージ】
 {message}
-
-手順:
-1. 現在のページにフォームがあるか確認してください。
-2. もしフォームが見つからない場合は、ページ内の「お問い合わせ」「Contact」「問い合わせ」などのリンクをクリックしてフォームページに移動してください。
-3. フォームのフィールドに適切な情報を入力してください。フィールド名は日本語または英語の可能性があります（例：「会社名」「Company」「名前」「Name」など）。
-4. 必須フィールドをすべて入力し、最後に送信ボタン（「送信」「Submit」「Send」など）をクリックしてください。
 """
 
-    def _estimate_tokens(self, result: Any) -> int:
-        """Estimate tokens used (rough estimation)"""
-        # This is a rough estimate
-        # In production, you would track actual API usage
-        return 1000  # Placeholder
-
-    def _estimate_cost(self, tokens: int, model: str) -> float:
-        """Estimate cost based on tokens and model"""
-        # Claude API costs (as of 2025)
-        # Haiku: $0.25 / 1M input tokens, $1.25 / 1M output tokens
-        # Sonnet: $3.00 / 1M input tokens, $15.00 / 1M output tokens
-
-        if "haiku" in model.lower():
-            # Assume 70% input, 30% output
-            input_cost = (tokens * 0.7) * 0.25 / 1_000_000
-            output_cost = (tokens * 0.3) * 1.25 / 1_000_000
-        else:  # sonnet
-            input_cost = (tokens * 0.7) * 3.00 / 1_000_000
-            output_cost = (tokens * 0.3) * 15.00 / 1_000_000
-
-        return round(input_cost + output_cost, 6)
+
+def _clicked(history: Any) -> bool:
+    """Whether the agent's latest step clicked anything"""
+    if not history.history or history.history[-1].model_output is None:
+        return False
+    return any(
+        name in CLICK_ACTIONS
+        for action in history.history[-1].model_output.action
+        for name in action.model_dump(exclude_unset=True)
+    )
+
+
+def _form_url_from_history(history: Any, default: str) -> str:
+    """URL of the page where the agent last typed into a field"""
+    for item in reversed(history.history):
+        if item.model_output is None:
+            continue
+        for action in item.model_output.action:
+            if "input_text" in action.model_dump(exclude_unset=True):
+                return item.state.url or default
+    return default
 
 
 # Singleton instance
@@ -0,0 +1,163 @@
+"""Persistent cache of resolved form plans keyed by form URL"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any
+from urllib.parse import urlparse
+
+from .config import get_settings
+from .form_plan import FormPlan
+
+logger = logging.getLogger(__name__)
+
+
+def _site(url: str) -> str:
+    """Host without www., plus the port when it is not the default"""
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+    return host
+
+
+def url_key(url: str) -> str:
+    """Normalise a URL to host + path (scheme, query and fragment ignored)"""
+    path = urlparse(url).path.rstrip("/") or "/"
+    return f"url:{_site(url)}{path}"
+
+
+def domain_key(url: str) -> str:
+    """Key shared by every URL on the same host (used by other per-site caches)"""
+    return f"domain:{_site(url)}"
+
+
+class FormPlanCache:
+    """
+    SQLite-backed plan cache with TTL expiry and LRU eviction
+
+    A plan is stored under the URL of the form it fills and only replayed
+    for that URL. Hosts such as docs.google.com or form-run.com serve many
+    companies' forms, and a site can have several forms, so a plan is never
+    shared with other URLs on the same host.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS form_plans (
+                key TEXT PRIMARY KEY,
+                plan TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_form_plans_lru ON form_plans(last_used_at)")
+        # Per-domain rows of earlier versions would replay one form for another
+        self._conn.execute("DELETE FROM form_plans WHERE key LIKE 'domain:%'")
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[FormPlan]:
+        """Look up the plan for the form at this exact URL"""
+        if not self.enabled:
+            return None
+        key = url_key(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT plan, created_at FROM form_plans WHERE key = ?", (key,)
+            ).fetchone()
+            plan = FormPlan.from_json(row[0]) if row is not None else None
+            if plan is not None and (now - row[1] > self.ttl_seconds or url_key(plan.form_url) != key):
+                # Expired, or learned for a form on another page
+                self._conn.execute("DELETE FROM form_plans WHERE key = ?", (key,))
+                self._conn.commit()
+                plan = None
+            if plan is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE form_plans SET last_used_at = ?, hits = hits + 1 WHERE key = ?",
+                (now, key),
+            )
+            self._conn.commit()
+            self.hits += 1
+            return plan
+
+    def put(self, plan: FormPlan) -> None:
+        """Store a plan under its form URL, evicting LRU entries if full"""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO form_plans (key, plan, created_at, last_used_at, hits) "
+                "VALUES (?, ?, ?, ?, 0)",
+                (url_key(plan.form_url), plan.to_json(), now, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM form_plans").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM form_plans WHERE key IN "
+                    "(SELECT key FROM form_plans ORDER BY last_used_at LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def invalidate(self, url: str) -> None:
+        """Drop the plan for a URL after a failed replay"""
+        with self._lock:
+            self._conn.execute("DELETE FROM form_plans WHERE key = ?", (url_key(url),))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM form_plans").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+        }
+
+
+# Singleton instance
+_form_cache: Optional[FormPlanCache] = None
+
+
+def get_form_cache() -> FormPlanCache:
+    """Get or create FormPlanCache singleton"""
+    global _form_cache
+    if _form_cache is None:
+        settings = get_settings()
+        _form_cache = FormPlanCache(
+            path=settings.form_cache_path,
+            ttl_seconds=settings.form_cache_ttl_hours * 3600,
+            max_entries=settings.form_cache_max_entries,
+            enabled=settings.form_cache_enabled,
+        )
+    return _form_cache
@@ -0,0 +1,230 @@
+"""Replayable form plans: how to fill and submit a specific contact form"""
+
+import json
+import logging
+import re
+from dataclasses import dataclass, field, asdict
+from typing import Optional, List, Dict, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+# Sender fields a plan can map inputs to
+FIELD_ROLES = ("company", "person", "email", "phone", "message")
+
+NAVIGATION_TIMEOUT_MS = 30000
+ACTION_TIMEOUT_MS = 5000
+
+# browser-use renamed click_element to click_element_by_index; accept both
+CLICK_ACTIONS = ("click_element", "click_element_by_index")
+
+# Typed text is matched to a sender value regardless of spacing and phone hyphens
+IGNORED_IN_MATCH = re.compile(r"[\s\u3000\-‐－]")
+
+
+@dataclass
+class PlanStep:
+    """
+    A single deterministic action
+
+    action: "fill", "select", "check" or "click"
+    role:   sender field whose value is filled (fill only)
+    value:  literal value when the step is not tied to a sender field
+    """
+    action: str
+    selector: str
+    role: Optional[str] = None
+    value: Optional[str] = None
+
+
+@dataclass
+class FormPlan:
+    """Resolved form: where it lives, what to fill, and what to click to submit"""
+    form_url: str
+    steps: List[PlanStep] = field(default_factory=list)
+    source: str = "agent"
+
+    @property
+    def fields(self) -> Dict[str, str]:
+        """Selector per sender role (first occurrence)"""
+        mapping: Dict[str, str] = {}
+        for step in self.steps:
+            if step.action == "fill" and step.role and step.role not in mapping:
+                mapping[step.role] = step.selector
+        return mapping
+
+    @property
+    def submit_selector(self) -> Optional[str]:
+        """Selector of the final click (the submit button)"""
+        clicks = [s.selector for s in self.steps if s.action == "click"]
+        return clicks[-1] if clicks else None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str) -> "FormPlan":
+        raw = json.loads(data)
+        return cls(
+            form_url=raw["form_url"],
+            steps=[PlanStep(**step) for step in raw.get("steps", [])],
+            source=raw.get("source", "agent"),
+        )
+
+
+@dataclass
+class ReplayResult:
+    """
+    What replaying a plan did to the page
+
+    completed: every step ran
+    clicked:   at least one click went through, so the form may have been
+               sent even if a later step failed
+    """
+    completed: bool = False
+    clicked: bool = False
+
+
+def _normalized(text: str) -> str:
+    return IGNORED_IN_MATCH.sub("", text)
+
+
+def _selector_for(element: Any) -> Optional[str]:
+    """Build the most stable Playwright selector for a browser-use DOMHistoryElement"""
+    if element is None:
+        return None
+    if any(part == "iframe" for part in element.entire_parent_branch_path):
+        # Frame-scoped elements cannot be replayed with a page-level selector
+        return None
+
+    tag = element.tag_name
+    attrs = element.attributes or {}
+    for attr in ("name", "id"):
+        if attrs.get(attr):
+            escaped = attrs[attr].replace("\\", "\\\\").replace('"', '\\"')
+            return f'{tag}[{attr}="{escaped}"]'
+    if element.css_selector:
+        return element.css_selector
+    xpath = element.xpath
+    return f"xpath=/{xpath}" if not xpath.startswith("/") else f"xpath={xpath}"
+
+
+def plan_from_history(history: Any, values: Dict[str, str]) -> Optional[FormPlan]:
+    """
+    Derive a FormPlan from a successful browser-use run
+
+    Args:
+        history: AgentHistoryList returned by Agent.run()
+        values: Sender values by role, used to recognise which input got which field
+
+    Every typed text must be one of the sender values: text the agent
+    derived or made up (a name split into 姓/名, a subject line) would be
+    replayed verbatim for every later sender, so such runs are not learned.
+
+    Returns:
+        FormPlan, or None when the run cannot be replayed deterministically
+    """
+    by_value = {_normalized(v): role for role, v in values.items() if v}
+    form_url: Optional[str] = None
+    steps: List[PlanStep] = []
+
+    for item in history.history:
+        if item.model_output is None:
+            continue
+        elements = item.state.interacted_element or []
+        for i, action in enumerate(item.model_output.action):
+            data = action.model_dump(exclude_unset=True)
+            if not data:
+                continue
+            name, params = next(iter(data.items()))
+            element = elements[i] if i < len(elements) else None
+
+            if name == "input_text":
+                selector = _selector_for(element)
+                if selector is None:
+                    return None
+                if form_url is None:
+                    form_url = item.state.url
+                text = (params or {}).get("text", "")
+                role = by_value.get(_normalized(text))
+                if role is None:
+                    logger.info(f"Not learning the plan, {selector} got text that is no sender value")
+                    return None
+                steps.append(PlanStep(action="fill", selector=selector, role=role))
+            elif name == "select_dropdown_option" and form_url is not None:
+                selector = _selector_for(element)
+                if selector is None:
+                    return None
+                steps.append(PlanStep(action="select", selector=selector, value=(params or {}).get("text")))
+            elif name in CLICK_ACTIONS and form_url is not None:
+                # Clicks before the first fill are navigation, covered by form_url
+                selector = _selector_for(element)
+                if selector is None:
+                    return None
+                steps.append(PlanStep(action="click", selector=selector))
+
+    if form_url is None or not any(s.action == "click" for s in steps):
+        return None
+    if not any(s.role == "message" for s in steps):
+        return None
+    return FormPlan(form_url=form_url, steps=steps)
+
+
+async def replay_plan(page: "Page", plan: FormPlan, values: Dict[str, str]) -> ReplayResult:
+    """
+    Fill and submit a form by replaying a plan with plain Playwright
+
+    The plan is validated before anything is submitted: every fill target
+    must be present and visible, otherwise nothing is clicked and the
+    caller can fall back to another path. Once a click has gone through the
+    form may have been sent, which the caller must not do a second time.
+
+    Args:
+        page: Playwright page to drive
+        plan: FormPlan to replay
+        values: Sender values by role
+
+    Returns:
+        ReplayResult; the caller checks the outcome of a submission with
+        verification.verify_submission
+    """
+    result = ReplayResult()
+    if plan.source == "agent" and any(s.action == "fill" and not s.role for s in plan.steps):
+        # Learned before typed text had to be a sender value
+        logger.info("Plan validation failed, it fills literal text the agent typed")
+        return result
+    try:
+        if page.url.rstrip("/") != plan.form_url.rstrip("/"):
+            await page.goto(plan.form_url, wait_until="domcontentloaded", timeout=NAVIGATION_TIMEOUT_MS)
+
+        fills = [s for s in plan.steps if s.action in ("fill", "select")]
+        for step in fills:
+            locator = page.locator(step.selector).first
+            if await locator.count() == 0 or not await locator.is_visible():
+                logger.info(f"Plan validation failed, missing field: {step.selector}")
+                return result
+
+        for step in plan.steps:
+            locator = page.locator(step.selector).first
+            if step.action == "fill":
+                value = values.get(step.role, "") if step.role else (step.value or "")
+                await locator.fill(value, timeout=ACTION_TIMEOUT_MS)
+            elif step.action == "select":
+                await locator.select_option(label=step.value, timeout=ACTION_TIMEOUT_MS)
+            elif step.action == "check":
+                # Styled checkboxes/radios are often visually hidden behind a label
+                await locator.check(timeout=ACTION_TIMEOUT_MS, force=True)
+            elif step.action == "click":
+                await locator.click(timeout=ACTION_TIMEOUT_MS)
+                result.clicked = True
+                try:
+                    await page.wait_for_load_state("domcontentloaded", timeout=ACTION_TIMEOUT_MS)
+                except Exception:
+                    pass
+
+        result.completed = True
+    except Exception as e:
+        logger.info(f"Plan replay failed{' after a click' if result.clicked else ''}: {e}")
+    return result
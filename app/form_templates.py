@@ -0,0 +1,241 @@
+"""Form-builder fingerprints (Contact Form 7, MW WP Form, HubSpot, formrun, Google Forms) and their plans"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Tuple, TYPE_CHECKING
+
+from .heuristic_filler import EXTRACT_JS, HeuristicResult, analyze
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+ACTION_TIMEOUT_MS = 5000
+
+
+@dataclass(frozen=True)
+class FormTemplate:
+    """
+    What a form builder's markup looks like, wherever it is installed
+
+    form_selector:     element the builder renders (the form or its wrapper)
+    script_pattern:    loader script src, for forms that are not rendered yet
+    frame_pattern:     iframe src of builders that embed a hosted form
+    field_names:       role -> regex on the name attribute the builder generates
+    confirm_selectors: input-page buttons that open a 確認画面
+    submit_selectors:  input-page buttons that send directly
+    send_selectors:    final 送信 button on the 確認画面
+    """
+    name: str
+    form_selector: str
+    script_pattern: Optional[str] = None
+    frame_pattern: Optional[str] = None
+    field_names: Dict[str, str] = field(default_factory=dict)
+    confirm_selectors: Tuple[str, ...] = ()
+    submit_selectors: Tuple[str, ...] = ()
+    send_selectors: Tuple[str, ...] = ()
+
+
+TEMPLATES: Tuple[FormTemplate, ...] = (
+    FormTemplate(
+        name="cf7",
+        form_selector="form.wpcf7-form",
+        script_pattern=r"/contact-form-7/",
+        field_names={
+            "company": r"^your-(company|corp|organization)",
+            "person": r"^your-name$",
+            "email": r"^your-email$",
+            "phone": r"^your-(tel|phone)",
+            "subject": r"^your-subject$",
+            "message": r"^your-(message|inquiry|content)",
+        },
+        # "Contact Form 7 add confirm" turns the submit into a 確認 button
+        confirm_selectors=(".wpcf7c-btn-confirm",),
+        submit_selectors=("form.wpcf7-form .wpcf7-submit", "form.wpcf7-form [type=\"submit\"]"),
+        send_selectors=(".wpcf7-submit:not(.wpcf7c-btn-confirm)",),
+    ),
+    FormTemplate(
+        name="mw_wp_form",
+        form_selector=".mw_wp_form form, form:has(input[name=\"mw-wp-form-form-id\"])",
+        confirm_selectors=(
+            ".mw_wp_form_input [name=\"submitConfirm\"]",
+            ".mw_wp_form_input [name=\"confirm\"]",
+        ),
+        submit_selectors=(".mw_wp_form [name=\"send\"]", ".mw_wp_form [type=\"submit\"]"),
+        send_selectors=(
+            ".mw_wp_form_confirm [name=\"send\"]",
+            ".mw_wp_form_confirm [name=\"submit\"]",
+            ".mw_wp_form_confirm [type=\"submit\"]:not([name=\"submitBack\"]):not([name=\"back\"])",
+        ),
+    ),
+    FormTemplate(
+        name="hubspot",
+        form_selector="form.hs-form",
+        script_pattern=r"js\.hsforms\.net|js\.hs-scripts\.com",
+        frame_pattern=r"hsforms\.com|share\.hsforms\.com",
+        field_names={
+            "company": r"^company$",
+            # A lone firstname field is the whole name; with lastname it stays a name part
+            "person": r"^(firstname|full_?name|name)$",
+            "email": r"^email$",
+            "phone": r"^(phone|mobilephone)$",
+            "message": r"^(message|inquiry|content)",
+        },
+        submit_selectors=("form.hs-form input.hs-button", "form.hs-form [type=\"submit\"]"),
+    ),
+    FormTemplate(
+        name="formrun",
+        form_selector="form.formrun, form[data-formrun-form]",
+        script_pattern=r"sdk\.form\.run",
+        frame_pattern=r"form\.run/(embed/)?@",
+        confirm_selectors=("[data-formrun-confirm]",),
+        submit_selectors=("[data-formrun-submitting-text]", "form.formrun [type=\"submit\"]"),
+        send_selectors=("[data-formrun-submit]", "[data-formrun-submitting-text]"),
+    ),
+    FormTemplate(
+        name="google_forms",
+        form_selector="form[action*=\"formResponse\"]",
+        frame_pattern=r"docs\.google\.com/forms/",
+        # The submit control is a div, invisible to the generic button scan
+        submit_selectors=(
+            "form[action*=\"formResponse\"] div[role=\"button\"]:has-text(\"送信\")",
+            "form[action*=\"formResponse\"] div[role=\"button\"]:has-text(\"Submit\")",
+        ),
+    ),
+)
+
+# One round trip: the first template whose form, embed frame or loader script is on the page
+FINGERPRINT_JS = r"""
+(templates) => {
+  const forms = Array.from(document.forms);
+  const srcs = Array.from(document.scripts).map(s => s.src).filter(Boolean);
+  const frames = Array.from(document.querySelectorAll('iframe')).map(f => f.src).filter(Boolean);
+  let fallback = null;
+  for (const t of templates) {
+    const root = document.querySelector(t.form);
+    if (root) {
+      const form = root.tagName === 'FORM' ? root : (root.closest('form') || root.querySelector('form'));
+      return {name: t.name, signal: 'form', form: form ? forms.indexOf(form) : -1, frame: null};
+    }
+    const frame = t.frame ? frames.find(src => new RegExp(t.frame, 'i').test(src)) : null;
+    if (frame) return {name: t.name, signal: 'frame', form: -1, frame};
+    if (!fallback && t.script && srcs.some(src => new RegExp(t.script, 'i').test(src))) {
+      fallback = {name: t.name, signal: 'script', form: -1, frame: null};
+    }
+  }
+  return fallback;
+}
+"""
+
+
+@dataclass
+class TemplateMatch:
+    """A form builder found on a page"""
+    template: FormTemplate
+    signal: str  # form (rendered in the page), frame (hosted form in an iframe) or script (loader only)
+    form_index: int = -1
+    frame_url: Optional[str] = None
+
+
+async def fingerprint(page: "Page") -> Optional[TemplateMatch]:
+    """Identify the form builder on the loaded page from its DOM, iframes and scripts"""
+    specs = [
+        {"name": t.name, "form": t.form_selector, "script": t.script_pattern, "frame": t.frame_pattern}
+        for t in TEMPLATES
+    ]
+    found = await page.evaluate(FINGERPRINT_JS, specs)
+    if not found:
+        return None
+    template = next(t for t in TEMPLATES if t.name == found["name"])
+    return TemplateMatch(template, found["signal"], found["form"], found["frame"])
+
+
+def hosted_form_url(match: TemplateMatch) -> Optional[str]:
+    """Standalone URL of an embedded hosted form, which can be filled like any page"""
+    if match.frame_url is None:
+        return None
+    if match.template.name == "google_forms":
+        return re.sub(r"([?&])embedded=true&?", r"\1", match.frame_url).rstrip("?&")
+    return match.frame_url
+
+
+async def _first_visible(page: "Page", selectors: Tuple[str, ...]) -> Optional[str]:
+    for selector in selectors:
+        locator = page.locator(selector).first
+        if await locator.count() and await locator.is_visible():
+            return selector
+    return None
+
+
+async def plan_for_template(page: "Page", match: TemplateMatch) -> HeuristicResult:
+    """
+    Build a fill-and-submit plan for a rendered builder form
+
+    The builder's own field names settle roles the generic rules would
+    guess at (or refuse, like HubSpot's firstname), and its button markup
+    gives the submit or 確認 button; everything else goes through the same
+    rules as the heuristic filler, so a required field no rule understands
+    still escalates.
+    """
+    template = match.template
+    if match.signal != "form":
+        return HeuristicResult(0.0, None, f"{template.name} form is not rendered in the page")
+
+    data = await page.evaluate(EXTRACT_JS)
+    fields, buttons = data["fields"], data["buttons"]
+    if match.form_index >= 0:
+        fields = [f for f in fields if f["form"] == match.form_index]
+        buttons = [b for b in buttons if b["form"] in (match.form_index, -1)]
+
+    names = [f["name"] for f in fields]
+    known: Dict[str, str] = {}
+    for info in fields:
+        for role, pattern in template.field_names.items():
+            if info["name"] and re.search(pattern, info["name"], re.IGNORECASE):
+                if template.name == "hubspot" and role == "person" and "lastname" in names:
+                    continue
+                known[info["selector"]] = role
+                break
+
+    submit = await _first_visible(page, template.confirm_selectors + template.submit_selectors)
+    result = analyze(fields, buttons, known_roles=known, submit_selector=submit)
+    if result.plan is not None:
+        result.plan.form_url = page.url
+        result.plan.source = f"template:{template.name}"
+    return result
+
+
+def opens_confirm_page(match: TemplateMatch, result: HeuristicResult) -> bool:
+    """Whether the plan's submit click is the builder's 確認 button"""
+    return result.plan is not None and result.plan.submit_selector in match.template.confirm_selectors
+
+
+async def advance_template_confirm(page: "Page", match: TemplateMatch, confirm: bool) -> Optional[str]:
+    """
+    Click the builder's final 送信 button after the plan clicked its 確認 button
+
+    The send button is waited for, as some builders render the confirm step
+    with JavaScript. Other confirm screens are left to SubmissionFlow.
+
+    Returns:
+        Selector of the send button that was clicked, or None
+    """
+    if not confirm or not match.template.send_selectors:
+        return None
+    combined = ", ".join(match.template.send_selectors)
+    try:
+        await page.locator(combined).first.wait_for(state="visible", timeout=ACTION_TIMEOUT_MS)
+    except Exception:
+        logger.info(f"{match.template.name}: no send button after the confirm click")
+        return None
+    selector = await _first_visible(page, match.template.send_selectors)
+    if selector is None:
+        return None
+    await page.locator(selector).first.click(timeout=ACTION_TIMEOUT_MS)
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=ACTION_TIMEOUT_MS)
+    except Exception:
+        pass
+    return selector
@@ -0,0 +1,353 @@
+"""Rule-based form filler used as a fast path before the LLM agent"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Tuple, TYPE_CHECKING
+
+from .form_plan import FormPlan, PlanStep
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+# Literal value for subject/件名 fields (no sender setting exists for it)
+DEFAULT_SUBJECT = "お問い合わせ"
+
+# Label/name/placeholder dictionary per sender role
+ROLE_PATTERNS: Dict[str, List[str]] = {
+    "email": [r"e-?mail", r"mail", r"メール", r"ﾒｰﾙ"],
+    "phone": [r"\btel", r"phone", r"電話", r"携帯", r"連絡先"],
+    "company": [
+        r"company", r"corp", r"organi[sz]ation", r"会社", r"法人", r"企業",
+        r"団体", r"組織", r"貴社", r"御社", r"社名", r"所属",
+    ],
+    "person": [r"name", r"名前", r"氏名", r"担当者", r"ご担当", r"芳名"],
+    "message": [
+        r"message", r"inquiry", r"enquiry", r"content", r"comment", r"body",
+        r"detail", r"内容", r"本文", r"お問い?合わせ", r"ご用件", r"ご質問",
+        r"ご相談", r"備考", r"メッセージ", r"ご要望",
+    ],
+    "subject": [r"subject", r"title", r"件名", r"題名", r"タイトル"],
+}
+
+# Fields we cannot fill from sender settings; if one is required we escalate
+UNFILLABLE_PATTERNS: Dict[str, List[str]] = {
+    "kana": [r"フリガナ", r"ふりがな", r"カナ", r"kana", r"furigana", r"よみ"],
+    "name_part": [
+        r"[（(]\s*[姓名]\s*[）)]", r"^\s*[姓名]\s*$", r"last[-_ ]?name", r"first[-_ ]?name",
+        r"family[-_ ]?name", r"given[-_ ]?name", r"\bsei\b", r"\bmei\b",
+    ],
+    "address": [r"住所", r"address", r"郵便", r"〒", r"\bzip", r"postal", r"都道府県", r"prefecture"],
+    "misc": [r"部署", r"役職", r"department", r"position", r"\bfax", r"url", r"website", r"ホームページ", r"\bhp\b"],
+}
+
+CONFIRM_EMAIL_PATTERN = r"確認|confirm|again|再入力|もう一度"
+CONSENT_PATTERN = r"同意|プライバシー|個人情報|規約|agree|privacy|consent"
+CHOICE_FALLBACK_PATTERN = r"その他|other|お問い?合わせ|ご相談|サービス"
+SUBMIT_PATTERN = r"送信|確認|submit|send|次へ|進む|問い合わせる|confirm"
+SUBMIT_EXCLUDE_PATTERN = r"検索|search|戻る|back|リセット|reset|クリア|clear|ログイン|login"
+FINAL_SEND_PATTERN = r"送信|submit|send|この内容で|確定"
+BACK_PATTERN = r"戻る|back|修正|訂正"
+
+# Collected in one round trip: every visible control with the text around it
+EXTRACT_JS = r"""
+() => {
+  const esc = s => s.replace(/["\\]/g, '\\$&');
+  const visible = el => {
+    const r = el.getBoundingClientRect();
+    const st = getComputedStyle(el);
+    return r.width > 0 && r.height > 0 && st.visibility !== 'hidden' && st.display !== 'none';
+  };
+  const selectorFor = el => {
+    const tag = el.tagName.toLowerCase();
+    const name = el.getAttribute('name');
+    if (name && document.querySelectorAll(`${tag}[name="${esc(name)}"]`).length === 1) {
+      return `${tag}[name="${esc(name)}"]`;
+    }
+    if (el.id) return `${tag}[id="${esc(el.id)}"]`;
+    const parts = [];
+    let node = el;
+    while (node && node.nodeType === 1 && node !== document.body) {
+      let i = 1, sib = node;
+      while ((sib = sib.previousElementSibling)) if (sib.tagName === node.tagName) i++;
+      parts.unshift(`${node.tagName.toLowerCase()}:nth-of-type(${i})`);
+      node = node.parentElement;
+    }
+    return 'body > ' + parts.join(' > ');
+  };
+  const labelFor = el => {
+    const texts = [];
+    if (el.labels) for (const l of el.labels) texts.push(l.innerText);
+    const by = el.getAttribute('aria-labelledby');
+    if (by) by.split(/\s+/).forEach(id => { const n = document.getElementById(id); if (n) texts.push(n.innerText); });
+    const cell = el.closest('td, dd');
+    if (cell) {
+      const row = cell.closest('tr');
+      const th = row ? row.querySelector('th') : null;
+      if (th) texts.push(th.innerText);
+      else {
+        const prev = cell.previousElementSibling;
+        if (prev && /^(DT|TH|TD)$/.test(prev.tagName)) texts.push(prev.innerText);
+      }
+    }
+    if (!texts.length) {
+      // CF7-style "<p>Label<br><span><input></span></p>": only trust small wrappers
+      const wrap = el.closest('p, li, div');
+      if (wrap && wrap.querySelectorAll('input, textarea, select').length <= 2) {
+        texts.push((wrap.innerText || '').slice(0, 80));
+      }
+    }
+    return texts.join(' ').replace(/\s+/g, ' ').trim().slice(0, 120);
+  };
+  const forms = Array.from(document.forms);
+  const fields = [];
+  for (const el of document.querySelectorAll('input, textarea, select')) {
+    const tag = el.tagName.toLowerCase();
+    const type = (tag === 'input' ? (el.getAttribute('type') || 'text') : tag).toLowerCase();
+    if (['hidden', 'submit', 'button', 'image', 'reset', 'file', 'password', 'search'].includes(type)) continue;
+    const isChoice = type === 'checkbox' || type === 'radio';
+    if (!isChoice && !visible(el)) continue;
+    if (el.disabled || el.readOnly) continue;
+    const label = labelFor(el);
+    fields.push({
+      selector: selectorFor(el),
+      tag, type,
+      name: el.getAttribute('name') || '',
+      id: el.id || '',
+      placeholder: el.getAttribute('placeholder') || '',
+      autocomplete: el.getAttribute('autocomplete') || '',
+      aria: el.getAttribute('aria-label') || '',
+      label,
+      value: el.value || '',
+      required: el.required || el.getAttribute('aria-required') === 'true' || /必須|required|\*/i.test(label),
+      form: el.form ? forms.indexOf(el.form) : -1,
+      options: tag === 'select' ? Array.from(el.options).map(o => o.text.trim()) : [],
+    });
+  }
+  const buttons = [];
+  for (const el of document.querySelectorAll('button, input[type=submit], input[type=button], input[type=image]')) {
+    if (!visible(el)) continue;
+    buttons.push({
+      selector: selectorFor(el),
+      text: (el.innerText || el.value || el.getAttribute('alt') || el.getAttribute('aria-label') || '').trim().slice(0, 40),
+      type: (el.getAttribute('type') || (el.tagName === 'BUTTON' ? 'submit' : '')).toLowerCase(),
+      form: el.form ? forms.indexOf(el.form) : -1,
+    });
+  }
+  return {fields, buttons};
+}
+"""
+
+
+@dataclass
+class FieldMatch:
+    """A control and the role the rules assigned to it"""
+    info: Dict[str, Any]
+    role: Optional[str]
+    score: float
+
+
+@dataclass
+class HeuristicResult:
+    """Outcome of analysing a page"""
+    confidence: float
+    plan: Optional[FormPlan]
+    reason: str
+    matches: List[FieldMatch] = field(default_factory=list)
+
+
+def _search(patterns: List[str], text: str) -> bool:
+    return any(re.search(p, text, re.IGNORECASE) for p in patterns)
+
+
+def score_field(info: Dict[str, Any]) -> Tuple[Optional[str], float]:
+    """
+    Score a single control against the role dictionary
+
+    Args:
+        info: Control description from EXTRACT_JS
+
+    Returns:
+        (role, score) where role is a sender role, an unfillable category, or None
+    """
+    label = info.get("label", "")
+    attrs = " ".join(info.get(k, "") for k in ("name", "id", "aria"))
+    placeholder = info.get("placeholder", "")
+    autocomplete = info.get("autocomplete", "").lower()
+    ftype = info.get("type", "")
+    everything = f"{label} {attrs} {placeholder}"
+
+    for category, patterns in UNFILLABLE_PATTERNS.items():
+        if _search(patterns, label) or _search(patterns, attrs) or (
+            category == "name_part" and _search(patterns, placeholder)
+        ):
+            # "お名前（フリガナ）" is kana, but "メールアドレス" must not hit "address"
+            if category == "address" and _search(ROLE_PATTERNS["email"], everything):
+                continue
+            return category, 1.0
+
+    scores: Dict[str, float] = {}
+    for role, patterns in ROLE_PATTERNS.items():
+        score = 0.0
+        if _search(patterns, label):
+            score += 0.6
+        if _search(patterns, attrs):
+            score += 0.5
+        if _search(patterns, placeholder):
+            # Without a label the placeholder is the label
+            score += 0.3 if label else 0.6
+        scores[role] = score
+
+    if ftype == "email" or autocomplete == "email":
+        scores["email"] += 0.6
+    if ftype == "tel" or autocomplete.startswith("tel"):
+        scores["phone"] += 0.6
+    if ftype == "textarea":
+        scores["message"] += 0.5
+    else:
+        # Single-line inputs are rarely the message body
+        scores["message"] -= 0.3
+    if autocomplete == "organization":
+        scores["company"] += 0.6
+    if autocomplete == "name":
+        scores["person"] += 0.6
+    if scores["company"] > 0:
+        # "company_name" / "会社名" must not count as the person's name
+        scores["person"] -= 0.6
+    if scores["email"] > 0:
+        scores["person"] -= 0.4
+
+    role, score = max(scores.items(), key=lambda item: item[1])
+    if score <= 0:
+        return None, 0.0
+    return role, min(score, 1.0)
+
+
+def analyze(
+    fields: List[Dict[str, Any]],
+    buttons: List[Dict[str, Any]],
+    known_roles: Optional[Dict[str, str]] = None,
+    submit_selector: Optional[str] = None,
+) -> HeuristicResult:
+    """
+    Decide whether the page can be filled without the LLM
+
+    Args:
+        fields: Controls from EXTRACT_JS
+        buttons: Buttons from EXTRACT_JS
+        known_roles: Roles already known by selector (form builder markup), taken with full score
+        submit_selector: Submit button already known, instead of searching the buttons
+
+    Returns:
+        HeuristicResult with a FormPlan when confidence is sufficient
+    """
+    known_roles = known_roles or {}
+    text_fields = [f for f in fields if f["type"] not in ("checkbox", "radio", "select")]
+    matches = [
+        FieldMatch(f, known_roles[f["selector"]], 1.0) if f["selector"] in known_roles
+        else FieldMatch(f, *score_field(f))
+        for f in text_fields
+    ]
+
+    message = max((m for m in matches if m.role == "message"), key=lambda m: m.score, default=None)
+    if message is None or message.score < 0.5:
+        return HeuristicResult(0.0, None, "no message field", matches)
+
+    # Work within the form that holds the message body
+    form_index = message.info["form"]
+    matches = [m for m in matches if m.info["form"] == form_index]
+    fields = [f for f in fields if f["form"] == form_index]
+
+    steps: List[PlanStep] = []
+    core_scores: List[float] = []
+    penalty = 0.0
+    used_roles: set = set()
+
+    for m in sorted(matches, key=lambda m: -m.score):
+        if m.role in UNFILLABLE_PATTERNS:
+            if m.info["required"]:
+                return HeuristicResult(0.0, None, f"required {m.role} field", matches)
+            continue
+        if m.role is None or m.score < 0.3:
+            if m.info["required"]:
+                return HeuristicResult(0.0, None, f"unrecognised required field {m.info['selector']}", matches)
+            continue
+        if m.role == "email" and "email" in used_roles:
+            # Second email box is the confirmation field
+            if not re.search(CONFIRM_EMAIL_PATTERN, f"{m.info['label']} {m.info['name']}", re.IGNORECASE):
+                continue
+        elif m.role in used_roles:
+            if m.info["required"]:
+                return HeuristicResult(0.0, None, f"ambiguous required {m.role} field", matches)
+            continue
+
+        used_roles.add(m.role)
+        if m.role == "subject":
+            steps.append(PlanStep(action="fill", selector=m.info["selector"], value=DEFAULT_SUBJECT))
+        else:
+            steps.append(PlanStep(action="fill", selector=m.info["selector"], role=m.role))
+        if m.role in ("email", "message", "company", "person"):
+            core_scores.append(m.score)
+
+    if "email" not in used_roles and "phone" not in used_roles:
+        return HeuristicResult(0.0, None, "no email or phone field", matches)
+
+    # Required selects and radio groups: pick a generic option
+    radio_groups: Dict[str, List[Dict[str, Any]]] = {}
+    for f in fields:
+        if f["type"] == "radio":
+            radio_groups.setdefault(f["name"], []).append(f)
+        elif f["type"] == "select" and f["required"]:
+            options = [o for o in f["options"] if o and not re.search(r"選択|select|--", o, re.IGNORECASE)]
+            if not options:
+                return HeuristicResult(0.0, None, "required select without options", matches)
+            choice = next((o for o in options if re.search(CHOICE_FALLBACK_PATTERN, o, re.IGNORECASE)), options[0])
+            steps.append(PlanStep(action="select", selector=f["selector"], value=choice))
+            penalty += 0.1
+        elif f["type"] == "checkbox" and re.search(CONSENT_PATTERN, f["label"], re.IGNORECASE):
+            steps.append(PlanStep(action="check", selector=f["selector"]))
+        elif f["type"] == "checkbox" and f["required"]:
+            return HeuristicResult(0.0, None, "required checkbox", matches)
+    for group in radio_groups.values():
+        if not any(r["required"] for r in group):
+            continue
+        choice = next(
+            (r for r in group if re.search(CHOICE_FALLBACK_PATTERN, r["label"], re.IGNORECASE)),
+            group[0],
+        )
+        steps.append(PlanStep(action="check", selector=choice["selector"]))
+        penalty += 0.1
+
+    if submit_selector is None:
+        candidates = [
+            b for b in buttons
+            if (b["form"] == form_index or b["form"] == -1)
+            and re.search(SUBMIT_PATTERN, b["text"], re.IGNORECASE)
+            and not re.search(SUBMIT_EXCLUDE_PATTERN, b["text"], re.IGNORECASE)
+        ]
+        if not candidates:
+            candidates = [b for b in buttons if b["form"] == form_index and b["type"] == "submit"]
+        if not candidates:
+            return HeuristicResult(0.0, None, "no submit button", matches)
+        submit_selector = next((b for b in candidates if b["form"] == form_index), candidates[0])["selector"]
+    steps.append(PlanStep(action="click", selector=submit_selector))
+
+    confidence = max(0.0, sum(core_scores) / len(core_scores) - penalty)
+    return HeuristicResult(
+        confidence=round(confidence, 3),
+        plan=FormPlan(form_url="", steps=steps, source="heuristic"),
+        reason="ok",
+        matches=matches,
+    )
+
+
+async def analyze_page(page: "Page") -> HeuristicResult:
+    """Extract the page's controls and run the rules"""
+    data = await page.evaluate(EXTRACT_JS)
+    result = analyze(data["fields"], data["buttons"])
+    if result.plan is not None:
+        result.plan.form_url = page.url
+    return result
+
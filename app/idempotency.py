@@ -0,0 +1,204 @@
+"""Idempotency store: never send the same message to the same form twice"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any, Awaitable, Callable
+from urllib.parse import urlparse, urlunparse
+
+from .config import get_settings
+from .models import FormSubmissionStatus, FormSubmissionRequest, FormSubmissionResponse
+
+logger = logging.getLogger(__name__)
+
+# Outcomes that would be identical if the job ran again. Failures, errors
+# and timeouts are not stored so they can be retried, unless the form may
+# already have gone out (see is_final).
+FINAL_STATUSES = (FormSubmissionStatus.SUCCESS, FormSubmissionStatus.CAPTCHA_DETECTED)
+
+
+def is_final(result: FormSubmissionResponse) -> bool:
+    """True when running the job again could only repeat or duplicate this result"""
+    return result.status in FINAL_STATUSES or result.submitted
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL: lowercase host without www., no fragment or trailing slash"""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse(("", host, path, "", parsed.query, ""))
+
+
+def request_key(request: FormSubmissionRequest) -> str:
+    """Idempotency key derived from the normalised URL, the message and sender overrides"""
+    parts = [
+        normalize_url(str(request.url)),
+        request.message.strip(),
+        request.company_name or "",
+        request.contact_person or "",
+        request.email or "",
+        request.phone or "",
+    ]
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return f"auto:{digest}"
+
+
+def header_key(value: str, index: Optional[int] = None) -> str:
+    """Key from a client Idempotency-Key header (batch rows get their position appended)"""
+    value = value.strip()
+    return f"client:{value}" if index is None else f"client:{value}#{index}"
+
+
+def key_for(
+    request: FormSubmissionRequest,
+    idempotency_key: Optional[str] = None,
+    index: Optional[int] = None,
+) -> Optional[str]:
+    """Key to deduplicate a request on (None when idempotency is disabled)"""
+    if not get_settings().idempotency_enabled:
+        return None
+    if idempotency_key and idempotency_key.strip():
+        return header_key(idempotency_key, index)
+    return request_key(request)
+
+
+class IdempotencyStore:
+    """
+    Remembers finished submissions and attaches duplicates to running ones
+
+    Completed results live in SQLite for retention_seconds. Jobs in flight
+    are tracked in memory: a duplicate that arrives while the original is
+    running awaits the same future instead of starting a second browser.
+    """
+
+    def __init__(self, path: str, retention_seconds: float):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.replayed = 0
+        self.attached = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS idempotency (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                result TEXT NOT NULL,
+                completed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_age ON idempotency(completed_at)")
+        self._conn.commit()
+
+    def lookup(self, key: str) -> Optional[FormSubmissionResponse]:
+        """Stored result for a key, if still within the retention window"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM idempotency WHERE key = ? AND completed_at >= ?", (key, cutoff)
+            ).fetchone()
+        return FormSubmissionResponse.model_validate_json(row[0]) if row else None
+
+    def store(self, key: str, result: FormSubmissionResponse) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO idempotency (key, url, result, completed_at) VALUES (?, ?, ?, ?)",
+                (key, result.url, result.model_dump_json(), now),
+            )
+            self._conn.execute(
+                "DELETE FROM idempotency WHERE completed_at < ?", (now - self.retention_seconds,)
+            )
+            self._conn.commit()
+
+    async def run(
+        self,
+        key: str,
+        execute: Callable[[], Awaitable[FormSubmissionResponse]],
+        force: bool = False,
+    ) -> FormSubmissionResponse:
+        """
+        Run a submission once per key
+
+        Args:
+            key: Idempotency key (see key_for)
+            execute: Runs the submission
+            force: Ignore a stored result and run again (the new result replaces it)
+
+        Returns:
+            The fresh result, the running original's result (deduplicated
+            "in_flight"), or the stored result (deduplicated "completed")
+        """
+        running = self._inflight.get(key)
+        if running is not None:
+            self.attached += 1
+            result = await asyncio.shield(running)
+            return result.model_copy(update={"deduplicated": "in_flight"})
+
+        # Claim the key before the first await so concurrent duplicates attach
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            stored = None if force else await asyncio.to_thread(self.lookup, key)
+            if stored is not None:
+                self.replayed += 1
+                result = stored.model_copy(update={"deduplicated": "completed"})
+            else:
+                result = await execute()
+                if is_final(result):
+                    await asyncio.to_thread(self.store, key, result)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Duplicates waiting on the future see the error; nobody else needs it
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        future.set_result(result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM idempotency").fetchone()[0]
+        return {
+            "entries": entries,
+            "in_flight": len(self._inflight),
+            "replayed": self.replayed,
+            "attached": self.attached,
+        }
+
+
+# Singleton instance
+_idempotency_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Get or create IdempotencyStore singleton"""
+    global _idempotency_store
+    if _idempotency_store is None:
+        settings = get_settings()
+        _idempotency_store = IdempotencyStore(
+            path=settings.idempotency_db_path,
+            retention_seconds=settings.idempotency_retention_hours * 3600,
+        )
+    return _idempotency_store
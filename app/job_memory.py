@@ -0,0 +1,235 @@
+"""Per-job memory: agent history retention, screenshot spooling and the memory cap"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional, List, Any, AsyncIterator, TYPE_CHECKING
+
+from .config import get_settings
+from .models import AgentStep, FormSubmissionStatus, FormSubmissionResponse
+from .telemetry import current_job_id
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Page
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Extracted page text kept per step once the step is no longer the latest
+MAX_EXTRACTED_CHARS = 500
+# Error text kept per step in the response summary
+MAX_STEP_ERROR_CHARS = 200
+
+
+class MemoryCapExceeded(Exception):
+    """Raised when a job's measured memory goes over JOB_MAX_MEMORY_MB"""
+
+    def __init__(self, used_mb: float, cap_mb: float):
+        self.used_mb = used_mb
+        self.cap_mb = cap_mb
+        super().__init__(f"job memory {used_mb:.0f}MB over the {cap_mb:.0f}MB cap")
+
+
+def history_bytes(history: Any) -> int:
+    """Approximate bytes held by an AgentHistoryList (screenshots and extracted text dominate)"""
+    total = 0
+    for item in history.history:
+        if item.state.screenshot:
+            total += len(item.state.screenshot)
+        for result in item.result:
+            total += len(result.extracted_content or "") + len(result.error or "")
+    return total
+
+
+def compact_history(history: Any, keep_screenshots: int = 1) -> None:
+    """
+    Drop what later steps and the pipeline never read again
+
+    Screenshots are cleared on all but the last `keep_screenshots` steps and
+    extracted page text is truncated on all but the last step. URLs, model
+    actions and interacted elements stay: the form URL and the learned plan
+    are read from them.
+    """
+    items = history.history
+    for index, item in enumerate(items):
+        if index < len(items) - keep_screenshots:
+            item.state.screenshot = None
+        if index < len(items) - 1:
+            for result in item.result:
+                if result.extracted_content and len(result.extracted_content) > MAX_EXTRACTED_CHARS:
+                    result.extracted_content = result.extracted_content[:MAX_EXTRACTED_CHARS] + "…"
+
+
+def summarize_step(item: Any, number: int) -> AgentStep:
+    """One agent step (AgentHistory) for the response: URL, actions and first error"""
+    actions: List[str] = []
+    if item.model_output is not None:
+        for action in item.model_output.action:
+            actions.extend(action.model_dump(exclude_unset=True).keys())
+    error = next((r.error for r in item.result if r.error), None)
+    return AgentStep(
+        step=number,
+        url=item.state.url or None,
+        actions=actions,
+        error=error[:MAX_STEP_ERROR_CHARS] if error else None,
+    )
+
+
+class JobMemory:
+    """
+    Memory held by one job: sampling, the per-job cap and what is kept for the response
+
+    A sample is the JS heap of every page in the job's browser context (read
+    over CDP) plus the agent history still held in this process. Pages that
+    grow without bound and histories full of screenshots both show up here
+    before they show up as pool-wide RSS. The history itself is reduced to
+    `steps` (one AgentStep per agent step) and a final-page screenshot on disk.
+    """
+
+    def __init__(self, cap_mb: float = 0):
+        self.cap_mb = cap_mb
+        self.peak_mb = 0.0
+        self.steps: List[AgentStep] = []
+        self.screenshot_path: Optional[str] = None
+        self.context: Optional["BrowserContext"] = None
+
+    @asynccontextmanager
+    async def watch(self, browser_context: Any) -> AsyncIterator[None]:
+        """Track a leased browser-use context; a job that raises inside it leaves a failure screenshot"""
+        page = await browser_context.get_current_page()
+        self.context = page.context
+        try:
+            yield
+        except Exception:
+            await self.screenshot(succeeded=False)
+            raise
+        finally:
+            self.context = None
+
+    def record_step(self, history: Any) -> None:
+        """Summarize the newest step of an AgentHistoryList"""
+        if history.history:
+            self.steps.append(summarize_step(history.history[-1], len(self.steps) + 1))
+
+    async def sample(self, history: Any = None, enforce: bool = True) -> float:
+        """Measure, record the peak and raise MemoryCapExceeded over the cap"""
+        used = 0
+        if self.context is not None:
+            for page in list(self.context.pages):
+                used += await _js_heap_bytes(page)
+        if history is not None:
+            used += history_bytes(history)
+        used_mb = used / MB
+        self.peak_mb = max(self.peak_mb, used_mb)
+        if enforce and self.cap_mb > 0 and used_mb > self.cap_mb:
+            raise MemoryCapExceeded(used_mb, self.cap_mb)
+        return used_mb
+
+    async def screenshot(self, succeeded: bool) -> None:
+        """Spool a screenshot of the current page if SCREENSHOTS asks for one (once per job)"""
+        if self.context is None or self.screenshot_path is not None or not should_capture(succeeded):
+            return
+        pages = [page for page in self.context.pages if not page.is_closed()]
+        if pages:
+            self.screenshot_path = await get_screenshot_spool().capture(
+                pages[-1], current_job_id() or uuid.uuid4().hex
+            )
+
+    async def finish(self, response: FormSubmissionResponse) -> None:
+        """Take the last sample and screenshot and copy the results onto the response"""
+        if self.context is not None:
+            await self.sample(enforce=False)
+            await self.screenshot(response.status == FormSubmissionStatus.SUCCESS)
+        response.screenshot_path = self.screenshot_path
+        if self.peak_mb:
+            response.peak_memory_mb = round(self.peak_mb, 1)
+        if self.steps:
+            response.agent_steps = self.steps
+
+
+async def _js_heap_bytes(page: "Page") -> int:
+    if page.is_closed():
+        return 0
+    try:
+        session = await page.context.new_cdp_session(page)
+        try:
+            await session.send("Performance.enable")
+            metrics = await session.send("Performance.getMetrics")
+        finally:
+            await session.detach()
+    except Exception as e:
+        logger.debug(f"Could not read page metrics: {e}")
+        return 0
+    values = {m["name"]: m["value"] for m in metrics.get("metrics", [])}
+    return int(values.get("JSHeapTotalSize", 0))
+
+
+def should_capture(succeeded: bool) -> bool:
+    """Whether SCREENSHOTS asks for a screenshot of a job with this outcome"""
+    mode = get_settings().screenshots
+    return mode == "always" or (mode == "failure" and not succeeded)
+
+
+class ScreenshotSpool:
+    """
+    JPEG screenshots of final pages, written straight to SCREENSHOT_DIR
+
+    Chromium encodes the JPEG and Playwright writes the file; nothing keeps
+    the image bytes after the call returns. Files older than the retention window are removed at
+    most once an hour.
+    """
+
+    def __init__(self, directory: str, quality: int, retention_hours: float):
+        self.directory = Path(directory)
+        self.quality = max(1, min(100, quality))
+        self.retention_seconds = retention_hours * 3600
+        self._last_sweep = 0.0
+
+    async def capture(self, page: "Page", name: str) -> Optional[str]:
+        """Save a viewport screenshot; returns the file path, None on failure"""
+        if page.is_closed():
+            return None
+        path = self.directory / f"{name}.jpg"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            await page.screenshot(path=str(path), type="jpeg", quality=self.quality, timeout=10000)
+        except Exception as e:
+            logger.warning(f"Screenshot failed: {e}")
+            return None
+        if time.monotonic() - self._last_sweep > 3600:
+            self._last_sweep = time.monotonic()
+            await asyncio.to_thread(self._sweep)
+        return str(path)
+
+    def _sweep(self) -> None:
+        if self.retention_seconds <= 0:
+            return
+        cutoff = time.time() - self.retention_seconds
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+        except OSError as e:
+            logger.debug(f"Screenshot sweep failed: {e}")
+
+
+# Singleton instance
+_screenshot_spool: Optional[ScreenshotSpool] = None
+
+
+def get_screenshot_spool() -> ScreenshotSpool:
+    """Get or create ScreenshotSpool singleton"""
+    global _screenshot_spool
+    if _screenshot_spool is None:
+        settings = get_settings()
+        _screenshot_spool = ScreenshotSpool(
+            settings.screenshot_dir,
+            settings.screenshot_quality,
+            settings.screenshot_retention_hours,
+        )
+    return _screenshot_spool
@@ -0,0 +1,567 @@
+"""Asynchronous job queue backed by a local SQLite store"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional, List, Set, Dict, Tuple, Any, AsyncIterator
+
+from .config import get_settings
+from .models import (
+    JobState,
+    JobInfo,
+    FormSubmissionRequest,
+    FormSubmissionResponse,
+    BatchSubmissionResponse,
+)
+from .executor import get_batch_executor, get_domain
+from .idempotency import get_idempotency_store
+from .rate_limiter import registrable_domain
+from .usage import get_metrics
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Columns added after the first release; created on open if missing
+MIGRATIONS = {
+    "worker": "TEXT",
+    "lease_until": "REAL",
+    "seq": "INTEGER",
+    "trace": "TEXT",
+    "idempotency_key": "TEXT",
+}
+
+# Queued rows looked at per claim when skipping busy sites
+CLAIM_SCAN_LIMIT = 500
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs so queued work survives a restart
+
+    The same database is the queue between the API and worker processes:
+    workers claim jobs atomically, hold them under a renewable lease and
+    write the result back; a job whose lease runs out (its worker died) is
+    claimed again. Completions are numbered (seq) in commit order so
+    pollers can follow them without missing or repeating any.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Other processes may hold the write lock while claiming
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                url TEXT NOT NULL,
+                request TEXT NOT NULL,
+                result TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in MIGRATIONS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_seq ON jobs(seq)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                host TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                concurrency INTEGER NOT NULL,
+                running INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                heartbeat_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def create(self, request: FormSubmissionRequest, idempotency_key: Optional[str] = None) -> JobInfo:
+        job = JobInfo(
+            id=uuid.uuid4().hex,
+            state=JobState.QUEUED,
+            url=str(request.url),
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, state, url, request, created_at, idempotency_key) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, job.state.value, job.url, request.model_dump_json(), job.created_at, idempotency_key),
+            )
+            self._conn.commit()
+        return job
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, state, url, result, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def get_request(self, job_id: str) -> Optional[Tuple[FormSubmissionRequest, Optional[str]]]:
+        """Request of a job and the idempotency key it runs under"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT request, idempotency_key FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return (FormSubmissionRequest.model_validate_json(row[0]), row[1]) if row else None
+
+    def get_trace(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Span timeline stored by the worker that ran the job"""
+        with self._lock:
+            row = self._conn.execute("SELECT trace FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def mark_running(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, started_at = ? WHERE id = ?",
+                (JobState.RUNNING.value, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def mark_completed(
+        self,
+        job_id: str,
+        result: FormSubmissionResponse,
+        trace: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        with self._lock:
+            # The write lock serialises completions, so MAX(seq) + 1 is unique and ordered
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, finished_at = ?, lease_until = NULL, "
+                "trace = ?, seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs) WHERE id = ?",
+                (
+                    JobState.COMPLETED.value, result.model_dump_json(), time.time(),
+                    json.dumps(trace) if trace else None, job_id,
+                ),
+            )
+            self._conn.commit()
+
+    def recover(self) -> List[str]:
+        """Re-queue jobs interrupted by a restart and return all pending ids in order"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, started_at = NULL WHERE state = ?",
+                (JobState.QUEUED.value, JobState.RUNNING.value),
+            )
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE state = ? ORDER BY created_at",
+                (JobState.QUEUED.value,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def claim(
+        self,
+        worker_id: str,
+        limit: int,
+        lease_seconds: float,
+        per_site_limit: int,
+    ) -> List[Tuple[str, FormSubmissionRequest, Optional[str]]]:
+        """
+        Take up to `limit` jobs for a worker, oldest first, with their idempotency keys
+
+        Jobs whose lease expired are taken back first. A job is skipped while
+        its registrable domain already has per_site_limit jobs running on
+        any worker, so the per-domain limit holds across the whole fleet.
+        """
+        now = time.time()
+        claimed: List[Tuple[str, FormSubmissionRequest, Optional[str]]] = []
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front: no two workers claim the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL "
+                    "WHERE state = ? AND lease_until < ?",
+                    (JobState.QUEUED.value, JobState.RUNNING.value, now),
+                )
+                running: Dict[str, int] = {}
+                for (url,) in self._conn.execute(
+                    "SELECT url FROM jobs WHERE state = ?", (JobState.RUNNING.value,)
+                ):
+                    site = registrable_domain(url)
+                    running[site] = running.get(site, 0) + 1
+                rows = self._conn.execute(
+                    "SELECT id, url, request, idempotency_key FROM jobs WHERE state = ? ORDER BY created_at LIMIT ?",
+                    (JobState.QUEUED.value, CLAIM_SCAN_LIMIT),
+                ).fetchall()
+                for job_id, url, request, key in rows:
+                    if len(claimed) >= limit:
+                        break
+                    site = registrable_domain(url)
+                    if running.get(site, 0) >= per_site_limit:
+                        continue
+                    running[site] = running.get(site, 0) + 1
+                    claimed.append((job_id, FormSubmissionRequest.model_validate_json(request), key))
+                self._conn.executemany(
+                    "UPDATE jobs SET state = ?, worker = ?, lease_until = ?, started_at = ? WHERE id = ?",
+                    [
+                        (JobState.RUNNING.value, worker_id, now + lease_seconds, now, job_id)
+                        for job_id, _, _ in claimed
+                    ],
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return claimed
+
+    def renew(self, worker_id: str, job_ids: List[str], lease_seconds: float) -> None:
+        """Extend the lease of jobs a worker is still running"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND state = ?",
+                [
+                    (time.time() + lease_seconds, job_id, worker_id, JobState.RUNNING.value)
+                    for job_id in job_ids
+                ],
+            )
+            self._conn.commit()
+
+    def completed_since(
+        self, seq: int, limit: int = 500
+    ) -> Tuple[List[Tuple[JobInfo, Optional[Dict[str, Any]]]], int]:
+        """Jobs (with their traces) completed after completion number `seq`, and the last number returned"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, state, url, result, created_at, started_at, finished_at, seq, trace "
+                "FROM jobs WHERE seq > ? ORDER BY seq LIMIT ?",
+                (seq, limit),
+            ).fetchall()
+        jobs = []
+        for row in rows:
+            jobs.append((self._to_job(row[:7]), json.loads(row[8]) if row[8] else None))
+            seq = row[7]
+        return jobs, seq
+
+    def last_seq(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM jobs").fetchone()
+        return row[0]
+
+    def counts(self) -> Dict[str, int]:
+        """Jobs per state"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE state != ? GROUP BY state",
+                (JobState.COMPLETED.value,),
+            ).fetchall()
+        return {state: count for state, count in rows}
+
+    def heartbeat(self, worker_id: str, concurrency: int, running: int, started_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workers (id, host, pid, concurrency, running, started_at, heartbeat_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (worker_id, os.uname().nodename, os.getpid(), concurrency, running, started_at, time.time()),
+            )
+            self._conn.commit()
+
+    def remove_worker(self, worker_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+            self._conn.commit()
+
+    def workers(self, stale_seconds: float) -> List[Dict[str, Any]]:
+        """Worker processes that sent a heartbeat within stale_seconds"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, host, pid, concurrency, running, started_at, heartbeat_at "
+                "FROM workers WHERE heartbeat_at >= ? ORDER BY started_at",
+                (time.time() - stale_seconds,),
+            ).fetchall()
+        keys = ("id", "host", "pid", "concurrency", "running", "started_at", "heartbeat_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    @staticmethod
+    def _to_job(row) -> JobInfo:
+        job_id, state, url, result, created_at, started_at, finished_at = row
+        return JobInfo(
+            id=job_id,
+            state=JobState(state),
+            url=url,
+            created_at=created_at,
+            started_at=started_at,
+            finished_at=finished_at,
+            result=FormSubmissionResponse.model_validate_json(result) if result else None,
+        )
+
+
+class JobManager:
+    """
+    Worker pool that drains the job store
+
+    In-process mode: workers hand each job to the shared BatchExecutor, so
+    jobs obey the same global/per-domain concurrency limits and timeouts as
+    /api/batch-submit.
+
+    Worker mode (WORKER_MODE): jobs are only written to the store and run by
+    separate `python -m app.worker` processes; a poller follows completions
+    in the store instead.
+
+    Either way finished jobs are published to every open stream.
+    """
+
+    def __init__(self, store: JobStore, workers: int, worker_mode: bool = False, poll_interval: float = 0.5):
+        self.store = store
+        self.workers = max(1, workers)
+        self.worker_mode = worker_mode
+        self.poll_interval = poll_interval
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._counts: Dict[str, int] = {}
+
+    async def start(self) -> None:
+        if self.worker_mode:
+            # Workers own the running jobs (and their leases); only follow completions
+            seq = await asyncio.to_thread(self.store.last_seq)
+            self._tasks = [asyncio.create_task(self._poll(seq))]
+            return
+        pending = await asyncio.to_thread(self.store.recover)
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+        if pending:
+            logger.info(f"Recovered {len(pending)} queued jobs")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def queued(self) -> int:
+        if self.worker_mode:
+            return self._counts.get(JobState.QUEUED.value, 0)
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> int:
+        if self.worker_mode:
+            return self._counts.get(JobState.RUNNING.value, 0)
+        return get_batch_executor().running
+
+    async def submit(self, request: FormSubmissionRequest, idempotency_key: Optional[str] = None) -> JobInfo:
+        """Queue a job; with a key it runs at most once per key (see idempotency.key_for)"""
+        job = await asyncio.to_thread(self.store.create, request, idempotency_key)
+        if not self.worker_mode:
+            self._queue.put_nowait(job.id)
+        return job
+
+    async def run(self, request: FormSubmissionRequest) -> FormSubmissionResponse:
+        """Queue a job for the worker processes and wait for its result"""
+        job = await asyncio.to_thread(self.store.create, request)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[job.id] = waiter
+        try:
+            return await waiter
+        finally:
+            self._waiters.pop(job.id, None)
+
+    async def get(self, job_id: str) -> Optional[JobInfo]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def get_trace(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Timeline of a job run in this process or, in worker mode, by a worker"""
+        trace = telemetry.get_trace_store().get(job_id)
+        if trace is not None:
+            return trace.to_dict()
+        return await asyncio.to_thread(self.store.get_trace, job_id)
+
+    async def stream(self, job_ids: Optional[List[str]] = None, heartbeat: float = 15.0) -> AsyncIterator[Optional[JobInfo]]:
+        """
+        Yield jobs as they complete
+
+        Args:
+            job_ids: Only follow these jobs and stop once all are complete.
+                     When omitted, every completion is streamed until the client disconnects.
+            heartbeat: Seconds of inactivity after which None is yielded as a keepalive
+
+        Yields:
+            Completed JobInfo objects, or None as a heartbeat
+        """
+        inbox: asyncio.Queue = asyncio.Queue()
+        self._subscribers.add(inbox)
+        try:
+            remaining = set(job_ids) if job_ids else None
+            if remaining:
+                # Jobs that finished before the client connected
+                for job_id in list(remaining):
+                    job = await self.get(job_id)
+                    if job is None or job.state == JobState.COMPLETED:
+                        remaining.discard(job_id)
+                        if job is not None:
+                            yield job
+                if not remaining:
+                    return
+
+            while True:
+                try:
+                    job = await asyncio.wait_for(inbox.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if remaining is None:
+                    yield job
+                elif job.id in remaining:
+                    remaining.discard(job.id)
+                    yield job
+                    if not remaining:
+                        return
+        finally:
+            self._subscribers.discard(inbox)
+
+    def _publish(self, job: JobInfo) -> None:
+        for inbox in list(self._subscribers):
+            inbox.put_nowait(job)
+
+    async def _worker(self) -> None:
+        executor = get_batch_executor()
+        while True:
+            job_id = await self._queue.get()
+            try:
+                pending = await asyncio.to_thread(self.store.get_request, job_id)
+                if pending is None:
+                    continue
+                request, key = pending
+                await asyncio.to_thread(self.store.mark_running, job_id)
+                result = await executor.run_one(request, idempotency_key=key, job_id=job_id)
+                await asyncio.to_thread(self.store.mark_completed, job_id, result)
+                job = await self.get(job_id)
+                if job is not None:
+                    self._publish(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker failed on {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _poll(self, seq: int) -> None:
+        """Worker mode: pick up completions written by the worker processes"""
+        while True:
+            try:
+                self._counts = await asyncio.to_thread(self.store.counts)
+                jobs, seq = await asyncio.to_thread(self.store.completed_since, seq)
+                for job, trace in jobs:
+                    # Metrics of remote jobs are counted here so /metrics and
+                    # /api/metrics cover the fleet
+                    telemetry.record_remote(job.result, trace)
+                    get_metrics().record(get_domain(job.result.discovered_url or job.result.url), job.result)
+                    waiter = self._waiters.get(job.id)
+                    if waiter is not None and not waiter.done():
+                        waiter.set_result(job.result)
+                    self._publish(job)
+                if jobs:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job poller failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+class QueueExecutor:
+    """
+    Stand-in for the BatchExecutor in the API process in worker mode
+
+    Every submission becomes a job in the store and is awaited until a
+    worker process completes it; idempotency is still enforced here.
+    """
+
+    def __init__(self, manager: JobManager):
+        self.manager = manager
+
+    @property
+    def running(self) -> int:
+        return self.manager.running
+
+    def domain_queues(self) -> Dict[str, int]:
+        """Per-domain queues live in the worker processes"""
+        return {}
+
+    async def run_one(
+        self,
+        request: FormSubmissionRequest,
+        idempotency_key: Optional[str] = None,
+    ) -> FormSubmissionResponse:
+        if idempotency_key is None:
+            return await self.manager.run(request)
+        return await get_idempotency_store().run(
+            idempotency_key, lambda: self.manager.run(request), force=request.force
+        )
+
+    async def run_batch(
+        self,
+        requests: List[FormSubmissionRequest],
+        keys: Optional[List[Optional[str]]] = None,
+    ) -> BatchSubmissionResponse:
+        started = time.perf_counter()
+        keys = keys or [None] * len(requests)
+        results = await asyncio.gather(
+            *(self.run_one(req, idempotency_key=key) for req, key in zip(requests, keys))
+        )
+        wall_clock = time.perf_counter() - started
+
+        total_job = sum(r.elapsed_seconds or 0.0 for r in results)
+        return BatchSubmissionResponse(
+            results=list(results),
+            total=len(results),
+            wall_clock_seconds=round(wall_clock, 3),
+            total_job_seconds=round(total_job, 3),
+            speedup=round(total_job / wall_clock, 2) if wall_clock > 0 else 0.0,
+        )
+
+
+# Singleton instance
+_job_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """Get or create JobManager singleton"""
+    global _job_manager
+    if _job_manager is None:
+        settings = get_settings()
+        _job_manager = JobManager(
+            store=JobStore(settings.jobs_db_path),
+            workers=settings.job_workers,
+            worker_mode=settings.worker_mode,
+            poll_interval=settings.worker_poll_interval,
+        )
+    return _job_manager
+
+
+def get_executor():
+    """Executor for the API endpoints: the BatchExecutor, or the job queue in worker mode"""
+    if get_settings().worker_mode:
+        return QueueExecutor(get_job_manager())
+    return get_batch_executor()
@@ -0,0 +1,268 @@
+"""Claude chat model factory with Anthropic prompt caching and overload retries, and LLM token accounting"""
+
+import time
+from collections import Counter
+from typing import Optional, List, Dict, Any
+from uuid import UUID
+
+from langchain_anthropic import ChatAnthropic
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult, LLMResult
+from tenacity import RetryCallState
+
+from .config import get_settings
+from .models import FormSubmissionResponse, LLMUsage
+from .retry import llm_retrying
+from .telemetry import record_span
+from .usage import ModelPrice, price_for
+
+EPHEMERAL = {"type": "ephemeral"}
+
+
+def _with_cache_control(content: Any) -> Optional[List[Dict[str, Any]]]:
+    """Return content blocks with a cache breakpoint on the last block"""
+    if isinstance(content, str):
+        if not content.strip():
+            return None
+        return [{"type": "text", "text": content, "cache_control": EPHEMERAL}]
+    if not content:
+        return None
+    blocks = list(content)
+    last = dict(blocks[-1])
+    last["cache_control"] = EPHEMERAL
+    blocks[-1] = last
+    return blocks
+
+
+def apply_cache_breakpoints(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Mark the stable prefix of a Messages API payload for prompt caching
+
+    Breakpoints (Anthropic allows four, three are used):
+
+    1. End of the system prompt. Tools and system prompt are identical for
+       every job on the same model, so this prefix is shared across jobs.
+    2. First assistant turn. browser-use opens every run with the task and
+       an example tool call, which stay fixed for the whole job.
+    3. The turn before the newest message. Each agent step appends a page
+       state after the previous steps, so step N+1 reads what step N wrote.
+    """
+    system = payload.get("system")
+    if system:
+        marked = _with_cache_control(system)
+        if marked:
+            payload["system"] = marked
+
+    messages = payload.get("messages") or []
+    targets = []
+    first_assistant = next((i for i, m in enumerate(messages) if m.get("role") == "assistant"), None)
+    if first_assistant is not None and first_assistant < len(messages) - 1:
+        targets.append(first_assistant)
+    if len(messages) >= 2 and len(messages) - 2 not in targets:
+        targets.append(len(messages) - 2)
+
+    for index in targets:
+        marked = _with_cache_control(messages[index].get("content"))
+        if marked:
+            messages[index]["content"] = marked
+    return payload
+
+
+class RetryingChatAnthropic(ChatAnthropic):
+    """
+    ChatAnthropic that waits out rate limits and overloads (429/529/5xx) per call
+
+    Only the failed request is repeated, so an overloaded API never costs
+    the job its browser state. Each retry is reported to the callbacks
+    (on_retry), which is how UsageTracker counts them.
+    """
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        retrying = llm_retrying(before_sleep=run_manager.on_retry if run_manager else None)
+        return await retrying(super()._agenerate, messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+class CachingChatAnthropic(RetryingChatAnthropic):
+    """ChatAnthropic that places prompt-caching breakpoints on every request"""
+
+    # browser-use sends a blocking "capital of France" round trip on every
+    # new Agent unless the model is marked as verified; a bad key fails the
+    # first real step just the same
+    _verified_api_keys: bool = True
+
+    def _get_request_payload(self, input_: Any, *, stop: Optional[List[str]] = None, **kwargs: Any) -> Dict:
+        payload = super()._get_request_payload(input_, stop=stop, **kwargs)
+        return apply_cache_breakpoints(payload)
+
+
+def create_llm(
+    model: str,
+    callbacks: Optional[List[BaseCallbackHandler]] = None,
+    max_tokens: int = 1024,
+) -> ChatAnthropic:
+    """
+    Create the chat model used by the agent
+
+    Args:
+        model: Claude model name
+        callbacks: LangChain callbacks attached to every call (usage tracking)
+        max_tokens: Output token cap per call
+
+    Returns:
+        CachingChatAnthropic, or RetryingChatAnthropic when caching is disabled
+    """
+    settings = get_settings()
+    cls = CachingChatAnthropic if settings.prompt_caching_enabled else RetryingChatAnthropic
+    return cls(
+        model=model,
+        temperature=0.1,
+        anthropic_api_key=settings.anthropic_api_key,
+        max_tokens=max_tokens,
+        callbacks=callbacks,
+        # Retries are handled by RetryingChatAnthropic so they are jittered and counted
+        max_retries=0,
+    )
+
+
+class UsageTracker(BaseCallbackHandler):
+    """
+    LangChain callback that records usage metadata of every ChatAnthropic call
+
+    Attached to the LLM of a single job, so it sees the agent's planning
+    steps, page extraction calls and browser-use's connectivity check.
+    """
+
+    # Called on the event loop thread; the handlers only append to lists
+    run_inline = True
+
+    def __init__(self, model: str):
+        # The agent's current model (the router switches it when a job
+        # escalates); each call is priced under the model it actually ran on
+        self.model = model
+        self.step_latency_ms: List[float] = []
+        self.step_input_tokens: List[int] = []
+        self.errors = 0
+        self.retries = 0
+        self.retry_seconds = 0.0
+        self._tokens: Dict[str, Counter] = {}
+        self._started: Dict[UUID, float] = {}
+        self._call_models: Dict[UUID, str] = {}
+
+    def _total(self, kind: str) -> int:
+        return sum(counts[kind] for counts in self._tokens.values())
+
+    @property
+    def input_tokens(self) -> int:
+        return self._total("input")
+
+    @property
+    def output_tokens(self) -> int:
+        return self._total("output")
+
+    @property
+    def cache_read_tokens(self) -> int:
+        return self._total("cache_read")
+
+    @property
+    def cache_write_tokens(self) -> int:
+        return self._total("cache_write")
+
+    @property
+    def steps(self) -> int:
+        return len(self.step_latency_ms)
+
+    def _start(self, run_id: UUID, kwargs: Dict[str, Any]) -> None:
+        self._started[run_id] = time.perf_counter()
+        # A verifier on another model shares the tracker without taking over self.model
+        self._call_models[run_id] = (kwargs.get("invocation_params") or {}).get("model") or self.model
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, kwargs)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, kwargs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        model = self._call_models.pop(run_id, self.model)
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            ended = time.perf_counter()
+            self.step_latency_ms.append(round((ended - started) * 1000, 1))
+            record_span("llm", started, ended, model=model)
+
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                details = usage.get("input_token_details") or {}
+                cache_read = details.get("cache_read") or 0
+                cache_write = details.get("cache_creation") or 0
+                self.step_input_tokens.append(usage.get("input_tokens", 0))
+                counts = self._tokens.setdefault(model, Counter())
+                # usage_metadata input_tokens include cached tokens; keep them apart
+                counts["input"] += usage.get("input_tokens", 0) - cache_read - cache_write
+                counts["output"] += usage.get("output_tokens", 0)
+                counts["cache_read"] += cache_read
+                counts["cache_write"] += cache_write
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started.pop(run_id, None)
+        self._call_models.pop(run_id, None)
+        self.errors += 1
+
+    def on_retry(self, retry_state: RetryCallState, *, run_id: UUID, **kwargs: Any) -> None:
+        self.retries += 1
+        if retry_state.next_action is not None:
+            self.retry_seconds += retry_state.next_action.sleep
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens + self.cache_read_tokens + self.cache_write_tokens
+
+    def cost(self, table: Dict[str, ModelPrice]) -> Optional[float]:
+        """USD cost of the recorded usage, None if a used model is missing from the table"""
+        cost = 0.0
+        for model, counts in self._tokens.items():
+            price = price_for(model, table)
+            if price is None:
+                return None
+            cost += (
+                counts["input"] * price.input
+                + counts["output"] * price.output
+                + counts["cache_write"] * price.cache_write
+                + counts["cache_read"] * price.cache_read
+            ) / 1_000_000
+        return round(cost, 6)
+
+    def summary(self) -> LLMUsage:
+        prompt_tokens = self.input_tokens + self.cache_read_tokens + self.cache_write_tokens
+        return LLMUsage(
+            model=self.model,
+            steps=self.steps,
+            input_tokens=self.input_tokens,
+            output_tokens=self.output_tokens,
+            cache_read_tokens=self.cache_read_tokens,
+            cache_write_tokens=self.cache_write_tokens,
+            cache_hit_rate=round(self.cache_read_tokens / prompt_tokens, 3) if prompt_tokens else None,
+            step_latency_ms=list(self.step_latency_ms),
+            step_input_tokens=list(self.step_input_tokens),
+            llm_seconds=round(sum(self.step_latency_ms) / 1000, 3),
+            failed_calls=self.errors,
+            retries=self.retries,
+            retry_seconds=round(self.retry_seconds, 3),
+        )
+
+    def apply(self, response: FormSubmissionResponse, table: Dict[str, ModelPrice]) -> FormSubmissionResponse:
+        """Fill the token/cost fields of a response from the recorded usage"""
+        response.tokens_used = self.total_tokens
+        response.cost_estimate = self.cost(table)
+        response.usage = self.summary()
+        return response
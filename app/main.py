@@ -1,23 +1,91 @@
 """FastAPI application for form submission service"""
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
+import json
 import logging
 
-from .models import FormSubmissionRequest, FormSubmissionResponse
-from .form_agent import get_form_agent
+from .models import (
+    FormSubmissionRequest,
+    FormSubmissionResponse,
+    BatchSubmissionResponse,
+    JobInfo,
+)
+from .bulk import detect_format, parse_rows, spool, stream_results
+from .browser_pool import get_browser_pool
+from .jobs import get_job_manager, get_executor
+from .form_cache import get_form_cache
+from .http_client import close_http_client
+from .usage import get_metrics
+from .model_router import get_model_router
+from .idempotency import get_idempotency_store, key_for
+from .discovery import get_contact_discovery
+from .rate_limiter import get_rate_limiter
 from .config import get_settings
+from . import telemetry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop long-lived resources"""
+    pool = get_browser_pool()
+    jobs = get_job_manager()
+    # Serve right away; browsers warm up in the background (see /ready).
+    # In worker mode the browsers live in the worker processes.
+    warmup = None
+    if not settings.worker_mode:
+        warmup = asyncio.create_task(pool.start(prewarm=settings.browser_pool_prewarm))
+    await jobs.start()
+    try:
+        yield
+    finally:
+        if warmup is not None and not warmup.done():
+            warmup.cancel()
+            await asyncio.gather(warmup, return_exceptions=True)
+        await jobs.stop()
+        await pool.close()
+        await close_http_client()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Form AI - Automated Form Submission API",
     description="Automated contact form submission using Browser Use and Claude API",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+)
+
+# Scrape-time gauges for /metrics
+telemetry.register_gauge(
+    "formai_browser_pool_browsers", "Pooled Chromium processes by state",
+    lambda: {(state,): get_browser_pool().stats()[state] for state in ("busy", "idle")},
+    ("state",),
+)
+telemetry.register_gauge(
+    "formai_browser_pool_leases", "Browser contexts currently leased",
+    lambda: {(): get_browser_pool().stats()["active_leases"]},
+)
+telemetry.register_gauge(
+    "formai_browser_pool_capacity", "Browser contexts the pool can lease at once",
+    lambda: {(): get_browser_pool().size * get_browser_pool().contexts_per_browser},
+)
+telemetry.register_gauge(
+    "formai_jobs_queued", "Async jobs waiting for a job worker",
+    lambda: {(): get_job_manager().queued},
+)
+telemetry.register_gauge(
+    "formai_jobs_running", "Jobs holding a worker slot",
+    lambda: {(): get_job_manager().running},
 )
 
 # CORS middleware
@@ -29,8 +97,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-settings = get_settings()
-
 
 @app.get("/")
 async def root():
@@ -46,16 +112,56 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "browser_pool": get_browser_pool().stats(),
+        "jobs_queued": get_job_manager().queued,
+        "workers": get_job_manager().store.workers(settings.worker_lease_seconds) if settings.worker_mode else None,
+        "form_cache": get_form_cache().stats(),
+        "model_router": get_model_router().stats(),
+        "idempotency": get_idempotency_store().stats(),
+        "discovery": get_contact_discovery().stats(),
+    }
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe
+
+    The API answers as soon as it starts; this reports whether jobs can run
+    without waiting on a browser launch.
+
+    Returns:
+        200 once the browser pool has warmed up (in worker mode: once at
+        least one worker process is alive), 503 until then
+    """
+    if settings.worker_mode:
+        workers = await asyncio.to_thread(get_job_manager().store.workers, settings.worker_lease_seconds)
+        ready = bool(workers)
+        body = {"ready": ready, "workers": len(workers)}
+    else:
+        pool = get_browser_pool().stats()
+        ready = pool["warm"] and (pool["browsers"] > 0 or not settings.browser_pool_prewarm)
+        body = {"ready": ready, "browsers": pool["browsers"], "size": pool["size"]}
+    return JSONResponse(body, status_code=200 if ready else 503)
 
 
 @app.post("/api/submit", response_model=FormSubmissionResponse)
-async def submit_form(request: FormSubmissionRequest):
+async def submit_form(
+    request: FormSubmissionRequest,
+    idempotency_key: Optional[str] = Header(None),
+):
     """
     Submit a contact form
 
+    A repeated URL + message (or Idempotency-Key header) is not submitted
+    again: it joins the running job or returns the stored result, marked
+    with "deduplicated".
+
     Args:
         request: FormSubmissionRequest with URL, message, and optional overrides
+        idempotency_key: Optional client-chosen key (Idempotency-Key header)
 
     Returns:
         FormSubmissionResponse with submission status and details
@@ -63,17 +169,9 @@ async def submit_form(request: FormSubmissionRequest):
     try:
         logger.info(f"Submitting form to: {request.url}")
 
-        agent = get_form_agent()
-
-        # Submit form
-        result = await agent.submit_form(
-            url=str(request.url),
-            message=request.message,
-            use_complex_model=request.use_complex_model,
-            company_name=request.company_name,
-            contact_person=request.contact_person,
-            email=request.email,
-            phone=request.phone,
+        # Submit form (shares the global worker limit with batch jobs)
+        result = await get_executor().run_one(
+            request, idempotency_key=key_for(request, idempotency_key)
         )
 
         logger.info(f"Form submission result: {result.status}")
@@ -85,44 +183,260 @@ async def submit_form(request: FormSubmissionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/batch-submit")
-async def batch_submit(requests: list[FormSubmissionRequest]):
+@app.post("/api/batch-submit", response_model=BatchSubmissionResponse)
+async def batch_submit(
+    requests: list[FormSubmissionRequest],
+    idempotency_key: Optional[str] = Header(None),
+):
     """
     Submit multiple forms in batch
 
+    Jobs run concurrently, bounded by BATCH_MAX_WORKERS globally and
+    BATCH_PER_DOMAIN_LIMIT per host, each under JOB_TIMEOUT seconds.
+    Rows already submitted (same URL + message, or same Idempotency-Key
+    header and row position) are answered without submitting again.
+
     Args:
         requests: List of FormSubmissionRequest objects
+        idempotency_key: Optional client-chosen key for the whole batch
 
     Returns:
-        List of FormSubmissionResponse objects
+        BatchSubmissionResponse with results in request order and timing
     """
     try:
         logger.info(f"Batch submitting {len(requests)} forms")
 
-        agent = get_form_agent()
-        results = []
-
-        for req in requests:
-            result = await agent.submit_form(
-                url=str(req.url),
-                message=req.message,
-                use_complex_model=req.use_complex_model,
-                company_name=req.company_name,
-                contact_person=req.contact_person,
-                email=req.email,
-                phone=req.phone,
-            )
-            results.append(result)
+        keys = [key_for(req, idempotency_key, index) for index, req in enumerate(requests)]
+        batch = await get_executor().run_batch(requests, keys)
 
-        logger.info(f"Batch submission completed: {len(results)} results")
+        logger.info(
+            f"Batch submission completed: {batch.total} results in "
+            f"{batch.wall_clock_seconds}s (sum of jobs {batch.total_job_seconds}s, "
+            f"speedup x{batch.speedup})"
+        )
 
-        return results
+        return batch
 
     except Exception as e:
         logger.error(f"Error in batch submission: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/bulk-submit")
+async def bulk_submit(
+    request: Request,
+    format: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Submit a spreadsheet's worth of forms from a CSV or JSONL body
+
+    The body is spooled to a temporary file, then rows are validated one at
+    a time and run through the batch executor with at most BULK_WINDOW rows
+    in flight, so memory stays flat for any number of rows. Results stream
+    back as JSONL, one line per input row in input order, each a
+    FormSubmissionResponse with its 0-based "index" (invalid rows get an
+    error line). {"event": "heartbeat"} lines may appear in between.
+
+    Args:
+        request: Body with one FormSubmissionRequest object per JSONL line,
+                 or CSV with a header of FormSubmissionRequest field names
+        format: "csv" or "jsonl"; defaults to the Content-Type (text/csv → CSV)
+        idempotency_key: Optional client-chosen key for the whole upload
+
+    Returns:
+        application/x-ndjson stream of results
+    """
+    rows_format = detect_format(request.headers.get("content-type"), format)
+    body = await spool(request.stream())
+    logger.info(f"Bulk submission started ({rows_format})")
+
+    async def results():
+        try:
+            async for line in stream_results(
+                parse_rows(body, rows_format),
+                get_executor(),
+                window=get_settings().bulk_window,
+                idempotency_key=idempotency_key,
+            ):
+                yield line
+        finally:
+            body.close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.post("/api/jobs", response_model=JobInfo, status_code=202)
+async def create_job(
+    request: FormSubmissionRequest,
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Queue a form submission and return immediately
+
+    Deduplicated like /api/submit when the job runs: a repeated URL +
+    message (or Idempotency-Key header) completes with the stored or
+    running result instead of submitting again.
+
+    Args:
+        request: FormSubmissionRequest with URL, message, and optional overrides
+        idempotency_key: Optional client-chosen key (Idempotency-Key header)
+
+    Returns:
+        JobInfo with the job id to poll or stream
+    """
+    job = await get_job_manager().submit(request, key_for(request, idempotency_key))
+    logger.info(f"Queued job {job.id} for {job.url}")
+    return job
+
+
+@app.post("/api/jobs/batch", response_model=list[JobInfo], status_code=202)
+async def create_jobs(
+    requests: list[FormSubmissionRequest],
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Queue multiple form submissions and return immediately
+
+    Rows are deduplicated like /api/batch-submit when they run.
+
+    Args:
+        requests: List of FormSubmissionRequest objects
+        idempotency_key: Optional client-chosen key for the whole batch
+
+    Returns:
+        List of JobInfo in request order
+    """
+    manager = get_job_manager()
+    jobs = [
+        await manager.submit(req, key_for(req, idempotency_key, index))
+        for index, req in enumerate(requests)
+    ]
+    logger.info(f"Queued {len(jobs)} jobs")
+    return jobs
+
+
+@app.get("/api/jobs/stream")
+async def stream_jobs(
+    request: Request,
+    ids: Optional[str] = None,
+    format: Optional[str] = None,
+):
+    """
+    Stream job results as they complete
+
+    Args:
+        ids: Comma-separated job ids to follow; the stream ends once all are complete.
+             Without ids, every completion is streamed until the client disconnects.
+        format: "ndjson" (default) or "sse". "Accept: text/event-stream" also selects SSE.
+
+    Returns:
+        NDJSON lines or SSE events carrying JobInfo payloads
+    """
+    use_sse = format == "sse" or (
+        format is None and "text/event-stream" in request.headers.get("accept", "")
+    )
+    job_ids = [i.strip() for i in ids.split(",") if i.strip()] if ids else None
+
+    async def events():
+        async for job in get_job_manager().stream(job_ids):
+            if await request.is_disconnected():
+                break
+            if use_sse:
+                if job is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: job\ndata: {job.model_dump_json()}\n\n"
+            else:
+                if job is None:
+                    yield json.dumps({"event": "heartbeat"}) + "\n"
+                else:
+                    yield job.model_dump_json() + "\n"
+
+    media_type = "text/event-stream" if use_sse else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str):
+    """
+    Get the status (and result once complete) of a job
+
+    Args:
+        job_id: Id returned by POST /api/jobs
+
+    Returns:
+        JobInfo
+    """
+    job = await get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/metrics")
+async def get_job_metrics(top: int = 10):
+    """
+    Aggregate job, token and cost metrics since the process started
+
+    Args:
+        top: Number of sites to list in the slowest / most expensive rankings
+
+    Returns:
+        Job counts by status and handler, LLM steps, token totals, cost and
+        latency percentiles
+    """
+    return get_metrics().snapshot(top=top)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Metrics in the Prometheus text exposition format
+
+    Returns:
+        Jobs by status, job and per-phase duration histograms, in-flight and
+        queued jobs, browser pool utilisation and LLM token spend
+    """
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/traces/{job_id}")
+async def get_trace(job_id: str):
+    """
+    Span timeline of a recent job
+
+    Args:
+        job_id: job_id of a FormSubmissionResponse (or the id of an async job)
+
+    Returns:
+        Spans in start order with their offset from the start of the job and
+        duration in milliseconds
+    """
+    trace = await get_job_manager().get_trace(job_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
+
+@app.get("/api/domains")
+async def get_domain_queues():
+    """
+    Per-domain queue depth and rate-limit state
+
+    Returns:
+        For each registrable domain with pending work or an active backoff:
+        jobs queued or running, jobs waiting on the rate limit, seconds until
+        the next slot, and the current backoff
+    """
+    queues = get_executor().domain_queues()
+    limits = get_rate_limiter().stats()
+    return {
+        domain: {"jobs": queues.get(domain, 0), **limits.get(domain, {})}
+        for domain in sorted(set(queues) | set(limits))
+    }
+
+
 @app.get("/api/config")
 async def get_config():
     """
@@ -138,6 +452,26 @@ async def get_config():
         "contact_person": settings.contact_person,
         "email": settings.email,
         "phone": settings.phone,
+        "batch_max_workers": settings.batch_max_workers,
+        "batch_per_domain_limit": settings.batch_per_domain_limit,
+        "job_timeout": settings.job_timeout,
+        "browser_pool_size": settings.browser_pool_size,
+        "browser_contexts_per_browser": settings.browser_contexts_per_browser,
+        "preflight_enabled": settings.preflight_enabled,
+        "discovery_enabled": settings.discovery_enabled,
+        "dom_condensation_enabled": settings.dom_condensation_enabled,
+        "form_templates_enabled": settings.form_templates_enabled,
+        "tracing_enabled": settings.tracing_enabled,
+        "agent_history_retention": settings.agent_history_retention,
+        "job_max_memory_mb": settings.job_max_memory_mb,
+        "screenshots": settings.screenshots,
+        "worker_mode": settings.worker_mode,
+        "worker_processes": settings.worker_processes,
+        "rate_limit_enabled": settings.rate_limit_enabled,
+        "rate_limit_per_minute": settings.rate_limit_per_minute,
+        "rate_limit_min_interval": settings.rate_limit_min_interval,
+        "idempotency_enabled": settings.idempotency_enabled,
+        "idempotency_retention_hours": settings.idempotency_retention_hours,
     }
 
 
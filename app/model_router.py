@@ -0,0 +1,192 @@
+"""Adaptive routing between the default (fast) and complex (accurate) model"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, TYPE_CHECKING
+
+from .config import get_settings
+from .form_cache import domain_key
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+# Cheap complexity probe run once on the landing page
+COMPLEXITY_JS = """
+() => {
+    const visible = (el) => {
+        const rect = el.getBoundingClientRect();
+        const style = getComputedStyle(el);
+        return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const skipTypes = ['hidden', 'submit', 'button', 'image', 'reset'];
+    const fields = [...document.querySelectorAll('input, textarea, select')]
+        .filter((el) => !skipTypes.includes((el.type || '').toLowerCase()) && visible(el));
+    // Embedded third-party forms (HubSpot, formrun, Google Forms, ...), not widgets or media
+    const ignoredFrames = /recaptcha|hcaptcha|challenges\\.cloudflare|youtube|vimeo|google\\.com\\/maps|googletagmanager|facebook|twitter/i;
+    const iframes = [...document.querySelectorAll('iframe')]
+        .filter((frame) => visible(frame) && frame.src && !ignoredFrames.test(frame.src));
+    const nextButtons = [...document.querySelectorAll('button, input[type="button"], input[type="submit"], a[role="button"]')]
+        .filter((el) => /次へ|次に進む|next\\s*step|continue/i.test(el.value || el.textContent || ''));
+    const stepMarkers = document.querySelectorAll('[class*="wizard"], [class*="step-"], [class*="-step"], [class*="steps"]');
+    return {
+        fields: fields.length,
+        forms: document.forms.length,
+        iframes: iframes.length,
+        multi_step: nextButtons.length > 0 || stepMarkers.length >= 2,
+    };
+}
+"""
+
+
+@dataclass
+class FormSignals:
+    """Complexity signals observed on the landing page"""
+    fields: int = 0
+    forms: int = 0
+    iframes: int = 0
+    multi_step: bool = False
+
+
+@dataclass
+class RouteDecision:
+    """Which model to run and why"""
+    model: str
+    reason: str
+    escalations: List[str] = field(default_factory=list)
+
+    @property
+    def summary(self) -> str:
+        return " -> ".join([self.reason, *self.escalations])
+
+
+async def collect_signals(page: "Page") -> FormSignals:
+    """Probe the loaded page for complexity signals (empty signals on failure)"""
+    try:
+        return FormSignals(**await page.evaluate(COMPLEXITY_JS))
+    except Exception as e:
+        logger.info(f"Complexity probe failed: {e}")
+        return FormSignals()
+
+
+class ModelRouter:
+    """
+    Picks the cheapest model likely to succeed on a site
+
+    1. An explicit use_complex_model request wins.
+    2. A domain where a model already succeeded keeps that model.
+    3. Complexity signals (many fields, embedded form iframes, multi-step
+       wizards) start on the complex model.
+    4. Everything else starts on the default model; FormAgent escalates
+       mid-job after repeated failed steps.
+
+    Successful models per domain are stored in SQLite so the choice
+    survives restarts.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        default_model: str,
+        complex_model: str,
+        field_threshold: int,
+    ):
+        self.default_model = default_model
+        self.complex_model = complex_model
+        self.field_threshold = field_threshold
+        self.escalations = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS model_routes (
+                domain TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                successes INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def remembered(self, url: str) -> Optional[str]:
+        """Model that last succeeded on the URL's domain"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT model FROM model_routes WHERE domain = ?", (domain_key(url),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def choose(self, url: str, signals: FormSignals, use_complex_model: bool = False) -> RouteDecision:
+        """Pick the starting model for a job"""
+        if use_complex_model:
+            return RouteDecision(self.complex_model, "requested")
+
+        remembered = self.remembered(url)
+        if remembered in (self.default_model, self.complex_model):
+            return RouteDecision(remembered, "domain_history")
+
+        reasons = []
+        if signals.fields >= self.field_threshold:
+            reasons.append(f"{signals.fields} fields")
+        if signals.iframes:
+            reasons.append("embedded form iframe")
+        if signals.multi_step:
+            reasons.append("multi-step flow")
+        if reasons:
+            return RouteDecision(self.complex_model, "complexity: " + ", ".join(reasons))
+        return RouteDecision(self.default_model, "default")
+
+    def escalate(self, decision: RouteDecision, reason: str) -> RouteDecision:
+        """Switch a running job to the complex model"""
+        self.escalations += 1
+        decision.model = self.complex_model
+        decision.escalations.append(f"escalated: {reason}")
+        return decision
+
+    def record(self, url: str, model: str, success: bool) -> None:
+        """Remember the model that submitted a domain's form"""
+        if not success:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO model_routes (domain, model, successes, updated_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(domain) DO UPDATE SET "
+                "successes = CASE WHEN model = excluded.model THEN successes + 1 ELSE 1 END, "
+                "model = excluded.model, updated_at = excluded.updated_at",
+                (domain_key(url), model, time.time()),
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT model, COUNT(*) FROM model_routes GROUP BY model").fetchall()
+        return {"domains_by_model": dict(rows), "escalations": self.escalations}
+
+
+# Singleton instance
+_model_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """Get or create ModelRouter singleton"""
+    global _model_router
+    if _model_router is None:
+        settings = get_settings()
+        _model_router = ModelRouter(
+            path=settings.model_router_db_path,
+            default_model=settings.default_model,
+            complex_model=settings.complex_model,
+            field_threshold=settings.router_field_threshold,
+        )
+    return _model_router
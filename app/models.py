@@ -1,7 +1,7 @@
 """Data models"""
 
 from pydantic import BaseModel, HttpUrl, Field
-from typing import Optional
+from typing import Optional, List, Dict
 from enum import Enum
 
 
@@ -14,18 +14,106 @@ class FormSubmissionStatus(str, Enum):
     ERROR = "error"
 
 
+class JobState(str, Enum):
+    """Lifecycle state of an asynchronous submission job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+
 class FormSubmissionRequest(BaseModel):
     """Request model for form submission"""
     url: HttpUrl = Field(..., description="URL of the contact form")
     message: str = Field(..., description="Message to send", min_length=1)
     use_complex_model: bool = Field(
         default=False,
-        description="Use Sonnet for complex forms (default: Haiku)"
+        description="Force the complex model (default: routed automatically, escalating when needed)"
     )
     company_name: Optional[str] = Field(None, description="Override company name")
     contact_person: Optional[str] = Field(None, description="Override contact person")
     email: Optional[str] = Field(None, description="Override email")
     phone: Optional[str] = Field(None, description="Override phone")
+    force: bool = Field(
+        default=False,
+        description="Run even if the same request already ran (skips the stored idempotent result)"
+    )
+
+
+class LLMUsage(BaseModel):
+    """Token usage summed over every LLM call of a job"""
+    model: str
+    steps: int = Field(0, description="Number of LLM calls")
+    input_tokens: int = Field(0, description="Uncached input tokens")
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    cache_hit_rate: Optional[float] = Field(
+        None, description="Share of prompt tokens served from the prompt cache"
+    )
+    step_latency_ms: List[float] = Field(default_factory=list, description="Latency of each LLM call")
+    step_input_tokens: List[int] = Field(
+        default_factory=list, description="Prompt tokens (cached or not) of each LLM call"
+    )
+    llm_seconds: float = Field(0.0, description="Total time spent waiting on the LLM")
+    failed_calls: int = 0
+    retries: int = Field(0, description="LLM calls repeated after a rate limit or overload")
+    retry_seconds: float = Field(0.0, description="Time spent waiting before those repeats")
+
+
+class PageLoad(BaseModel):
+    """Load cost of one page the browser loaded during a job"""
+    url: str
+    load_ms: Optional[float] = Field(None, description="Navigation start to load event")
+    transfer_bytes: int = Field(0, description="Bytes transferred for the document and its resources")
+    blocked_requests: int = Field(0, description="Requests aborted by the resource-blocking profile")
+
+
+class ResourceUsage(BaseModel):
+    """What the resource-blocking profile blocked during a job (request counts; bytes saved are not known)"""
+    blocked_requests: int = 0
+    blocked_by_type: Dict[str, int] = Field(default_factory=dict, description="image, media, font, tracker, ...")
+    pages: List[PageLoad] = Field(default_factory=list)
+
+
+class CondensationStep(BaseModel):
+    """Page state sent to the model at one agent step"""
+    step: int
+    mode: str = Field(..., description="form, contact_links or full (not condensed)")
+    confidence: float = Field(..., description="Confidence in the kept region (0.0 when none was found)")
+    page_tokens_before: int = Field(..., description="Estimated tokens of the full element list")
+    page_tokens_after: int = Field(..., description="Estimated tokens of the element list actually sent")
+
+
+class CondensationReport(BaseModel):
+    """DOM condensation over the agent steps of a job"""
+    steps: List[CondensationStep] = Field(default_factory=list)
+    page_tokens_before: int = 0
+    page_tokens_after: int = 0
+
+
+class SubmissionVerification(BaseModel):
+    """Outcome of checking the live page after a submission"""
+    verdict: str = Field(..., description="success, failure or ambiguous")
+    confidence: float = Field(..., description="0.0 - 1.0")
+    signals: List[str] = Field(default_factory=list, description="Evidence that was observed")
+    llm_checked: bool = Field(False, description="An LLM settled an ambiguous page")
+
+
+class AgentStep(BaseModel):
+    """Compact record of one browser-use agent step"""
+    step: int
+    url: Optional[str] = None
+    actions: List[str] = Field(default_factory=list, description="Action names (click_element, input_text, ...)")
+    error: Optional[str] = None
+
+
+class FlowTransition(BaseModel):
+    """A state the submitted form reached (input, confirm, complete, error)"""
+    state: str = Field(..., description="input, confirm, complete, error or unknown")
+    trigger: str = Field(..., description="What the page was observed after: landing, plan, agent_step, confirm_click, final")
+    url: str
+    signals: List[str] = Field(default_factory=list, description="DOM signals that decided the state")
+    at_ms: float = Field(..., description="Milliseconds since the flow started")
 
 
 class FormSubmissionResponse(BaseModel):
@@ -36,4 +124,68 @@ class FormSubmissionResponse(BaseModel):
     details: Optional[str] = None
     tokens_used: Optional[int] = None
     cost_estimate: Optional[float] = None
-    screenshot_path: Optional[str] = None
+    screenshot_path: Optional[str] = Field(
+        None, description="JPEG of the final page under SCREENSHOT_DIR (see SCREENSHOTS)"
+    )
+    elapsed_seconds: Optional[float] = None
+    job_id: Optional[str] = Field(None, description="Id of the job's span timeline (GET /api/traces/{job_id})")
+    discovered_url: Optional[str] = Field(
+        None, description="Contact form page the job started on when url was a homepage"
+    )
+    handled_by: Optional[str] = Field(
+        None, description="Pipeline path that handled the job (preflight, cached_plan, template, heuristic, agent, ...)"
+    )
+    form_template: Optional[str] = Field(
+        None, description="Form builder detected on the page (cf7, mw_wp_form, hubspot, formrun, google_forms)"
+    )
+    usage: Optional[LLMUsage] = None
+    model_used: Optional[str] = Field(None, description="Model that ran the agent (last one if escalated)")
+    routing: Optional[str] = Field(
+        None, description="Why the model was chosen, followed by any escalation reasons"
+    )
+    timeout_phase: Optional[str] = Field(
+        None, description="Phase that ran out of time or steps (navigation, discovery, fill, submit)"
+    )
+    phase_seconds: Optional[Dict[str, float]] = Field(None, description="Seconds spent in each phase")
+    verification: Optional[SubmissionVerification] = None
+    submission_flow: Optional[List[FlowTransition]] = None
+    resources: Optional[ResourceUsage] = None
+    condensation: Optional[CondensationReport] = None
+    agent_steps: Optional[List[AgentStep]] = None
+    peak_memory_mb: Optional[float] = Field(
+        None, description="Highest page JS heap plus retained agent history measured during the job"
+    )
+    failure_class: Optional[str] = Field(
+        None, description="Failure class of an unsuccessful job: transient, site or permanent"
+    )
+    attempts: Optional[int] = Field(None, description="Number of runs (more than 1 after transient failures)")
+    retry_seconds: Optional[float] = Field(
+        None, description="Seconds spent on failed attempts and backoff before the final one"
+    )
+    http_status: Optional[int] = Field(None, description="HTTP status of the page when it refused the job (e.g. 429)")
+    deduplicated: Optional[str] = Field(
+        None, description="Set on repeated submissions: in_flight (joined a running job) or completed (stored result)"
+    )
+    submitted: bool = Field(
+        False, description="A send or confirm click or a form POST happened, so the form may have gone out"
+    )
+
+
+class BatchSubmissionResponse(BaseModel):
+    """Response model for batch form submission"""
+    results: List[FormSubmissionResponse]
+    total: int
+    wall_clock_seconds: float = Field(..., description="Elapsed time for the whole batch")
+    total_job_seconds: float = Field(..., description="Sum of per-job execution times")
+    speedup: float = Field(..., description="total_job_seconds / wall_clock_seconds")
+
+
+class JobInfo(BaseModel):
+    """Asynchronous submission job"""
+    id: str
+    state: JobState
+    url: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[FormSubmissionResponse] = None
@@ -0,0 +1,235 @@
+"""Pre-flight screening: reachability and CAPTCHA checks over plain HTTP"""
+
+import asyncio
+import logging
+import re
+import socket
+import time
+from dataclasses import dataclass
+from typing import Optional, List, Dict
+
+import httpx
+
+from .config import get_settings
+from .http_client import get_http_client
+from .models import FormSubmissionStatus, FormSubmissionResponse
+from .rate_limiter import THROTTLE_STATUSES, get_rate_limiter, get_site_slots
+from .retry import FailureClass
+
+logger = logging.getLogger(__name__)
+
+# Only the head of the document is needed; CAPTCHA widgets load their
+# script/iframe well within this on real pages
+MAX_BODY_BYTES = 2 * 1024 * 1024
+
+# Byte-level signatures matched against script and iframe src, never free
+# text (a page that merely mentions "captcha" in a privacy notice is not
+# protected)
+CAPTCHA_SCRIPTS = {
+    "recaptcha": re.compile(rb"""(?:google\.com|gstatic\.com|recaptcha\.net)/recaptcha/(?:api|enterprise)""", re.IGNORECASE),
+    "hcaptcha": re.compile(rb"""(?:js|api|newassets)\.hcaptcha\.com/""", re.IGNORECASE),
+    "turnstile": re.compile(rb"""challenges\.cloudflare\.com/turnstile/""", re.IGNORECASE),
+}
+
+# Widget containers; like the in-browser check (form_agent.CAPTCHA_DOM_JS),
+# data-size="invisible" ones are ignored since they never show a challenge
+CAPTCHA_WIDGETS = {
+    "recaptcha": re.compile(rb"""<[^>]*\bclass\s*=\s*["'][^"']*\bg-recaptcha\b[^>]*>""", re.IGNORECASE),
+    "hcaptcha": re.compile(rb"""<[^>]*\bclass\s*=\s*["'][^"']*\bh-captcha\b[^>]*>""", re.IGNORECASE),
+    "turnstile": re.compile(rb"""<[^>]*\bclass\s*=\s*["'][^"']*\bcf-turnstile\b[^>]*>""", re.IGNORECASE),
+}
+INVISIBLE_WIDGET = re.compile(rb"""\bdata-size\s*=\s*["']?invisible""", re.IGNORECASE)
+
+# reCAPTCHA v3 (api.js?render=<sitekey>) is invisible and score-based;
+# forms protected only by it are submittable, so it does not block the job
+RECAPTCHA_V3 = re.compile(rb"""recaptcha/(?:api|enterprise)\.js\?render=(?!explicit)""", re.IGNORECASE)
+RECAPTCHA_ANCHOR = re.compile(rb"""recaptcha/(?:api2|enterprise)/anchor""", re.IGNORECASE)
+
+# Cloudflare's interstitial challenge ("Just a moment...") served instead of the page.
+# /cdn-cgi/challenge-platform/ alone is not enough: Cloudflare injects that
+# script into ordinary pages too
+CHALLENGE_PAGE = re.compile(
+    rb"""<title>\s*Just a moment\.\.\.|id\s*=\s*["']challenge-form["']|window\._cf_chl_opt|__cf_chl_(?:f|rt)_tk=""",
+    re.IGNORECASE,
+)
+
+# WAFs often refuse non-browser clients with these while a real browser
+# gets the page, and a 429 only says "later"; they leave the decision to
+# the browser (throttle statuses also back the domain off first)
+INCONCLUSIVE_STATUSES = (401, 403, 406, 429, 503)
+
+
+@dataclass
+class PreflightResult:
+    """Outcome of screening one URL"""
+    url: str
+    ok: bool
+    status: Optional[FormSubmissionStatus] = None
+    reason: Optional[str] = None
+    status_code: Optional[int] = None
+    final_url: Optional[str] = None
+    redirected: bool = False
+    captcha: Optional[str] = None
+    inconclusive: bool = False  # passed on, though plain HTTP could not judge the page
+    elapsed_ms: float = 0.0
+
+    def to_response(self) -> FormSubmissionResponse:
+        """Response returned for a job stopped at pre-flight"""
+        return FormSubmissionResponse(
+            status=self.status or FormSubmissionStatus.ERROR,
+            url=self.url,
+            message=f"Pre-flight check failed: {self.reason}",
+            details=self.reason,
+            tokens_used=0,
+            cost_estimate=0.0,
+            handled_by="preflight",
+            failure_class=FailureClass.SITE.value,
+            http_status=self.status_code,
+        )
+
+
+def detect_captcha_markup(body: bytes) -> Optional[str]:
+    """
+    Identify a blocking CAPTCHA from raw HTML
+
+    Returns:
+        Provider name ("recaptcha", "hcaptcha", "turnstile", "challenge"),
+        or None when the page has no interactive CAPTCHA
+    """
+    if CHALLENGE_PAGE.search(body):
+        return "challenge"
+    if RECAPTCHA_ANCHOR.search(body):
+        return "recaptcha"
+    for provider, script in CAPTCHA_SCRIPTS.items():
+        widgets = CAPTCHA_WIDGETS[provider].findall(body)
+        if widgets:
+            # Markup decides: only invisible widgets means nothing to solve
+            if any(not INVISIBLE_WIDGET.search(tag) for tag in widgets):
+                return provider
+            continue
+        if not script.search(body):
+            continue
+        if provider == "recaptcha" and RECAPTCHA_V3.search(body):
+            continue
+        # Script without a container: the widget is rendered from JavaScript
+        return provider
+    return None
+
+
+def _is_dns_failure(error: BaseException) -> bool:
+    while error is not None:
+        if isinstance(error, socket.gaierror):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class PreflightChecker:
+    """
+    Screens URLs with a single HTTP GET before any browser or LLM work
+
+    Jobs whose site does not resolve, answers with an error status, or
+    serves a CAPTCHA widget are answered immediately instead of occupying
+    a browser context and an agent run. Statuses a WAF typically gives
+    non-browser clients (403, 503, ...), 429 and a slow response are
+    passed on to the browser.
+    """
+
+    def __init__(self, timeout: float, concurrency: int):
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def check(self, url: str) -> PreflightResult:
+        """Screen a single URL"""
+        # The site's slot first, so a job waiting on a busy host holds no global slot
+        async with get_site_slots().hold(url), self._slots:
+            started = time.perf_counter()
+            result = await self._check(url)
+            result.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        if not result.ok:
+            logger.info(f"Pre-flight rejected {url}: {result.reason}")
+        elif result.inconclusive:
+            logger.info(f"Pre-flight inconclusive for {url}, leaving it to the browser: {result.reason}")
+        return result
+
+    async def check_many(self, urls: List[str]) -> Dict[str, PreflightResult]:
+        """Screen URLs concurrently (duplicates are fetched once)"""
+        unique = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(self.check(url) for url in unique))
+        return dict(zip(unique, results))
+
+    async def _check(self, url: str) -> PreflightResult:
+        client = get_http_client()
+        try:
+            async with client.stream("GET", url, timeout=self.timeout) as response:
+                buffer = bytearray()
+                async for chunk in response.aiter_bytes():
+                    buffer.extend(chunk)
+                    if len(buffer) >= MAX_BODY_BYTES:
+                        break
+                body = bytes(buffer)
+        except httpx.TimeoutException:
+            # The browser gets a much longer navigation timeout than this check
+            return PreflightResult(
+                url=url, ok=True, inconclusive=True,
+                reason=f"サイトが{self.timeout:.0f}秒以内に応答しませんでした（ブラウザで再確認します）",
+            )
+        except httpx.TooManyRedirects:
+            return PreflightResult(
+                url=url, ok=False, status=FormSubmissionStatus.ERROR,
+                reason="リダイレクトが多すぎます",
+            )
+        except httpx.HTTPError as e:
+            if _is_dns_failure(e):
+                reason = "ドメインの名前解決に失敗しました"
+            else:
+                reason = f"サイトに接続できませんでした: {e.__class__.__name__}"
+            return PreflightResult(url=url, ok=False, status=FormSubmissionStatus.ERROR, reason=reason)
+
+        final_url = str(response.url)
+        result = PreflightResult(
+            url=url,
+            ok=True,
+            status_code=response.status_code,
+            final_url=final_url,
+            redirected=bool(response.history),
+        )
+
+        content_type = response.headers.get("content-type", "")
+        captcha = detect_captcha_markup(body) if "html" in content_type or not content_type else None
+        if captcha:
+            result.ok = False
+            result.status = FormSubmissionStatus.CAPTCHA_DETECTED
+            result.captcha = captcha
+            result.reason = f"CAPTCHA ({captcha}) を検出しました"
+        elif response.status_code in INCONCLUSIVE_STATUSES:
+            result.inconclusive = True
+            if response.status_code in THROTTLE_STATUSES and get_settings().rate_limit_enabled:
+                # The job then waits out the domain's backoff before its browser run
+                get_rate_limiter().observe(url, status_code=response.status_code)
+            result.reason = f"サイトがHTTP {response.status_code}を返しました（ブラウザで再確認します）"
+        elif response.status_code >= 400:
+            result.ok = False
+            result.status = FormSubmissionStatus.ERROR
+            result.reason = f"サイトがHTTP {response.status_code}を返しました"
+        elif content_type and "html" not in content_type:
+            result.ok = False
+            result.status = FormSubmissionStatus.ERROR
+            result.reason = f"HTMLページではありません ({content_type.split(';')[0]})"
+        return result
+
+
+# Singleton instance
+_preflight_checker: Optional[PreflightChecker] = None
+
+
+def get_preflight_checker() -> PreflightChecker:
+    """Get or create PreflightChecker singleton"""
+    global _preflight_checker
+    if _preflight_checker is None:
+        settings = get_settings()
+        _preflight_checker = PreflightChecker(
+            timeout=settings.preflight_timeout,
+            concurrency=settings.preflight_concurrency,
+        )
+    return _preflight_checker
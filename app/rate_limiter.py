@@ -0,0 +1,258 @@
+"""Per-domain politeness: token-bucket rate limits with adaptive backoff"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, AsyncIterator
+from urllib.parse import urlparse
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+# Idle domains are forgotten at most this often (seconds)
+PRUNE_INTERVAL = 60.0
+
+# Second-level suffixes under which the registrable domain has three labels
+# (example.co.jp, example.co.uk, ...). Not a full public suffix list, but it
+# covers the ccTLDs our contact lists are made of.
+MULTI_LABEL_SUFFIXES = {
+    "co.jp", "ne.jp", "or.jp", "ac.jp", "go.jp", "gr.jp", "ed.jp", "lg.jp", "ad.jp",
+    "co.uk", "org.uk", "ac.uk", "gov.uk",
+    "com.au", "net.au", "org.au",
+    "com.cn", "com.tw", "com.hk", "com.sg", "co.kr", "co.nz", "com.br",
+}
+
+
+def registrable_domain(url: str) -> str:
+    """Registrable domain of a URL (www.shop.example.co.jp -> example.co.jp)"""
+    host = (urlparse(url).hostname or "").lower().rstrip(".")
+    labels = host.split(".")
+    if len(labels) <= 2 or all(label.isdigit() for label in labels):
+        return host
+    size = 3 if ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 2
+    return ".".join(labels[-size:])
+
+
+@dataclass
+class DomainBucket:
+    """Rate-limit state of one registrable domain"""
+    tokens: float
+    updated: float
+    next_slot: float = 0.0
+    backoff: float = 0.0
+    backoff_until: float = 0.0
+    waiting: int = 0
+    throttled: int = 0
+
+
+class DomainRateLimiter:
+    """
+    Spaces out jobs that hit the same registrable domain
+
+    - A token bucket (rate_per_minute, burst) caps the sustained rate.
+    - Consecutive hits are at least min_interval seconds apart.
+    - A 429/503 or a CAPTCHA doubles the domain's backoff (up to
+      max_backoff) and no new job starts there until it has passed; each
+      clean job halves it again.
+
+    Waiting happens before a job takes a global worker slot, so jobs for
+    other domains keep the workers busy in the meantime.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        min_interval: float,
+        base_backoff: float,
+        max_backoff: float,
+    ):
+        self.rate = max(rate_per_minute, 0.001) / 60
+        self.burst = max(1, burst)
+        self.min_interval = max(0.0, min_interval)
+        self.base_backoff = base_backoff
+        self.max_backoff = max(base_backoff, max_backoff)
+        self._buckets: Dict[str, DomainBucket] = {}
+        self._pruned_at = time.monotonic()
+
+    def _idle(self, bucket: DomainBucket, now: float) -> bool:
+        """Nobody waiting, no backoff and the bucket fully refilled"""
+        return (
+            not bucket.waiting
+            and not bucket.backoff
+            and bucket.backoff_until <= now
+            and bucket.next_slot <= now
+            and bucket.tokens + (now - bucket.updated) * self.rate >= self.burst
+        )
+
+    def _prune(self, now: float) -> None:
+        """Forget idle domains so long batches over many sites don't grow the table"""
+        if now - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        for domain, bucket in list(self._buckets.items()):
+            if self._idle(bucket, now):
+                del self._buckets[domain]
+
+    def _bucket(self, domain: str, now: float) -> DomainBucket:
+        bucket = self._buckets.get(domain)
+        if bucket is None:
+            bucket = self._buckets[domain] = DomainBucket(tokens=float(self.burst), updated=now)
+        return bucket
+
+    def _reserve(self, bucket: DomainBucket, now: float) -> float:
+        """Book the next slot for a hit and return the seconds until it"""
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        # Tokens may go negative: the debt is repaid by the refill before the slot
+        bucket.tokens -= 1
+        start = max(
+            now,
+            bucket.next_slot,
+            bucket.backoff_until,
+            now + max(0.0, -bucket.tokens) / self.rate,
+        )
+        bucket.next_slot = start + self.min_interval
+        return start - now
+
+    async def acquire(self, url: str) -> float:
+        """
+        Wait until the URL's domain may be hit
+
+        Returns:
+            Seconds spent waiting
+        """
+        domain = registrable_domain(url)
+        now = time.monotonic()
+        self._prune(now)
+        bucket = self._bucket(domain, now)
+        bucket.waiting += 1
+        waited = 0.0
+        try:
+            # One token per hit, however long the wait
+            delay = self._reserve(bucket, now)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                waited += delay
+                # A backoff that started while we slept postpones the booked slot
+                delay = bucket.backoff_until - time.monotonic()
+            return round(waited, 3)
+        finally:
+            bucket.waiting -= 1
+
+    def throttled(self, url: str, reason: str) -> None:
+        """The domain pushed back (429/503/CAPTCHA): double its backoff"""
+        domain = registrable_domain(url)
+        now = time.monotonic()
+        bucket = self._bucket(domain, now)
+        bucket.throttled += 1
+        bucket.backoff = min(self.max_backoff, max(self.base_backoff, bucket.backoff * 2))
+        bucket.backoff_until = max(bucket.backoff_until, now + bucket.backoff)
+        logger.warning(f"Backing off {domain} for {bucket.backoff:.0f}s ({reason})")
+
+    def succeeded(self, url: str) -> None:
+        """A clean hit: relax the domain's backoff"""
+        bucket = self._buckets.get(registrable_domain(url))
+        if bucket is not None and bucket.backoff:
+            bucket.backoff = bucket.backoff / 2 if bucket.backoff / 2 >= self.base_backoff else 0.0
+
+    def observe(
+        self,
+        url: str,
+        status_code: Optional[int] = None,
+        captcha: bool = False,
+        success: bool = False,
+    ) -> None:
+        """Feed a job outcome back into the domain's backoff"""
+        self._prune(time.monotonic())
+        if status_code in THROTTLE_STATUSES:
+            self.throttled(url, f"HTTP {status_code}")
+        elif captcha:
+            self.throttled(url, "CAPTCHA")
+        elif success:
+            self.succeeded(url)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-domain queue depth and limiter state (idle, unthrottled domains omitted)"""
+        now = time.monotonic()
+        stats = {}
+        for domain, bucket in list(self._buckets.items()):
+            if self._idle(bucket, now):
+                del self._buckets[domain]
+                continue
+            if not bucket.waiting and bucket.backoff_until <= now and bucket.next_slot <= now and not bucket.backoff:
+                continue
+            stats[domain] = {
+                "waiting": bucket.waiting,
+                "next_slot_in": round(max(0.0, bucket.next_slot - now), 1),
+                "backoff_seconds": round(bucket.backoff, 1),
+                "backoff_remaining": round(max(0.0, bucket.backoff_until - now), 1),
+                "throttled": bucket.throttled,
+            }
+        return stats
+
+
+class SiteSlots:
+    """
+    Caps concurrent plain-HTTP fetches (pre-flight, discovery) per registrable domain
+
+    These fetches run before a job reaches DomainRateLimiter.acquire; without
+    a cap a batch of rows on one host would hit it all at once. Semaphores
+    exist only while someone holds or waits for them.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, url: str) -> AsyncIterator[None]:
+        """Hold one of the URL's domain slots for the duration of a fetch"""
+        site = registrable_domain(url)
+        slot = self._slots.get(site)
+        if slot is None:
+            slot = self._slots[site] = asyncio.Semaphore(self.limit)
+        self._users[site] = self._users.get(site, 0) + 1
+        try:
+            async with slot:
+                yield
+        finally:
+            self._users[site] -= 1
+            if not self._users[site]:
+                del self._users[site]
+                del self._slots[site]
+
+
+# Singleton instances
+_rate_limiter: Optional[DomainRateLimiter] = None
+_site_slots: Optional[SiteSlots] = None
+
+
+def get_rate_limiter() -> DomainRateLimiter:
+    """Get or create DomainRateLimiter singleton"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        settings = get_settings()
+        _rate_limiter = DomainRateLimiter(
+            rate_per_minute=settings.rate_limit_per_minute,
+            burst=settings.rate_limit_burst,
+            min_interval=settings.rate_limit_min_interval,
+            base_backoff=settings.rate_limit_backoff_seconds,
+            max_backoff=settings.rate_limit_max_backoff_seconds,
+        )
+    return _rate_limiter
+
+
+def get_site_slots() -> SiteSlots:
+    """Get or create SiteSlots singleton (shared by pre-flight and discovery)"""
+    global _site_slots
+    if _site_slots is None:
+        _site_slots = SiteSlots(get_settings().http_per_site_limit)
+    return _site_slots
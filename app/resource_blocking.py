@@ -0,0 +1,172 @@
+"""Fast page-load profile: block images, media, fonts and trackers in agent browsers"""
+
+import asyncio
+import logging
+import re
+from collections import Counter
+from typing import Optional, List, Iterable, Set, Dict, Any
+from urllib.parse import urlparse
+
+from playwright.async_api import BrowserContext, Page, Route, Request
+
+from .config import get_settings
+from .models import PageLoad, ResourceUsage
+from .verification import FORM_PROVIDER_HOSTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCKED_TYPES = ("image", "media", "font")
+
+# Analytics, ad and chat-widget hosts; a request matches on its host or any parent domain
+TRACKER_HOSTS = {
+    "google-analytics.com", "googletagmanager.com", "googleadservices.com", "googlesyndication.com",
+    "doubleclick.net", "adservice.google.com", "facebook.net", "analytics.twitter.com",
+    "static.ads-twitter.com", "ads.linkedin.com", "snap.licdn.com", "analytics.tiktok.com",
+    "tr.line.me", "yjtag.yahoo.co.jp", "b.yjtag.jp", "clarity.ms", "hotjar.com", "hotjar.io",
+    "mouseflow.com", "fullstory.com", "mixpanel.com", "segment.com", "segment.io", "amplitude.com",
+    "heapanalytics.com", "criteo.com", "criteo.net", "adsrvr.org", "rubiconproject.com",
+    "taboola.com", "outbrain.com", "karte.io", "ptengine.jp", "ptengine.com", "userheat.com",
+    "mieruca.com", "ca-mpr.jp", "widget.intercom.io", "js.intercomcdn.com", "static.zdassets.com",
+    "js.driftt.com", "embed.tawk.to", "channel.io", "zopim.com", "newrelic.com", "nr-data.net",
+}
+
+# Never blocked, whatever the resource type: CAPTCHA widgets (including their
+# image challenges) and embedded form providers must load for a submission
+ALLOW_PATTERN = re.compile(
+    r"recaptcha|hcaptcha|challenges\.cloudflare\.com|turnstile|hsforms\.net|"
+    + "|".join(re.escape(host) for host in FORM_PROVIDER_HOSTS),
+    re.IGNORECASE,
+)
+
+# Load time and bytes transferred of the current document. transferSize is 0
+# for cross-origin resources without Timing-Allow-Origin, so bytes are a floor.
+PAGE_TIMING_JS = """
+() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    const resources = performance.getEntriesByType('resource');
+    return {
+        url: location.href,
+        load_ms: nav ? Math.round(nav.loadEventStart - nav.startTime) : null,
+        transfer_bytes: (nav ? nav.transferSize : 0) + resources.reduce((sum, r) => sum + (r.transferSize || 0), 0),
+    };
+}
+"""
+
+
+def is_tracker(url: str) -> bool:
+    """True when the URL's host or one of its parent domains is a known tracker"""
+    labels = (urlparse(url).hostname or "").lower().split(".")
+    return any(".".join(labels[i:]) in TRACKER_HOSTS for i in range(len(labels) - 1))
+
+
+class ResourceBlocker:
+    """
+    Aborts requests the agent does not need and records page-load cost
+
+    Installed on a browser context, so every tab the agent opens is
+    covered. Blocked resources never reach the page, which also keeps them
+    out of the screenshots and DOM the agent reads.
+
+    Only the number of blocked requests is recorded: an aborted request
+    never gets a response, so its size is unknown without downloading it.
+    Bytes saved are measured A/B by benchmarks/resource_blocking_bench.py.
+    """
+
+    def __init__(
+        self,
+        context: BrowserContext,
+        blocked_types: Iterable[str] = DEFAULT_BLOCKED_TYPES,
+        block_trackers: bool = True,
+    ):
+        self.context = context
+        self.blocked_types: Set[str] = set(blocked_types)
+        self.block_trackers = block_trackers
+        self.blocked: Counter = Counter()
+        self.pages: List[PageLoad] = []
+        self._blocked_per_page: Dict[int, int] = {}
+        self._pending: Set[asyncio.Task] = set()
+
+    @classmethod
+    async def install(
+        cls,
+        context: BrowserContext,
+        blocked_types: Optional[Iterable[str]] = None,
+        block_trackers: Optional[bool] = None,
+    ) -> "ResourceBlocker":
+        """Attach the profile to a context (types and trackers default to the settings)"""
+        settings = get_settings()
+        blocker = cls(
+            context,
+            blocked_types=blocked_types if blocked_types is not None else settings.resource_block_types,
+            block_trackers=block_trackers if block_trackers is not None else settings.resource_block_trackers,
+        )
+        await context.route("**/*", blocker._route)
+        context.on("page", blocker._watch)
+        for page in context.pages:
+            blocker._watch(page)
+        return blocker
+
+    def should_block(self, request: Request) -> Optional[str]:
+        """Reason to block a request ("image", "tracker", ...), None to let it through"""
+        url = request.url
+        if not url.startswith("http") or ALLOW_PATTERN.search(url):
+            return None
+        if request.resource_type in self.blocked_types:
+            return request.resource_type
+        if self.block_trackers and is_tracker(url):
+            return "tracker"
+        return None
+
+    async def _route(self, route: Route) -> None:
+        request = route.request
+        reason = self.should_block(request)
+        try:
+            if reason is None:
+                await route.fallback()
+                return
+            self.blocked[reason] += 1
+            page = self._page_of(request)
+            if page is not None:
+                self._blocked_per_page[id(page)] = self._blocked_per_page.get(id(page), 0) + 1
+            await route.abort("blockedbyclient")
+        except Exception as e:
+            # The context was closed while the request was in flight
+            logger.debug(f"Route handling failed for {request.url}: {e}")
+
+    @staticmethod
+    def _page_of(request: Request) -> Optional[Page]:
+        try:
+            return request.frame.page
+        except Exception:
+            # Service worker requests have no frame
+            return None
+
+    def _watch(self, page: Page) -> None:
+        page.on("load", lambda loaded: self._spawn(self._record_load(loaded)))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _record_load(self, page: Page) -> None:
+        try:
+            timing: Dict[str, Any] = await page.evaluate(PAGE_TIMING_JS)
+        except Exception as e:
+            logger.debug(f"Page timing unavailable: {e}")
+            return
+        if not timing["url"].startswith("http"):
+            return
+        self.pages.append(PageLoad(
+            url=timing["url"],
+            load_ms=timing["load_ms"],
+            transfer_bytes=int(timing["transfer_bytes"] or 0),
+            blocked_requests=self._blocked_per_page.pop(id(page), 0),
+        ))
+
+    def summary(self) -> ResourceUsage:
+        return ResourceUsage(
+            blocked_requests=sum(self.blocked.values()),
+            blocked_by_type=dict(self.blocked),
+            pages=list(self.pages),
+        )
@@ -0,0 +1,141 @@
+"""Failure classification and retry policies (job level and LLM-call level)"""
+
+import asyncio
+import logging
+import re
+from enum import Enum
+from typing import Optional, Any, Callable
+
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    retry_if_exception,
+    retry_if_result,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from .config import get_settings
+from .models import FormSubmissionResponse
+from .run_policy import Phase, BudgetExceeded
+from .job_memory import MemoryCapExceeded
+
+logger = logging.getLogger(__name__)
+
+# Anthropic answers worth waiting out: rate limit, server errors, overloaded
+LLM_RETRY_STATUSES = (429, 500, 502, 503, 504, 529)
+
+# Chromium network errors that say something about the site, not the run
+SITE_ERROR_PATTERN = re.compile(
+    r"ERR_NAME_NOT_RESOLVED|ERR_NAME_RESOLUTION_FAILED|ERR_CERT_|ERR_SSL_|ERR_CONNECTION_REFUSED|"
+    r"ERR_TOO_MANY_REDIRECTS|ERR_ADDRESS_UNREACHABLE|ERR_BLOCKED_BY",
+    re.IGNORECASE,
+)
+# Browser crashes and flaky connections; a fresh context usually gets through
+TRANSIENT_ERROR_PATTERN = re.compile(
+    r"Target (page, context or browser )?(has been )?closed|Browser has been closed|"
+    r"browser has disconnected|crash|ERR_CONNECTION_(RESET|CLOSED|ABORTED|TIMED_OUT)|"
+    r"ERR_NETWORK_CHANGED|ERR_TIMED_OUT|ERR_EMPTY_RESPONSE|ERR_HTTP2_|ERR_INTERNET_DISCONNECTED",
+    re.IGNORECASE,
+)
+
+
+class FailureClass(str, Enum):
+    """Why a job failed, which decides whether it is retried"""
+    TRANSIENT = "transient"  # retried with a fresh browser context
+    SITE = "site"  # the site itself is unreachable, slow, protected or rejects the form
+    PERMANENT = "permanent"  # retrying cannot help (bad input, bugs, API errors)
+
+
+def classify(error: BaseException) -> FailureClass:
+    """Sort an exception raised by a submission into a FailureClass"""
+    # Imported lazily: the API process never loads the SDKs
+    import anthropic
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    if isinstance(error, BudgetExceeded):
+        # A page that does not load in time is worth one more try; a run
+        # that ran out of time or steps on a loaded page is not
+        return FailureClass.TRANSIENT if error.phase == Phase.NAVIGATION else FailureClass.SITE
+    if isinstance(error, MemoryCapExceeded):
+        # The page itself grows past the cap; a fresh context would too
+        return FailureClass.SITE
+    if isinstance(error, anthropic.APIError):
+        # Overloads were already retried per call (RetryingChatAnthropic);
+        # restarting the browser run would only repeat the same calls
+        return FailureClass.PERMANENT
+    if isinstance(error, (asyncio.TimeoutError, PlaywrightTimeoutError)):
+        return FailureClass.TRANSIENT
+    text = str(error)
+    if SITE_ERROR_PATTERN.search(text):
+        return FailureClass.SITE
+    if TRANSIENT_ERROR_PATTERN.search(text):
+        return FailureClass.TRANSIENT
+    return FailureClass.PERMANENT
+
+
+def is_transient(result: FormSubmissionResponse) -> bool:
+    # Only failures before any submit are retried; after one the form may have gone out
+    return result.failure_class == FailureClass.TRANSIENT.value and not result.submitted
+
+
+def job_retrying(
+    max_attempts: int,
+    backoff: float,
+    max_backoff: float,
+    before_sleep: Optional[Callable[[RetryCallState], Any]] = None,
+) -> AsyncRetrying:
+    """
+    Retry policy for whole submissions
+
+    Retries responses classified as transient with jittered exponential
+    backoff; after the last attempt the final response is returned as is.
+    """
+    return AsyncRetrying(
+        retry=retry_if_result(is_transient),
+        stop=stop_after_attempt(max(1, max_attempts)),
+        wait=wait_random_exponential(multiplier=backoff, max=max_backoff),
+        retry_error_callback=lambda state: state.outcome.result(),
+        before_sleep=before_sleep,
+    )
+
+
+def is_llm_overload(error: BaseException) -> bool:
+    """Rate limits, overloads, server errors and dropped connections of the Anthropic API"""
+    import anthropic
+
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in LLM_RETRY_STATUSES
+    return isinstance(error, anthropic.APIConnectionError)
+
+
+def _retry_after(error: Optional[BaseException]) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0)) if response is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class _LLMWait:
+    """Jittered exponential backoff that also honours the API's retry-after header"""
+
+    def __init__(self, max_backoff: float):
+        self.max_backoff = max_backoff
+        self.jitter = wait_random_exponential(multiplier=1, max=max_backoff)
+
+    def __call__(self, state: RetryCallState) -> float:
+        retry_after = _retry_after(state.outcome.exception())
+        return min(self.max_backoff, max(self.jitter(state), retry_after))
+
+
+def llm_retrying(before_sleep: Optional[Callable[[RetryCallState], Any]] = None) -> AsyncRetrying:
+    """Retry policy for a single LLM call (the original error is re-raised when exhausted)"""
+    settings = get_settings()
+    return AsyncRetrying(
+        retry=retry_if_exception(is_llm_overload),
+        stop=stop_after_attempt(max(1, settings.llm_retry_attempts)),
+        wait=_LLMWait(settings.llm_retry_max_backoff_seconds),
+        before_sleep=before_sleep,
+        reraise=True,
+    )
@@ -0,0 +1,181 @@
+"""Step budget, per-phase deadlines and total wall-clock budget for a submission"""
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional, Dict, Any, Awaitable, TypeVar
+
+from .config import get_settings
+from .form_plan import CLICK_ACTIONS
+from .heuristic_filler import SUBMIT_PATTERN
+
+T = TypeVar("T")
+
+FILL_ACTIONS = ("input_text", "select_dropdown_option")
+SUBMIT_INPUT_TYPES = ("submit", "image", "button")
+
+
+class Phase(str, Enum):
+    """Stages a submission goes through"""
+    NAVIGATION = "navigation"
+    DISCOVERY = "discovery"
+    FILL = "fill"
+    SUBMIT = "submit"
+
+
+class BudgetExceeded(Exception):
+    """Raised when a phase deadline, the total budget or the step budget runs out"""
+
+    def __init__(self, phase: Phase, limit: str):
+        self.phase = phase
+        self.limit = limit
+        super().__init__(f"{limit} exhausted during {phase.value}")
+
+
+@dataclass
+class RunPolicy:
+    """Limits applied to one submission"""
+    max_steps: int
+    total_seconds: float
+    phase_seconds: Dict[Phase, float]
+
+    @classmethod
+    def from_settings(cls) -> "RunPolicy":
+        settings = get_settings()
+        return cls(
+            max_steps=settings.agent_max_steps,
+            total_seconds=settings.run_budget_seconds,
+            phase_seconds={
+                Phase.NAVIGATION: settings.timeout / 1000,
+                Phase.DISCOVERY: settings.phase_discovery_seconds,
+                Phase.FILL: settings.phase_fill_seconds,
+                Phase.SUBMIT: settings.phase_submit_seconds,
+            },
+        )
+
+
+class RunBudget:
+    """
+    Tracks the current phase and enforces the RunPolicy limits
+
+    Deadlines are enforced from outside the work being timed: run() waits on
+    the task and cancels it as soon as the current phase or the total budget
+    runs out, so a hung LLM call or page load cannot hold the browser.
+    """
+
+    def __init__(self, policy: RunPolicy):
+        self.policy = policy
+        self.started = time.monotonic()
+        self.phase: Optional[Phase] = None
+        self.phase_started = self.started
+        self.steps = 0
+        self.durations: Dict[str, float] = {}
+
+    def enter(self, phase: Phase) -> None:
+        """Switch to a phase (its deadline starts now)"""
+        if phase == self.phase:
+            return
+        now = time.monotonic()
+        self._close_phase(now)
+        self.phase = phase
+        self.phase_started = now
+
+    def _close_phase(self, now: float) -> None:
+        if self.phase is not None:
+            key = self.phase.value
+            self.durations[key] = round(self.durations.get(key, 0.0) + now - self.phase_started, 3)
+
+    def finish(self) -> Dict[str, float]:
+        """Close the current phase and return seconds spent per phase"""
+        now = time.monotonic()
+        self._close_phase(now)
+        self.phase_started = now
+        return dict(self.durations)
+
+    @property
+    def steps_left(self) -> int:
+        return max(0, self.policy.max_steps - self.steps)
+
+    def _limits(self) -> Dict[str, float]:
+        now = time.monotonic()
+        limits = {"total budget": self.policy.total_seconds - (now - self.started)}
+        if self.phase is not None:
+            limits[f"{self.phase.value} deadline"] = (
+                self.policy.phase_seconds[self.phase] - (now - self.phase_started)
+            )
+        return limits
+
+    def remaining(self) -> float:
+        """Seconds until the nearest deadline"""
+        return max(0.0, min(self._limits().values()))
+
+    def check(self) -> None:
+        """Raise BudgetExceeded if a deadline has passed"""
+        limits = self._limits()
+        limit = min(limits, key=limits.get)
+        if limits[limit] <= 0:
+            raise BudgetExceeded(self.phase or Phase.NAVIGATION, limit)
+
+    async def run(self, awaitable: Awaitable[T], phase: Optional[Phase] = None) -> T:
+        """
+        Await work under the current deadlines
+
+        The deadline is re-evaluated whenever the wait wakes up, so phase
+        changes made by the work itself (agent step hooks) move it.
+        """
+        if phase is not None:
+            self.enter(phase)
+        self.check()
+        task = asyncio.ensure_future(awaitable)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.remaining())
+                if done:
+                    return task.result()
+                try:
+                    self.check()
+                except BudgetExceeded:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    raise
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
+    def observe_step(self, agent: Any) -> None:
+        """
+        Step hook: count the step and infer the phase from the agent's last actions
+
+        Discovery lasts until the first field is typed into; a click on a
+        submit-like control after that starts the submit phase.
+        """
+        self.steps += 1
+        history = agent.state.history.history
+        if not history or history[-1].model_output is None:
+            return
+        item = history[-1]
+        elements = item.state.interacted_element or []
+        for i, action in enumerate(item.model_output.action):
+            data = action.model_dump(exclude_unset=True)
+            if not data:
+                continue
+            name = next(iter(data))
+            if name in FILL_ACTIONS and self.phase == Phase.DISCOVERY:
+                self.enter(Phase.FILL)
+            elif name in CLICK_ACTIONS and self.phase == Phase.FILL:
+                element = elements[i] if i < len(elements) else None
+                if element is not None and _is_submit_control(element):
+                    self.enter(Phase.SUBMIT)
+
+
+def _is_submit_control(element: Any) -> bool:
+    attrs = element.attributes or {}
+    input_type = attrs.get("type", "").lower()
+    if element.tag_name == "input" and input_type in SUBMIT_INPUT_TYPES:
+        return True
+    if element.tag_name == "button" and input_type != "button":
+        return True
+    label = " ".join(attrs.get(key, "") for key in ("value", "aria-label", "title", "name", "id", "class"))
+    return bool(re.search(SUBMIT_PATTERN, label, re.IGNORECASE))
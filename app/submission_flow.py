@@ -0,0 +1,256 @@
+"""Submission state machine: input → 確認 (confirm) → 完了 (complete), or error"""
+
+import asyncio
+import logging
+import re
+import time
+from enum import Enum
+from typing import Optional, List, Dict, Any, Tuple, TYPE_CHECKING
+
+from .models import FlowTransition
+from .heuristic_filler import EXTRACT_JS, FINAL_SEND_PATTERN, BACK_PATTERN
+from .verification import THANKS_TEXT_PATTERN, ERROR_TEXT_PATTERN
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+# Headings and titles of 確認 screens
+CONFIRM_TEXT_PATTERN = r"確認|以下の内容で|内容をご確認|confirm|review"
+
+# Forms with more than one 確認 step exist; more than this is a loop
+MAX_CONFIRM_CLICKS = 2
+ACTION_TIMEOUT_MS = 5000
+# How long a send click gets to leave the confirm screen before it counts as stuck
+TRANSITION_TIMEOUT = 10.0
+TRANSITION_POLL_INTERVAL = 0.25
+
+# Set on the confirm screen's document before the send click; gone once a new document loads
+MARK_JS = "() => { window.__submissionFlowMark = true; }"
+
+# Page signals in one round trip
+FLOW_JS = r"""
+(patterns) => {
+    const visible = (el) => {
+        const rect = el.getBoundingClientRect();
+        const style = getComputedStyle(el);
+        return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const re = (source) => new RegExp(source, 'i');
+    const body = document.body ? document.body.innerText : '';
+    const headings = [...document.querySelectorAll('h1, h2, h3, legend, .title')]
+        .filter(visible).map((el) => el.innerText || '').join(' ') + ' ' + document.title;
+    const editable = [...document.querySelectorAll('input, textarea, select')].filter((el) => {
+        const type = (el.type || '').toLowerCase();
+        return !['hidden', 'submit', 'button', 'image', 'reset', 'checkbox', 'radio', 'file'].includes(type)
+            && !el.disabled && !el.readOnly && visible(el);
+    });
+    const buttons = [...document.querySelectorAll('button, input[type=submit], input[type=button], input[type=image], [role=button]')]
+        .filter(visible)
+        .map((el) => (el.innerText || el.value || el.getAttribute('alt') || el.getAttribute('aria-label') || '').trim());
+    const send = re(patterns.send), back = re(patterns.back);
+    const notices = [...document.querySelectorAll('.wpcf7-response-output, .mw_wp_form .error, [role="alert"], .alert, .error, .errors')]
+        .filter(visible).map((el) => el.innerText || '').join(' ');
+    return {
+        url: location.href,
+        reloaded: !window.__submissionFlowMark,
+        editable: editable.length,
+        send_button: buttons.some((text) => send.test(text) && !back.test(text)),
+        back_button: buttons.some((text) => back.test(text)),
+        confirm_text: re(patterns.confirm).test(headings),
+        confirm_plugin: !!document.querySelector('.mw_wp_form_confirm, .wpcf7c-conf'),
+        thanks_text: re(patterns.thanks).test(body.slice(0, 20000)),
+        error_text: re(patterns.error).test(notices)
+            || [...document.querySelectorAll('[aria-invalid="true"], .wpcf7-not-valid, .is-invalid')].filter(visible).length > 0,
+        plugin_sent: !!document.querySelector('.wpcf7 form.sent, .wpcf7-mail-sent-ok, .mw_wp_form_complete'),
+        plugin_failed: !!document.querySelector('.wpcf7 form.invalid, .wpcf7 form.failed, .wpcf7 form.spam, .mw_wp_form_input .error'),
+    };
+}
+"""
+
+FLOW_PATTERNS = {
+    "send": FINAL_SEND_PATTERN,
+    "back": BACK_PATTERN,
+    "confirm": CONFIRM_TEXT_PATTERN,
+    "thanks": THANKS_TEXT_PATTERN,
+    "error": ERROR_TEXT_PATTERN,
+}
+
+
+class SubmissionState(str, Enum):
+    """Where a page stands in the input → confirm → complete flow"""
+    UNKNOWN = "unknown"  # no form yet (homepage, contact link page)
+    INPUT = "input"
+    CONFIRM = "confirm"
+    COMPLETE = "complete"
+    ERROR = "error"
+
+
+def classify_state(signals: Dict[str, Any], seen_form: bool) -> Tuple[SubmissionState, List[str]]:
+    """
+    Map page signals from FLOW_JS to a state, with the signals that decided it
+
+    A thank-you text only counts once a form has been seen, so a homepage
+    thanking visitors is not mistaken for a completed submission. A confirm
+    screen needs a send button, no editable fields and at least one more
+    hint (a back button, a 確認 heading or a plugin's confirm markup).
+    """
+    if signals["plugin_sent"]:
+        return SubmissionState.COMPLETE, ["plugin_sent"]
+    if seen_form and signals["thanks_text"] and signals["editable"] == 0:
+        return SubmissionState.COMPLETE, ["thanks_text", "form_gone"]
+    if signals["plugin_failed"] or signals["error_text"]:
+        return SubmissionState.ERROR, ["plugin_failed" if signals["plugin_failed"] else "error_text"]
+    if signals["editable"] == 0 and signals["send_button"]:
+        hints = [name for name in ("back_button", "confirm_text", "confirm_plugin") if signals[name]]
+        if hints:
+            return SubmissionState.CONFIRM, ["send_button"] + hints
+    if signals["editable"] > 0:
+        return SubmissionState.INPUT, ["editable_fields"]
+    return SubmissionState.UNKNOWN, []
+
+
+class SubmissionFlow:
+    """
+    Tracks one job's form through input → confirm → complete (or error)
+
+    observe() reads the page state and records a transition whenever it
+    changes; advance() clicks through 確認 screens itself, so neither the
+    rule-based paths nor the agent spend a step (or an LLM call) on them.
+    The transitions end up in the response as `submission_flow`.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.state = SubmissionState.UNKNOWN
+        self.transitions: List[FlowTransition] = []
+        self.seen_form = False
+        self.confirm_clicks = 0
+
+    async def observe(self, page: "Page", trigger: str) -> SubmissionState:
+        """Read the page and record a transition if the state changed"""
+        signals = await self._probe(page)
+        if signals is None:
+            return self.state
+        state, evidence = classify_state(signals, self.seen_form)
+        if state in (SubmissionState.INPUT, SubmissionState.CONFIRM):
+            self.seen_form = True
+        if state != self.state or trigger == "confirm_click":
+            self._record(state, trigger, signals["url"], evidence)
+        return state
+
+    async def advance(self, page: "Page", trigger: str, clicked_since: bool = False) -> Optional[str]:
+        """
+        Observe the page and click through any 確認 screen
+
+        After each send click the page must leave the confirm screen (a new
+        document or another state) before it is looked at again; a confirm
+        screen that is still there is never clicked a second time, as the
+        first click may still be on its way.
+
+        Args:
+            page: Page to observe
+            trigger: What just happened (recorded with any transition)
+            clicked_since: Someone else (the agent) clicked since the last
+                observation; on a confirm screen that click may be the send
+
+        Returns:
+            Selector of the last send button clicked, or None
+        """
+        clicked = None
+        was_confirm = self.state == SubmissionState.CONFIRM
+        state = await self.observe(page, trigger)
+        if state == SubmissionState.CONFIRM and was_confirm and clicked_since:
+            await self._mark(page)
+            if not await self._wait_for_transition(page):
+                return None
+            state = await self.observe(page, trigger)
+        while state == SubmissionState.CONFIRM and self.confirm_clicks < MAX_CONFIRM_CLICKS:
+            selector = await self._send_selector(page)
+            if selector is None:
+                break
+            await self._mark(page)
+            try:
+                await page.locator(selector).first.click(timeout=ACTION_TIMEOUT_MS)
+            except Exception as e:
+                logger.info(f"Confirm click failed: {e}")
+                break
+            self.confirm_clicks += 1
+            clicked = selector
+            left = await self._wait_for_transition(page)
+            state = await self.observe(page, "confirm_click")
+            if not left:
+                logger.info(f"Still on the confirm screen {TRANSITION_TIMEOUT:.0f}s after clicking {selector}")
+                break
+        return clicked
+
+    @property
+    def complete(self) -> bool:
+        return self.state == SubmissionState.COMPLETE
+
+    @property
+    def submitted(self) -> bool:
+        """The form left the input state: a confirm screen, a send click or the completion page"""
+        return self.confirm_clicks > 0 or any(
+            t.state in (SubmissionState.CONFIRM.value, SubmissionState.COMPLETE.value) for t in self.transitions
+        )
+
+    @property
+    def stuck_on_confirm(self) -> bool:
+        return self.state == SubmissionState.CONFIRM
+
+    async def _probe(self, page: "Page") -> Optional[Dict[str, Any]]:
+        try:
+            return await page.evaluate(FLOW_JS, FLOW_PATTERNS)
+        except Exception as e:
+            # Navigation in progress; the next observation catches up
+            logger.debug(f"Flow probe failed: {e}")
+            return None
+
+    async def _mark(self, page: "Page") -> None:
+        try:
+            await page.evaluate(MARK_JS)
+        except Exception as e:
+            logger.debug(f"Flow mark failed: {e}")
+
+    async def _wait_for_transition(self, page: "Page") -> bool:
+        """Wait until the page is a new document or no longer a confirm screen"""
+        deadline = time.perf_counter() + TRANSITION_TIMEOUT
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(TRANSITION_POLL_INTERVAL)
+            signals = await self._probe(page)
+            if signals is None:
+                continue
+            state, _ = classify_state(signals, self.seen_form)
+            if signals["reloaded"] or state != SubmissionState.CONFIRM:
+                try:
+                    await page.wait_for_load_state("domcontentloaded", timeout=ACTION_TIMEOUT_MS)
+                except Exception:
+                    pass
+                return True
+        return False
+
+    async def _send_selector(self, page: "Page") -> Optional[str]:
+        try:
+            data = await page.evaluate(EXTRACT_JS)
+        except Exception as e:
+            # Runs inside the agent's step hook, where an exception would end the job
+            logger.debug(f"Send button lookup failed: {e}")
+            return None
+        for button in data["buttons"]:
+            if re.search(FINAL_SEND_PATTERN, button["text"], re.IGNORECASE) and not re.search(
+                BACK_PATTERN, button["text"], re.IGNORECASE
+            ):
+                return button["selector"]
+        return None
+
+    def _record(self, state: SubmissionState, trigger: str, url: str, signals: List[str]) -> None:
+        self.state = state
+        self.transitions.append(FlowTransition(
+            state=state.value,
+            trigger=trigger,
+            url=url,
+            signals=signals,
+            at_ms=round((time.perf_counter() - self.started) * 1000, 1),
+        ))
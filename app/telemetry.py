@@ -0,0 +1,354 @@
+"""Prometheus-style metrics and per-job span timelines"""
+
+import bisect
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Tuple, Callable, Iterator
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds; wide enough for both an uncontended slot wait and a 5-minute agent run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named family of samples, one per label combination"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Gauge(Metric):
+    """Set directly, or read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterator[str]:
+        if self.callback is not None:
+            try:
+                values = list(self.callback().items())
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+                return
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(round(total, 6))}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: "OrderedDict[str, Metric]" = OrderedDict()
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+JOBS = REGISTRY.register(Counter(
+    "formai_jobs_total", "Finished submissions by status and pipeline path", ("status", "handled_by"),
+))
+JOB_SECONDS = REGISTRY.register(Histogram(
+    "formai_job_duration_seconds", "End-to-end duration of finished submissions", ("status",),
+))
+JOB_MEMORY_MB = REGISTRY.register(Histogram(
+    "formai_job_peak_memory_mb", "Peak page JS heap plus retained agent history per job",
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048),
+))
+JOBS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "formai_jobs_in_flight", "Submissions between intake and result",
+))
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    "formai_phase_duration_seconds",
+    "Duration of pipeline spans (discovery, preflight, domain_wait, rate_limit, worker_wait, "
+    "browser_lease, navigation, captcha_check, fingerprint, fill, agent, llm, verify)",
+    ("phase",),
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "formai_llm_tokens_total", "LLM tokens by kind (input, output, cache_read, cache_write)", ("kind",),
+))
+LLM_COST = REGISTRY.register(Counter(
+    "formai_llm_cost_usd_total", "Estimated LLM spend in USD",
+))
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Trace:
+    """Timeline of one job"""
+    job_id: str
+    url: str
+    started_at: float = field(default_factory=time.time)
+    origin: float = field(default_factory=time.perf_counter)
+    spans: List[Span] = field(default_factory=list)
+    status: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Spans as offsets from the start of the job, in milliseconds"""
+        return {
+            "job_id": self.job_id,
+            "url": self.url,
+            "started_at": self.started_at,
+            "status": self.status,
+            "spans": [
+                {
+                    "name": span.name,
+                    "start_ms": round((span.start - self.origin) * 1000, 1),
+                    "duration_ms": round((span.end - span.start) * 1000, 1) if span.end is not None else None,
+                    **({"attributes": span.attributes} if span.attributes else {}),
+                }
+                for span in self.spans
+            ],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+class TraceStore:
+    """The most recent job timelines, looked up by job id"""
+
+    def __init__(self, max_traces: int):
+        self.max_traces = max(1, max_traces)
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+
+    def add(self, trace: Trace) -> None:
+        self._traces[trace.job_id] = trace
+        self._traces.move_to_end(trace.job_id)
+        while len(self._traces) > self.max_traces:
+            self._traces.popitem(last=False)
+
+    def get(self, job_id: str) -> Optional[Trace]:
+        return self._traces.get(job_id)
+
+
+@contextmanager
+def job_trace(url: str, job_id: Optional[str] = None) -> Iterator[Trace]:
+    """
+    Trace a job: spans recorded inside the block (in this task and the
+    tasks it starts) land on its timeline
+    """
+    trace = Trace(job_id=job_id or uuid.uuid4().hex, url=url)
+    if get_settings().tracing_enabled:
+        get_trace_store().add(trace)
+    token = _current_trace.set(trace)
+    JOBS_IN_FLIGHT.inc()
+    try:
+        yield trace
+    finally:
+        JOBS_IN_FLIGHT.dec()
+        _current_trace.reset(token)
+
+
+def record_span(name: str, start: float, end: float, **attributes: Any) -> None:
+    """Record a finished span (perf_counter timestamps) on the current job and the phase histogram"""
+    PHASE_SECONDS.observe(end - start, phase=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append(Span(name, start, end, attributes))
+
+
+def current_job_id() -> Optional[str]:
+    """Id of the job traced in the current task, if any"""
+    trace = _current_trace.get()
+    return trace.job_id if trace is not None else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """Time a block as a span; attributes may be added to the yielded dict"""
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        record_span(name, start, time.perf_counter(), **attributes)
+
+
+def record_job(result: Any) -> None:
+    """Count a finished job (FormSubmissionResponse) and its token spend"""
+    status = result.status.value
+    JOBS.inc(status=status, handled_by=result.handled_by or "unknown")
+    if result.elapsed_seconds is not None:
+        JOB_SECONDS.observe(result.elapsed_seconds, status=status)
+    if result.peak_memory_mb is not None:
+        JOB_MEMORY_MB.observe(result.peak_memory_mb)
+    if result.usage is not None:
+        LLM_TOKENS.inc(result.usage.input_tokens, kind="input")
+        LLM_TOKENS.inc(result.usage.output_tokens, kind="output")
+        LLM_TOKENS.inc(result.usage.cache_read_tokens, kind="cache_read")
+        LLM_TOKENS.inc(result.usage.cache_write_tokens, kind="cache_write")
+    if result.cost_estimate:
+        LLM_COST.inc(result.cost_estimate)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.status = status
+
+
+def record_remote(result: Any, trace: Optional[Dict[str, Any]]) -> None:
+    """Count a job finished by a worker process, including its span durations"""
+    record_job(result)
+    for item in (trace or {}).get("spans", []):
+        if item.get("duration_ms") is not None:
+            PHASE_SECONDS.observe(item["duration_ms"] / 1000, phase=item["name"])
+
+
+def register_gauge(
+    name: str,
+    help: str,
+    callback: Callable[[], Dict[LabelValues, float]],
+    labelnames: Tuple[str, ...] = (),
+) -> Gauge:
+    """Expose a value owned by another component, read at scrape time"""
+    return REGISTRY.register(Gauge(name, help, labelnames, callback=callback))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# Singleton instance
+_trace_store: Optional[TraceStore] = None
+
+
+def get_trace_store() -> TraceStore:
+    """Get or create TraceStore singleton"""
+    global _trace_store
+    if _trace_store is None:
+        _trace_store = TraceStore(get_settings().trace_retention)
+    return _trace_store
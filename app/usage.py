@@ -0,0 +1,205 @@
+"""LLM pricing and aggregate job metrics"""
+
+import json
+import logging
+import statistics
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Any
+
+from .config import get_settings
+from .models import FormSubmissionResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """USD per million tokens"""
+    input: float
+    output: float
+    cache_write: float
+    cache_read: float
+
+
+def _price(input_price: float, output_price: float) -> ModelPrice:
+    # Anthropic bills 5-minute cache writes at 1.25x and cache reads at 0.1x input
+    return ModelPrice(input_price, output_price, input_price * 1.25, input_price * 0.1)
+
+
+# Matched by longest prefix of the model name, so dated snapshots
+# (claude-haiku-4-5-20251001) resolve to their family entry
+DEFAULT_PRICES: Dict[str, ModelPrice] = {
+    "claude-opus-4": _price(15.00, 75.00),
+    "claude-sonnet-4": _price(3.00, 15.00),
+    "claude-haiku-4-5": _price(1.00, 5.00),
+    "claude-3-7-sonnet": _price(3.00, 15.00),
+    "claude-3-5-sonnet": _price(3.00, 15.00),
+    "claude-3-5-haiku": _price(0.80, 4.00),
+    "claude-3-haiku": _price(0.25, 1.25),
+}
+
+
+def load_price_table(raw: Optional[str]) -> Dict[str, ModelPrice]:
+    """
+    Build the price table from the defaults plus MODEL_PRICES overrides
+
+    MODEL_PRICES is JSON keyed by model name prefix, e.g.
+    {"claude-haiku-4-5": {"input": 1.0, "output": 5.0}}; cache prices
+    default to 1.25x / 0.1x of the input price when omitted.
+    """
+    table = dict(DEFAULT_PRICES)
+    if not raw:
+        return table
+    try:
+        overrides = json.loads(raw)
+    except json.JSONDecodeError as e:
+        logger.error(f"Ignoring invalid MODEL_PRICES: {e}")
+        return table
+    for prefix, spec in overrides.items():
+        base = _price(float(spec["input"]), float(spec["output"]))
+        table[prefix] = ModelPrice(
+            input=base.input,
+            output=base.output,
+            cache_write=float(spec.get("cache_write", base.cache_write)),
+            cache_read=float(spec.get("cache_read", base.cache_read)),
+        )
+    return table
+
+
+def price_for(model: str, table: Dict[str, ModelPrice]) -> Optional[ModelPrice]:
+    matches = [prefix for prefix in table if model.startswith(prefix)]
+    return table[max(matches, key=len)] if matches else None
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1)))], 1)
+
+
+@dataclass
+class SiteStats:
+    jobs: int = 0
+    seconds: float = 0.0
+    cost: float = 0.0
+    tokens: int = 0
+    llm_steps: int = 0
+
+
+class MetricsRegistry:
+    """
+    In-process aggregate of finished jobs for /api/metrics
+
+    Latency percentiles are computed over the most recent sample_size values.
+    Per-site totals are kept for the max_sites most recently active domains.
+    In worker mode the API process records the jobs its workers complete.
+    """
+
+    def __init__(self, sample_size: int = 5000, max_sites: int = 1000):
+        self.started_at = time.time()
+        self.by_status: Counter = Counter()
+        self.by_handler: Counter = Counter()
+        self.tokens: Counter = Counter()
+        self.cost = 0.0
+        self.llm_steps = 0
+        self.max_sites = max(1, max_sites)
+        self.sites: "OrderedDict[str, SiteStats]" = OrderedDict()
+        self._job_seconds: deque = deque(maxlen=sample_size)
+        self._step_latency_ms: deque = deque(maxlen=sample_size)
+        self._steps_per_job: deque = deque(maxlen=sample_size)
+
+    def record(self, domain: str, result: FormSubmissionResponse) -> None:
+        self.by_status[result.status.value] += 1
+        self.by_handler[result.handled_by or "unknown"] += 1
+        if result.elapsed_seconds is not None:
+            self._job_seconds.append(result.elapsed_seconds)
+
+        site = self.sites.setdefault(domain, SiteStats())
+        self.sites.move_to_end(domain)
+        while len(self.sites) > self.max_sites:
+            # Forget the least recently active domain
+            self.sites.popitem(last=False)
+        site.jobs += 1
+        site.seconds += result.elapsed_seconds or 0.0
+        site.cost += result.cost_estimate or 0.0
+        site.tokens += result.tokens_used or 0
+        self.cost += result.cost_estimate or 0.0
+
+        usage = result.usage
+        if usage is not None:
+            self.tokens["input"] += usage.input_tokens
+            self.tokens["output"] += usage.output_tokens
+            self.tokens["cache_read"] += usage.cache_read_tokens
+            self.tokens["cache_write"] += usage.cache_write_tokens
+            self.llm_steps += usage.steps
+            site.llm_steps += usage.steps
+            self._steps_per_job.append(usage.steps)
+            self._step_latency_ms.extend(usage.step_latency_ms)
+
+    def _top_sites(self, key: str, limit: int) -> List[Dict[str, Any]]:
+        ranked = sorted(self.sites.items(), key=lambda item: getattr(item[1], key), reverse=True)
+        return [
+            {
+                "domain": domain,
+                "jobs": stats.jobs,
+                "seconds": round(stats.seconds, 2),
+                "cost": round(stats.cost, 6),
+                "tokens": stats.tokens,
+                "llm_steps": stats.llm_steps,
+            }
+            for domain, stats in ranked[:limit]
+        ]
+
+    def snapshot(self, top: int = 10) -> Dict[str, Any]:
+        job_seconds = list(self._job_seconds)
+        step_latency = list(self._step_latency_ms)
+        steps_per_job = list(self._steps_per_job)
+        prompt_tokens = self.tokens["input"] + self.tokens["cache_read"] + self.tokens["cache_write"]
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "jobs": {
+                "total": sum(self.by_status.values()),
+                "by_status": dict(self.by_status),
+                "by_handler": dict(self.by_handler),
+                "seconds_p50": _percentile(job_seconds, 0.5),
+                "seconds_p95": _percentile(job_seconds, 0.95),
+            },
+            "llm": {
+                "steps": self.llm_steps,
+                "steps_per_job_avg": round(statistics.mean(steps_per_job), 2) if steps_per_job else None,
+                "step_latency_ms_p50": _percentile(step_latency, 0.5),
+                "step_latency_ms_p95": _percentile(step_latency, 0.95),
+                "input_tokens": self.tokens["input"],
+                "output_tokens": self.tokens["output"],
+                "cache_read_tokens": self.tokens["cache_read"],
+                "cache_write_tokens": self.tokens["cache_write"],
+                "cache_hit_rate": round(self.tokens["cache_read"] / prompt_tokens, 3) if prompt_tokens else None,
+                "cost_usd": round(self.cost, 6),
+            },
+            "top_sites_by_cost": self._top_sites("cost", top),
+            "top_sites_by_time": self._top_sites("seconds", top),
+        }
+
+
+# Singleton instances
+_price_table: Optional[Dict[str, ModelPrice]] = None
+_metrics: Optional[MetricsRegistry] = None
+
+
+def get_price_table() -> Dict[str, ModelPrice]:
+    """Get or build the price table from settings"""
+    global _price_table
+    if _price_table is None:
+        _price_table = load_price_table(get_settings().model_prices)
+    return _price_table
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get or create MetricsRegistry singleton"""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
@@ -0,0 +1,299 @@
+"""Post-submit verification on the live page: did the form really go through?"""
+
+import asyncio
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, TYPE_CHECKING
+from urllib.parse import urlparse
+
+from .models import SubmissionVerification
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Page, Response
+
+logger = logging.getLogger(__name__)
+
+# Completion pages usually live under a path like /thanks or /contact/complete
+THANKS_URL_PATTERN = r"thank|thanks|complete|completed|finish|done|success|sent|kanryo|送信完了"
+
+THANKS_TEXT_PATTERN = (
+    r"ありがとうございま|送信(が|を)?完了|送信いたしました|送信しました|受け付けました|受付(が|を)?完了|"
+    r"お問い?合わせいただき|thank you|thanks for|has been sent|was sent|successfully (sent|submitted)|"
+    r"we('ll| will) (get back|be in touch|contact you)"
+)
+ERROR_TEXT_PATTERN = (
+    r"入力(内容)?に(誤り|エラー|不備)|必須項目(です|を)|入力してください|正しく入力|選択してください|"
+    r"送信に失敗|送信できませんでした|エラーが発生|is required|please (enter|fill|select)|invalid|"
+    r"failed to send|could not be sent|an error occurred"
+)
+
+# Hosts that receive the POST of embedded third-party forms
+FORM_PROVIDER_HOSTS = ("hsforms.com", "hubspot.com", "form-run.com", "formrun", "docs.google.com", "formzu", "tayori")
+
+# JSON answers from form plugins' AJAX endpoints (Contact Form 7 REST API)
+JSON_SUCCESS = ("mail_sent",)
+JSON_FAILURE = ("mail_failed", "validation_failed", "spam", "acceptance_missing", "aborted")
+
+MAX_JSON_BYTES = 64 * 1024
+SETTLE_ATTEMPTS = 3
+SETTLE_INTERVAL = 1.0
+
+VERIFY_JS = r"""
+(patterns) => {
+    const visible = (el) => {
+        const rect = el.getBoundingClientRect();
+        const style = getComputedStyle(el);
+        return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const textOf = (selector) => [...document.querySelectorAll(selector)]
+        .filter(visible).map((el) => el.innerText || '').join(' ');
+    const body = document.body ? document.body.innerText : '';
+    // Plugin response areas and alerts speak for the submission directly
+    const notices = textOf('.wpcf7-response-output, .mw_wp_form .error, [role="alert"], .alert, .error, .errors, .notice, .message, .messages');
+    const editable = [...document.querySelectorAll('input, textarea, select')].filter((el) => {
+        const type = (el.type || '').toLowerCase();
+        return !['hidden', 'submit', 'button', 'image', 'reset', 'checkbox', 'radio'].includes(type) && visible(el);
+    });
+    const filled = editable.filter((el) => (el.value || '').trim().length > 0).length;
+    const thanks = new RegExp(patterns.thanks, 'i');
+    const error = new RegExp(patterns.error, 'i');
+    return {
+        url: location.href,
+        textareas: [...document.querySelectorAll('textarea')].filter(visible).length,
+        editable: editable.length,
+        filled: filled,
+        thanks_text: thanks.test(body.slice(0, 20000)),
+        error_text: error.test(notices) || [...document.querySelectorAll('[aria-invalid="true"], .wpcf7-not-valid, .is-invalid')].filter(visible).length > 0,
+        plugin_sent: !!document.querySelector('.wpcf7 form.sent, .wpcf7-mail-sent-ok, .mw_wp_form_complete'),
+        plugin_failed: !!document.querySelector('.wpcf7 form.invalid, .wpcf7 form.failed, .wpcf7 form.spam, .wpcf7-validation-errors, .mw_wp_form_input .error'),
+        excerpt: body.replace(/\s+/g, ' ').slice(0, 1500),
+    };
+}
+"""
+
+LLM_CHECK_PROMPT = """You are checking whether a website contact form was submitted successfully.
+
+Form URL: {form_url}
+Current URL: {current_url}
+Visible page text (truncated):
+\"\"\"{excerpt}\"\"\"
+
+Answer with JSON only: {{"submitted": true or false, "confidence": number between 0 and 1}}"""
+
+
+@dataclass
+class SubmissionResponse:
+    """A form POST observed on the network"""
+    url: str
+    status: int
+    json_status: Optional[str] = None
+
+
+class SubmissionMonitor:
+    """
+    Records form POST responses seen by a browser context
+
+    Only document/XHR/fetch POSTs to the page's own host or a known form
+    provider are kept, so analytics beacons do not count as submissions.
+    """
+
+    def __init__(self, context: "BrowserContext", site_url: str):
+        self.context = context
+        self.host = _bare_host(site_url)
+        self.responses: List[SubmissionResponse] = []
+        self._pending: List[asyncio.Task] = []
+        context.on("response", self._on_response)
+
+    def _relevant(self, response: "Response") -> bool:
+        request = response.request
+        if request.method not in ("POST", "PUT") or request.resource_type not in ("document", "xhr", "fetch"):
+            return False
+        host = _bare_host(response.url)
+        return host == self.host or host.endswith("." + self.host) or any(p in host for p in FORM_PROVIDER_HOSTS)
+
+    def _on_response(self, response: "Response") -> None:
+        if not self._relevant(response):
+            return
+        entry = SubmissionResponse(url=response.url, status=response.status)
+        self.responses.append(entry)
+        if "json" in (response.headers.get("content-type") or ""):
+            self._pending.append(asyncio.ensure_future(self._read_json(response, entry)))
+
+    async def _read_json(self, response: "Response", entry: SubmissionResponse) -> None:
+        try:
+            body = await response.body()
+            if len(body) <= MAX_JSON_BYTES:
+                data = json.loads(body)
+                if isinstance(data, dict) and isinstance(data.get("status"), str):
+                    entry.json_status = data["status"]
+        except Exception:
+            pass
+
+    async def settle(self) -> None:
+        """Wait for JSON bodies that are still being read"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+            self._pending.clear()
+
+    def close(self) -> None:
+        try:
+            self.context.remove_listener("response", self._on_response)
+        except Exception:
+            pass
+        for task in self._pending:
+            task.cancel()
+
+
+def _bare_host(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+@dataclass
+class Evidence:
+    """Weighted success and failure signals"""
+    success: float = 0.0
+    failure: float = 0.0
+    signals: List[str] = field(default_factory=list)
+
+    def add(self, name: str, success: float = 0.0, failure: float = 0.0) -> None:
+        self.success += success
+        self.failure += failure
+        self.signals.append(name)
+
+    @property
+    def verdict(self) -> str:
+        if self.success >= 0.6 and self.failure < 0.3:
+            return "success"
+        if self.failure >= 0.5 and self.success < 0.3:
+            return "failure"
+        return "ambiguous"
+
+    @property
+    def confidence(self) -> float:
+        # Share of the evidence pointing the winning way, damped when there is little of it
+        total = self.success + self.failure
+        if total == 0:
+            return 0.0
+        share = max(self.success, self.failure) / total
+        return round(share * min(1.0, total), 2)
+
+
+def collect_evidence(
+    state: Dict[str, Any],
+    form_url: str,
+    monitor: Optional[SubmissionMonitor],
+    agent_success: Optional[bool],
+) -> Evidence:
+    """Score the page state and network activity after a submission"""
+    evidence = Evidence()
+
+    url_changed = state["url"].split("#")[0].rstrip("/") != form_url.split("#")[0].rstrip("/")
+    if url_changed and re.search(THANKS_URL_PATTERN, urlparse(state["url"]).path, re.IGNORECASE):
+        evidence.add("thanks_url", success=0.5)
+    elif url_changed:
+        evidence.add("url_changed", success=0.15)
+
+    if state["plugin_sent"]:
+        evidence.add("plugin_sent", success=0.7)
+    if state["plugin_failed"]:
+        evidence.add("plugin_failed", failure=0.7)
+    if state["thanks_text"]:
+        evidence.add("thanks_text", success=0.45)
+    if state["error_text"]:
+        evidence.add("error_text", failure=0.5)
+
+    if state["textareas"] == 0 and state["editable"] == 0:
+        evidence.add("form_gone", success=0.2)
+    elif state["filled"] > 0 and not url_changed:
+        evidence.add("form_still_filled", failure=0.25)
+
+    if monitor is not None:
+        for response in monitor.responses:
+            if response.json_status in JSON_SUCCESS:
+                evidence.add(f"post_{response.json_status}", success=0.7)
+            elif response.json_status in JSON_FAILURE:
+                evidence.add(f"post_{response.json_status}", failure=0.7)
+            elif response.status >= 400:
+                evidence.add(f"post_{response.status}", failure=0.3)
+        if monitor.responses and all(r.status < 400 for r in monitor.responses):
+            evidence.add("post_ok", success=0.15)
+
+    if agent_success is True:
+        evidence.add("agent_reported_success", success=0.15)
+    elif agent_success is False:
+        evidence.add("agent_reported_failure", failure=0.3)
+    return evidence
+
+
+async def verify_submission(
+    page: "Page",
+    form_url: str,
+    monitor: Optional[SubmissionMonitor] = None,
+    agent_success: Optional[bool] = None,
+    llm: Any = None,
+) -> SubmissionVerification:
+    """
+    Decide whether a submission went through, using the live page
+
+    Clear outcomes cost one DOM evaluation. AJAX forms get a few short
+    waits for their response to render; only a still-ambiguous result is
+    passed to the LLM (one call on a page excerpt) when llm is given.
+
+    Args:
+        page: "Page" after the submit click
+        form_url: URL the form was on
+        monitor: SubmissionMonitor attached before submitting
+        agent_success: The agent's own done(success=...) verdict, if any
+        llm: Chat model for the ambiguous case (None to skip)
+
+    Returns:
+        SubmissionVerification with verdict, confidence and the signals seen
+    """
+    state: Dict[str, Any] = {}
+    evidence = Evidence()
+    for attempt in range(SETTLE_ATTEMPTS):
+        if monitor is not None:
+            await monitor.settle()
+        try:
+            state = await page.evaluate(VERIFY_JS, {"thanks": THANKS_TEXT_PATTERN, "error": ERROR_TEXT_PATTERN})
+        except Exception as e:
+            # Navigation in progress; try again after it settles
+            logger.info(f"Verification probe failed: {e}")
+            await asyncio.sleep(SETTLE_INTERVAL)
+            continue
+        evidence = collect_evidence(state, form_url, monitor, agent_success)
+        if evidence.verdict != "ambiguous" or attempt == SETTLE_ATTEMPTS - 1:
+            break
+        await asyncio.sleep(SETTLE_INTERVAL)
+
+    verification = SubmissionVerification(
+        verdict=evidence.verdict,
+        confidence=evidence.confidence,
+        signals=evidence.signals,
+    )
+    if verification.verdict == "ambiguous" and llm is not None and state:
+        await _llm_check(verification, state, form_url, llm)
+    return verification
+
+
+async def _llm_check(verification: SubmissionVerification, state: Dict[str, Any], form_url: str, llm: Any) -> None:
+    # Only ambiguous pages get here; keep langchain off the import path of the API process
+    from langchain_core.messages import HumanMessage
+
+    prompt = LLM_CHECK_PROMPT.format(form_url=form_url, current_url=state["url"], excerpt=state["excerpt"])
+    try:
+        reply = await llm.ainvoke([HumanMessage(content=prompt)])
+        match = re.search(r"\{.*\}", str(reply.content), re.DOTALL)
+        answer = json.loads(match.group(0)) if match else {}
+    except Exception as e:
+        logger.info(f"LLM verification failed: {e}")
+        return
+    if "submitted" not in answer:
+        return
+    verification.llm_checked = True
+    verification.verdict = "success" if answer["submitted"] else "failure"
+    verification.confidence = round(float(answer.get("confidence", 0.5)), 2)
+    verification.signals.append("llm_check")
@@ -0,0 +1,147 @@
+"""
+Browser worker process for worker mode
+
+Run one or more of these next to an API started with WORKER_MODE=true
+(start.py spawns WORKER_PROCESSES of them), on the same host or in other
+containers sharing JOBS_DB_PATH:
+
+    python -m app.worker
+
+Each process owns its browser pool and BatchExecutor (BATCH_MAX_WORKERS
+jobs at a time), claims jobs from the SQLite queue, keeps their leases
+alive while they run and writes results and span timelines back.
+"""
+
+import asyncio
+import logging
+import signal
+import time
+import uuid
+from typing import Optional, Dict
+
+from .config import get_settings
+from .models import FormSubmissionRequest
+from .jobs import JobStore
+from .executor import BatchExecutor, get_batch_executor
+from .browser_pool import get_browser_pool
+from .http_client import close_http_client
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Claims jobs from the store and runs them on this process's executor"""
+
+    def __init__(
+        self,
+        store: JobStore,
+        executor: BatchExecutor,
+        lease_seconds: float,
+        poll_interval: float,
+    ):
+        self.store = store
+        self.executor = executor
+        self.concurrency = executor.max_workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.completed = 0
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wake = asyncio.Event()
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Claim and run jobs until `stop` is set, then finish the running ones"""
+        keeper = asyncio.create_task(self._keep_leases())
+        logger.info(f"Worker {self.id} started (concurrency {self.concurrency})")
+        try:
+            while not stop.is_set():
+                claimed = []
+                free = self.concurrency - len(self._running)
+                if free > 0:
+                    claimed = await asyncio.to_thread(
+                        self.store.claim, self.id, free, self.lease_seconds, self.executor.per_domain_limit
+                    )
+                for job_id, request, key in claimed:
+                    self._running[job_id] = asyncio.create_task(self._run_job(job_id, request, key))
+                if claimed and len(self._running) < self.concurrency:
+                    continue
+                # Sleep until a slot frees up, the next poll, or shutdown
+                self._wake.clear()
+                waiters = [asyncio.create_task(self._wake.wait()), asyncio.create_task(stop.wait())]
+                await asyncio.wait(waiters, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in waiters:
+                    waiter.cancel()
+            if self._running:
+                logger.info(f"Worker {self.id} finishing {len(self._running)} running jobs")
+                await asyncio.gather(*self._running.values(), return_exceptions=True)
+        finally:
+            keeper.cancel()
+            await asyncio.gather(keeper, return_exceptions=True)
+            await asyncio.to_thread(self.store.remove_worker, self.id)
+
+    async def _run_job(self, job_id: str, request: FormSubmissionRequest, key: Optional[str]) -> None:
+        try:
+            result = await self.executor.run_one(request, idempotency_key=key, job_id=job_id)
+            trace = telemetry.get_trace_store().get(job_id)
+            await asyncio.to_thread(
+                self.store.mark_completed, job_id, result, trace.to_dict() if trace else None
+            )
+            self.completed += 1
+        except Exception as e:
+            # Left running: the lease runs out and another worker retries it
+            logger.error(f"Worker {self.id} failed on {job_id}: {e}")
+        finally:
+            self._running.pop(job_id, None)
+            self._wake.set()
+
+    async def _keep_leases(self) -> None:
+        """Renew the leases of running jobs and report liveness"""
+        while True:
+            try:
+                await asyncio.to_thread(self.store.renew, self.id, list(self._running), self.lease_seconds)
+                await asyncio.to_thread(
+                    self.store.heartbeat, self.id, self.concurrency, len(self._running), self.started_at
+                )
+            except Exception as e:
+                logger.warning(f"Worker {self.id} could not renew leases: {e}")
+            await asyncio.sleep(self.lease_seconds / 3)
+
+
+async def serve(stop: Optional[asyncio.Event] = None) -> None:
+    """Run a worker with its own browser pool until SIGTERM/SIGINT"""
+    settings = get_settings()
+    stop = stop or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    store = JobStore(settings.jobs_db_path)
+    pool = get_browser_pool()
+    await pool.start(prewarm=settings.browser_pool_prewarm)
+    worker = Worker(
+        store,
+        get_batch_executor(),
+        lease_seconds=settings.worker_lease_seconds,
+        poll_interval=settings.worker_poll_interval,
+    )
+    try:
+        await worker.run(stop)
+    finally:
+        await pool.close()
+        await close_http_client()
+        store.close()
+        logger.info(f"Worker {worker.id} stopped after {worker.completed} jobs")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
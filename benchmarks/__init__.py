@@ -0,0 +1 @@
+"""Benchmarks and local fixtures for the form submission pipeline"""
@@ -0,0 +1,196 @@
+"""
+End-to-end FormAgent benchmark on a local mock-site corpus
+
+Serves corpus/sites/ (single-page form, confirm-then-submit flow, form
+behind a contact link, CAPTCHA page) from local HTTP servers and runs every
+site through the production pipeline: BatchExecutor -> discovery ->
+pre-flight -> FormAgent (browser pool, heuristic filler / agent,
+verification). LLM calls are answered by a replay stub from recorded
+cassettes, so runs are offline and repeatable. Reports per worker count:
+
+- job latency p50/p95/p99 and jobs per minute
+- peak RSS (this process plus the pooled Chromium processes)
+- browser launches
+- outcome vs corpus/sites/expected.json
+
+Usage:
+    python -m benchmarks.agent_bench [--workers 1,4] [--repeat 3]
+    python -m benchmarks.agent_bench --agent-only             # LLM agent only: no heuristic filler, templates or plan cache
+    python -m benchmarks.agent_bench --agent-only --record    # re-record cassettes (needs ANTHROPIC_API_KEY)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.mock_sites import SITES_DIR, MockSites  # noqa: E402
+
+CASSETTES = SITES_DIR / "cassettes.json"
+EXPECTED = SITES_DIR / "expected.json"
+
+MESSAGE = "貴社のサービスについて詳しく伺いたく、ご連絡いたしました。資料をお送りいただけますでしょうか。"
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1)))]
+
+
+async def sample_rss(pool: Any, peak: Dict[str, float], stop: asyncio.Event) -> None:
+    """Track peak RSS of this process plus every pooled browser"""
+    from app.browser_pool import _read_rss_mb
+
+    while not stop.is_set():
+        browsers = 0.0
+        for pooled in list(pool._browsers):
+            browsers += await pool._memory_mb(pooled)
+        total = _read_rss_mb(os.getpid()) + browsers
+        peak["rss_mb"] = max(peak.get("rss_mb", 0.0), total)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+def reset_caches(workdir: Path, run: int) -> None:
+    """Point the plan, discovery and model-route caches at empty databases"""
+    import app.discovery
+    import app.form_cache
+    import app.model_router
+    from app.config import get_settings
+
+    settings = get_settings()
+    settings.form_cache_path = str(workdir / f"form_plans_{run}.db")
+    settings.discovery_db_path = str(workdir / f"discovery_{run}.db")
+    settings.model_router_db_path = str(workdir / f"model_routes_{run}.db")
+    app.form_cache._form_cache = None
+    app.model_router._model_router = None
+    app.discovery._contact_discovery = None
+
+
+async def run(workers: List[int], repeat: int, record: bool, latency_scale: float, job_timeout: float) -> int:
+    import app.form_agent
+    from app.browser_pool import get_browser_pool
+    from app.config import get_settings
+    from app.executor import BatchExecutor
+    from app.models import FormSubmissionRequest
+    from benchmarks.replay_llm import (
+        CURRENT_CASSETTE, Cassette, RecordingChatAnthropic, ReplayChatAnthropic,
+        load_cassettes, save_cassettes,
+    )
+
+    expected: Dict[str, str] = json.loads(EXPECTED.read_text(encoding="utf-8"))
+    cassettes = load_cassettes(CASSETTES)
+    recorded: Dict[str, List[Dict[str, Any]]] = {}
+
+    def stub_llm(model, callbacks=None, max_tokens=1024):
+        if record:
+            return RecordingChatAnthropic(
+                model=model, anthropic_api_key=get_settings().anthropic_api_key, max_tokens=max_tokens,
+                callbacks=callbacks, temperature=0.1, max_retries=0,
+            )
+        return ReplayChatAnthropic(
+            model=model, anthropic_api_key="replay", max_tokens=max_tokens,
+            callbacks=callbacks, latency_scale=latency_scale,
+        )
+
+    app.form_agent.create_llm = stub_llm
+    workdir = Path(tempfile.mkdtemp(prefix="formai-bench-"))
+    pool = get_browser_pool()
+    await pool.start()
+    exit_code = 0
+
+    with MockSites() as sites:
+        print(f"{'workers':>7} {'jobs':>5} {'ok':>5} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+              f"{'jobs/min':>9} {'peak RSS MB':>12} {'launches':>9}")
+        print("-" * 80)
+        try:
+            for n, worker_count in enumerate(workers):
+                reset_caches(workdir, n)
+                executor = BatchExecutor(
+                    max_workers=worker_count,
+                    per_domain_limit=worker_count,
+                    job_timeout=job_timeout,
+                    # Every mock site is 127.0.0.1; politeness limits would serialise them
+                    rate_limit_enabled=False,
+                    retry_attempts=1,
+                )
+
+                async def job(site: str) -> Any:
+                    cassette = Cassette(site, [] if record else cassettes.get(site, []))
+                    CURRENT_CASSETTE.set(cassette)
+                    started = time.perf_counter()
+                    result = await executor.run_one(FormSubmissionRequest(url=sites.urls[site], message=MESSAGE))
+                    if record and result.status.value == expected[site]:
+                        recorded.setdefault(site, cassette.entries)
+                    return site, result, time.perf_counter() - started
+
+                launches = pool.launches
+                peak: Dict[str, float] = {}
+                stop = asyncio.Event()
+                sampler = asyncio.create_task(sample_rss(pool, peak, stop))
+                started = time.perf_counter()
+                outcomes = await asyncio.gather(*(job(site) for _ in range(repeat) for site in sorted(expected)))
+                wall_clock = time.perf_counter() - started
+                stop.set()
+                await sampler
+
+                latencies = [elapsed for _, _, elapsed in outcomes]
+                correct = sum(1 for site, result, _ in outcomes if result.status.value == expected[site])
+                print(
+                    f"{worker_count:>7} {len(outcomes):>5} {correct:>5} "
+                    f"{statistics.median(latencies):>7.2f} {_percentile(latencies, 0.95):>7.2f} "
+                    f"{_percentile(latencies, 0.99):>7.2f} {len(outcomes) / wall_clock * 60:>9.1f} "
+                    f"{peak.get('rss_mb', 0.0):>12.0f} {pool.launches - launches:>9}"
+                )
+                for site, result, _ in outcomes:
+                    if result.status.value != expected[site]:
+                        exit_code = 1
+                        print(f"  {site}: expected {expected[site]}, got {result.status.value} "
+                              f"({result.handled_by}): {result.message}")
+        finally:
+            await pool.close()
+
+    if record:
+        save_cassettes(CASSETTES, {**cassettes, **recorded})
+        print(f"recorded cassettes for: {', '.join(sorted(recorded)) or 'none'}")
+    return exit_code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,4", help="Comma-separated worker counts to measure")
+    parser.add_argument("--repeat", type=int, default=3, help="Jobs per site and worker count")
+    parser.add_argument(
+        "--agent-only", action="store_true",
+        help="Disable the heuristic filler, form templates and plan cache (LLM agent path)",
+    )
+    parser.add_argument("--record", action="store_true", help="Call the real API and record cassettes")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for recorded LLM latency")
+    parser.add_argument("--job-timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    # Settings are read on first use, so these apply to the whole run
+    if not args.record:
+        os.environ["ANTHROPIC_API_KEY"] = os.environ.get("ANTHROPIC_API_KEY") or "replay"
+    if args.agent_only:
+        os.environ["HEURISTIC_FILLER_ENABLED"] = "false"
+        os.environ["FORM_TEMPLATES_ENABLED"] = "false"
+        os.environ["FORM_CACHE_ENABLED"] = "false"
+    os.environ["IDEMPOTENCY_ENABLED"] = "false"
+
+    workers = [int(w) for w in args.workers.split(",") if w.strip()]
+    sys.exit(asyncio.run(run(workers, args.repeat, args.record, args.latency_scale, args.job_timeout)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark form-builder fingerprinting and template plans on local fixtures
+
+Serves every directory under corpus/templates/ as its own site (see
+mock_sites.py), fingerprints the landing page, builds the template plan and,
+where expected.json names a thank-you page, replays the plan with the sender
+values (確認画面 included) and checks where it ends up. Reports:
+
+- detection precision/recall per builder (a builder reported on a page
+  without it is a false positive, also on negative fixtures)
+- plan decision accuracy: did the template correctly decide to handle / escalate
+- field precision/recall: role -> selector assignments vs the expected mapping
+- submissions that reached the expected page
+- latency of fingerprinting and plan building (p50/p95)
+
+Usage:
+    python -m benchmarks.form_template_bench [--repeat 5] [--threshold 0.6]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from playwright.async_api import async_playwright
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.form_plan import replay_plan  # noqa: E402
+from app.form_templates import (  # noqa: E402
+    TEMPLATES,
+    fingerprint,
+    plan_for_template,
+    opens_confirm_page,
+    advance_template_confirm,
+)
+from app.submission_flow import SubmissionFlow  # noqa: E402
+from benchmarks.mock_sites import MockSites  # noqa: E402
+
+CORPUS = Path(__file__).parent / "corpus" / "templates"
+
+VALUES = {
+    "company": "ベンチマーク株式会社",
+    "person": "山田太郎",
+    "email": "bench@example.com",
+    "phone": "03-0000-0000",
+    "message": "テンプレート経路のベンチマーク送信です。",
+}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+async def run(repeat: int, threshold: float) -> int:
+    expected = json.loads((CORPUS / "expected.json").read_text(encoding="utf-8"))
+
+    detected: Counter = Counter()
+    true_detections: Counter = Counter()
+    actual: Counter = Counter()
+    correct_decisions = 0
+    true_positive = false_positive = false_negative = 0
+    submissions = reached = 0
+    fingerprint_ms: List[float] = []
+    plan_ms: List[float] = []
+
+    with MockSites(CORPUS) as sites:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            # Third-party loaders and hosted frames are not served offline
+            context = await browser.new_context()
+            await context.route(
+                lambda url: not url.startswith("http://127.0.0.1"), lambda route: route.abort()
+            )
+            page = await context.new_page()
+
+            print(f"{'fixture':<22} {'expect':<13} {'got':<13} {'signal':<7} {'plan':<6} {'conf':>5} "
+                  f"{'fp ms':>6} {'plan ms':>8}  result")
+            print("-" * 100)
+            for name, spec in sorted(expected.items()):
+                url = sites.urls[name]
+                match = result = None
+                fp_timings: List[float] = []
+                plan_timings: List[float] = []
+                for _ in range(repeat):
+                    await page.goto(url, wait_until="domcontentloaded")
+                    started = time.perf_counter()
+                    match = await fingerprint(page)
+                    fp_timings.append((time.perf_counter() - started) * 1000)
+                    if match is not None:
+                        started = time.perf_counter()
+                        result = await plan_for_template(page, match)
+                        plan_timings.append((time.perf_counter() - started) * 1000)
+                fingerprint_ms.extend(fp_timings)
+                plan_ms.extend(plan_timings)
+
+                got = match.template.name if match else None
+                if spec["template"]:
+                    actual[spec["template"]] += 1
+                if got:
+                    detected[got] += 1
+                    if got == spec["template"]:
+                        true_detections[got] += 1
+
+                confident = result is not None and result.plan is not None and result.confidence >= threshold
+                if confident == spec["confident"]:
+                    correct_decisions += 1
+
+                got_fields: Dict[str, str] = result.plan.fields if confident else {}
+                for role, selector in spec.get("fields", {}).items():
+                    if got_fields.get(role) == selector:
+                        true_positive += 1
+                    else:
+                        false_negative += 1
+                for role, selector in got_fields.items():
+                    if spec.get("fields", {}).get(role) != selector:
+                        false_positive += 1
+
+                outcome = result.reason if result is not None else "-"
+                if confident and spec.get("reaches"):
+                    submissions += 1
+                    await page.goto(url, wait_until="domcontentloaded")
+                    confirm = opens_confirm_page(match, result)
+                    if (await replay_plan(page, result.plan, VALUES)).completed:
+                        send = await advance_template_confirm(page, match, confirm)
+                        send = await SubmissionFlow().advance(page, "plan") or send
+                        landed = page.url.rsplit("/", 1)[-1]
+                        if landed == spec["reaches"]:
+                            reached += 1
+                        outcome = f"-> {landed}" + (f" (confirm: {send})" if send else "")
+                    else:
+                        outcome = "replay failed"
+
+                print(
+                    f"{name:<22} {str(spec['template']):<13} {str(got):<13} "
+                    f"{match.signal if match else '-':<7} {str(confident):<6} "
+                    f"{result.confidence if result else 0:>5.2f} {statistics.median(fp_timings):>6.1f} "
+                    f"{statistics.median(plan_timings) if plan_timings else 0:>8.1f}  {outcome}"
+                )
+
+            await browser.close()
+
+    print("-" * 100)
+    print(f"{'builder':<14} {'precision':>9} {'recall':>7}")
+    for template in TEMPLATES:
+        name = template.name
+        precision = true_detections[name] / detected[name] if detected[name] else 1.0
+        recall = true_detections[name] / actual[name] if actual[name] else 1.0
+        print(f"{name:<14} {precision:>9.3f} {recall:>7.3f}")
+    total_detected = sum(detected.values())
+    print(f"{'all':<14} {sum(true_detections.values()) / total_detected if total_detected else 1.0:>9.3f} "
+          f"{sum(true_detections.values()) / sum(actual.values()):>7.3f}")
+    print()
+    precision = true_positive / (true_positive + false_positive) if true_positive + false_positive else 1.0
+    recall = true_positive / (true_positive + false_negative) if true_positive + false_negative else 1.0
+    print(f"decision accuracy : {correct_decisions}/{len(expected)}")
+    print(f"field precision   : {precision:.3f}")
+    print(f"field recall      : {recall:.3f}")
+    print(f"submissions       : {reached}/{submissions} reached the expected page")
+    print(f"fingerprint p50/p95 : {statistics.median(fingerprint_ms):.1f}ms / {_percentile(fingerprint_ms, 0.95):.1f}ms")
+    if plan_ms:
+        print(f"plan build  p50/p95 : {statistics.median(plan_ms):.1f}ms / {_percentile(plan_ms, 0.95):.1f}ms")
+    ok = correct_decisions == len(expected) and reached == submissions
+    return 0 if ok else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.repeat, args.threshold)))
+
+
+if __name__ == "__main__":
+    main()
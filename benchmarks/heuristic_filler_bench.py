@@ -0,0 +1,100 @@
+"""
+Benchmark the heuristic form filler against saved HTML forms
+
+Loads every *.html file in the corpus into headless Chromium, runs the
+rule-based analysis, and compares it with expected.json:
+
+- decision accuracy: did the filler correctly decide to handle / escalate
+- field precision/recall: role -> selector assignments vs the expected mapping
+- analysis latency per page (DOM extraction + scoring)
+
+Usage:
+    python -m benchmarks.heuristic_filler_bench [--corpus DIR] [--repeat N] [--threshold 0.75]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.heuristic_filler import analyze_page  # noqa: E402
+
+DEFAULT_CORPUS = Path(__file__).parent / "corpus" / "forms"
+
+
+async def run(corpus: Path, repeat: int, threshold: float) -> int:
+    expected = json.loads((corpus / "expected.json").read_text(encoding="utf-8"))
+
+    correct_decisions = 0
+    true_positive = false_positive = false_negative = 0
+    latencies_ms = []
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+
+        print(f"{'fixture':<28} {'expect':<8} {'got':<8} {'conf':>6} {'ms':>8}  reason")
+        print("-" * 80)
+        for name, spec in sorted(expected.items()):
+            html_path = corpus / name
+            timings = []
+            result = None
+            for _ in range(repeat):
+                await page.goto(html_path.resolve().as_uri())
+                started = time.perf_counter()
+                result = await analyze_page(page)
+                timings.append((time.perf_counter() - started) * 1000)
+            latencies_ms.extend(timings)
+
+            confident = result.plan is not None and result.confidence >= threshold
+            if confident == spec["confident"]:
+                correct_decisions += 1
+
+            got_fields = result.plan.fields if confident else {}
+            for role, selector in spec["fields"].items():
+                if got_fields.get(role) == selector:
+                    true_positive += 1
+                else:
+                    false_negative += 1
+            for role, selector in got_fields.items():
+                if spec["fields"].get(role) != selector:
+                    false_positive += 1
+
+            print(
+                f"{name:<28} {str(spec['confident']):<8} {str(confident):<8} "
+                f"{result.confidence:>6.2f} {statistics.median(timings):>8.1f}  {result.reason}"
+            )
+
+        await browser.close()
+
+    total = len(expected)
+    precision = true_positive / (true_positive + false_positive) if true_positive + false_positive else 1.0
+    recall = true_positive / (true_positive + false_negative) if true_positive + false_negative else 1.0
+    latencies_ms.sort()
+    print("-" * 80)
+    print(f"decision accuracy : {correct_decisions}/{total}")
+    print(f"field precision   : {precision:.3f}")
+    print(f"field recall      : {recall:.3f}")
+    print(f"latency p50/p95   : {statistics.median(latencies_ms):.1f}ms / "
+          f"{latencies_ms[int(0.95 * (len(latencies_ms) - 1))]:.1f}ms")
+    return 0 if correct_decisions == total else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.corpus, args.repeat, args.threshold)))
+
+
+if __name__ == "__main__":
+    main()
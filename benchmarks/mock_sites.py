@@ -0,0 +1,57 @@
+"""
+Local HTTP server for the mock-site corpus
+
+Every directory under corpus/sites/ is served as its own site, at the root
+of its own port (http://127.0.0.1:<port>/), so homepage discovery, same-site
+checks and relative links behave as on a real host. POSTs are answered with
+the page at the form's action URL, which is all a static confirm/thank-you
+flow needs.
+"""
+
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+
+SITES_DIR = Path(__file__).parent / "corpus" / "sites"
+
+
+class SiteHandler(SimpleHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        self.do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockSites:
+    """Serves each site directory on its own ephemeral port (use as a context manager)"""
+
+    def __init__(self, root: Path = SITES_DIR):
+        self.root = root
+        self.urls: Dict[str, str] = {}
+        self._servers: List[ThreadingHTTPServer] = []
+
+    def __enter__(self) -> "MockSites":
+        for site in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            server = ThreadingHTTPServer(("127.0.0.1", 0), partial(SiteHandler, directory=str(site)))
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self._servers.append(server)
+            self.urls[site.name] = f"http://127.0.0.1:{server.server_address[1]}/"
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    def site_of(self, url: str) -> str:
+        for name, base in self.urls.items():
+            if url.startswith(base):
+                return name
+        raise KeyError(url)
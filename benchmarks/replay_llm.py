@@ -0,0 +1,163 @@
+"""
+Replayable stub LLM for offline benchmarks
+
+A cassette is the list of model answers one job received, in call order
+(agent steps, page extraction, verification). Cassettes are keyed by
+corpus site and stored as JSON:
+
+    {"confirm": [{"content": ..., "tool_calls": [...], "usage_metadata": {...}, "latency_ms": 1830.0}, ...]}
+
+Record them once against the real API (RecordingChatAnthropic, needs
+ANTHROPIC_API_KEY); ReplayChatAnthropic then answers the same calls from
+the cassette with the recorded latency and token usage, so the browser
+path, usage accounting and timings run exactly as in production without
+network access to the API. The job being run is selected through
+CURRENT_CASSETTE, a context variable set per job.
+
+Element indexes in agent actions may also be written as references such as
+"@name=your-email", "@value=送信" or "@text=送信する"; on replay they are
+resolved against the element list in the prompt being answered, so a
+cassette keeps working when the DOM numbering shifts.
+"""
+
+import asyncio
+import copy
+import json
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.llm import RetryingChatAnthropic
+
+
+class CassetteExhausted(RuntimeError):
+    """The job made more LLM calls than were recorded"""
+
+
+class CassetteMismatch(RuntimeError):
+    """A recorded element reference is not on the page being answered"""
+
+
+@dataclass
+class Cassette:
+    site: str
+    entries: List[Dict[str, Any]] = field(default_factory=list)
+    cursor: int = 0
+
+    def next(self) -> Dict[str, Any]:
+        if self.cursor >= len(self.entries):
+            raise CassetteExhausted(f"cassette '{self.site}' has only {len(self.entries)} recorded calls")
+        entry = self.entries[self.cursor]
+        self.cursor += 1
+        return entry
+
+
+CURRENT_CASSETTE: ContextVar[Optional[Cassette]] = ContextVar("current_cassette", default=None)
+
+
+def load_cassettes(path: Path) -> Dict[str, List[Dict[str, Any]]]:
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+def save_cassettes(path: Path, cassettes: Dict[str, List[Dict[str, Any]]]) -> None:
+    path.write_text(json.dumps(cassettes, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+
+
+# "[12]<input type='text' name='company' />" or "*[12]*<button>送信する"
+ELEMENT_LINE = re.compile(r"^\s*\*?\[(\d+)\]\*?<(.*)$", re.MULTILINE)
+
+
+def _latest_text(messages: List[BaseMessage]) -> str:
+    """Text of the newest message (the current page state for agent steps)"""
+    if not messages:
+        return ""
+    content = messages[-1].content
+    if isinstance(content, str):
+        return content
+    return "\n".join(
+        part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+    )
+
+
+def _resolve_index(reference: str, page: str) -> int:
+    kind, _, wanted = reference[1:].partition("=")
+    for match in ELEMENT_LINE.finditer(page):
+        line = match.group(2)
+        if kind == "text":
+            found = ">" in line and wanted in line.split(">", 1)[1]
+        else:
+            found = f"{kind}='{wanted}'" in line
+        if found:
+            return int(match.group(1))
+    raise CassetteMismatch(f"no element matching {reference} on the current page")
+
+
+def resolve_references(tool_calls: List[Dict[str, Any]], page: str) -> List[Dict[str, Any]]:
+    """Replace "@attr=value" element references with the index shown on this page"""
+    resolved = copy.deepcopy(tool_calls)
+    for call in resolved:
+        for action in call.get("args", {}).get("action", []):
+            for params in action.values():
+                if isinstance(params, dict) and isinstance(params.get("index"), str):
+                    params["index"] = _resolve_index(params["index"], page)
+    return resolved
+
+
+def _current() -> Cassette:
+    cassette = CURRENT_CASSETTE.get()
+    if cassette is None:
+        raise RuntimeError("no cassette selected for this job (CURRENT_CASSETTE)")
+    return cassette
+
+
+class ReplayChatAnthropic(RetryingChatAnthropic):
+    """ChatAnthropic that answers from the current job's cassette instead of the API"""
+
+    _verified_api_keys: bool = True
+    latency_scale: float = 1.0
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        entry = _current().next()
+        await asyncio.sleep(entry.get("latency_ms", 0.0) / 1000 * self.latency_scale)
+        message = AIMessage(
+            content=entry.get("content", ""),
+            tool_calls=resolve_references(entry.get("tool_calls", []), _latest_text(messages)),
+            usage_metadata=entry.get("usage_metadata"),
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class RecordingChatAnthropic(RetryingChatAnthropic):
+    """ChatAnthropic that appends every answer to the current job's cassette"""
+
+    _verified_api_keys: bool = True
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        started = time.perf_counter()
+        result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        message = result.generations[0].message
+        _current().entries.append({
+            "content": message.content,
+            "tool_calls": [dict(call) for call in getattr(message, "tool_calls", [])],
+            "usage_metadata": dict(message.usage_metadata) if message.usage_metadata else None,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+        return result
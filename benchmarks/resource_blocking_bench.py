@@ -0,0 +1,132 @@
+"""
+A/B benchmark of the resource-blocking profile
+
+Loads each URL in fresh browser-use contexts with the profile off and on
+(alternating, so network noise hits both sides alike) and reports:
+
+- page load: navigation start to the load event
+- bytes: response body + header bytes of every finished request
+- agent step: BrowserContext.get_state(), the browser side of one agent
+  step (wait for network idle, DOM extraction, screenshot); no LLM call
+- requests blocked by the profile
+
+Usage:
+    python -m benchmarks.resource_blocking_bench URL [URL ...] [--repeat 3]
+    python -m benchmarks.resource_blocking_bench --urls-file urls.txt
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from browser_use import Browser, BrowserConfig
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.resource_blocking import DEFAULT_BLOCKED_TYPES, ResourceBlocker  # noqa: E402
+
+
+async def measure(browser: Browser, url: str, blocking: bool) -> Dict[str, float]:
+    context = await browser.new_context()
+    try:
+        page = await context.get_current_page()
+        blocker = (
+            await ResourceBlocker.install(page.context, DEFAULT_BLOCKED_TYPES, block_trackers=True)
+            if blocking else None
+        )
+
+        sizes: List[asyncio.Task] = []
+        page.on("requestfinished", lambda request: sizes.append(asyncio.ensure_future(request.sizes())))
+
+        started = time.perf_counter()
+        await page.goto(url, wait_until="load", timeout=60000)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        await context.get_state(cache_clickable_elements_hashes=False)
+        step_ms = (time.perf_counter() - started) * 1000
+
+        finished = await asyncio.gather(*sizes, return_exceptions=True)
+        transferred = sum(
+            s["responseBodySize"] + s["responseHeadersSize"] for s in finished if isinstance(s, dict)
+        )
+        return {
+            "load_ms": load_ms,
+            "step_ms": step_ms,
+            "bytes": transferred,
+            "blocked": sum(blocker.blocked.values()) if blocker else 0,
+        }
+    finally:
+        await context.close()
+
+
+def _median(samples: List[Dict[str, float]], key: str) -> float:
+    return statistics.median(s[key] for s in samples)
+
+
+async def run(urls: List[str], repeat: int) -> int:
+    browser = Browser(config=BrowserConfig(headless=True))
+    results: Dict[str, Dict[bool, List[Dict[str, float]]]] = {}
+    try:
+        for url in urls:
+            results[url] = {False: [], True: []}
+            for _ in range(repeat):
+                for blocking in (False, True):
+                    try:
+                        results[url][blocking].append(await measure(browser, url, blocking))
+                    except Exception as e:
+                        print(f"{url} ({'on' if blocking else 'off'}): {e}", file=sys.stderr)
+    finally:
+        await browser.close()
+
+    print(f"{'url':<48} {'mode':<4} {'load ms':>9} {'step ms':>9} {'KB':>9} {'blocked':>8}")
+    print("-" * 92)
+    load_ratio, step_ratio, bytes_saved = [], [], []
+    for url, modes in results.items():
+        if not modes[False] or not modes[True]:
+            continue
+        for blocking in (False, True):
+            samples = modes[blocking]
+            print(
+                f"{url[:48]:<48} {'on' if blocking else 'off':<4} "
+                f"{_median(samples, 'load_ms'):>9.0f} {_median(samples, 'step_ms'):>9.0f} "
+                f"{_median(samples, 'bytes') / 1024:>9.0f} {_median(samples, 'blocked'):>8.0f}"
+            )
+        off, on = modes[False], modes[True]
+        load_ratio.append(_median(on, "load_ms") / _median(off, "load_ms"))
+        step_ratio.append(_median(on, "step_ms") / _median(off, "step_ms"))
+        if _median(off, "bytes"):
+            bytes_saved.append(1 - _median(on, "bytes") / _median(off, "bytes"))
+
+    if not load_ratio:
+        print("no URL loaded in both modes")
+        return 1
+    print("-" * 92)
+    print(f"page load (on/off, median over URLs) : {statistics.median(load_ratio):.2f}x")
+    print(f"agent step (on/off, median over URLs): {statistics.median(step_ratio):.2f}x")
+    if bytes_saved:
+        print(f"bytes saved (median over URLs)       : {statistics.median(bytes_saved) * 100:.0f}%")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("urls", nargs="*")
+    parser.add_argument("--urls-file", type=Path, help="File with one URL per line")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.urls_file:
+        urls += [line.strip() for line in args.urls_file.read_text().splitlines() if line.strip()]
+    if not urls:
+        parser.error("no URLs given")
+    sys.exit(asyncio.run(run(urls, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+API cold-start benchmark
+
+Each measurement runs in a fresh interpreter so nothing is cached in
+sys.modules. Reports, as the median over --repeat runs:
+
+- import time of app.main (the API process) and app.form_agent (what a
+  worker loads for its first job)
+- heavy packages (browser_use, playwright, langchain, anthropic) pulled in
+  by importing app.main; the API path should load none of them
+- time from process start to the first /health and /ready answers, with the
+  browser pool warming up in the background
+
+Usage:
+    python -m benchmarks.startup_bench [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Any
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY = ("browser_use", "playwright", "langchain_core", "langchain_anthropic", "anthropic")
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+# Drives the ASGI app through its lifespan like uvicorn would and times the
+# first probe answers; the pool warm-up keeps running behind them
+PROBE_PROBE = """
+import json, time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+import app.main
+imported = time.perf_counter()
+with TestClient(app.main.app) as client:
+    serving = time.perf_counter()
+    health = client.get("/health").status_code
+    health_at = time.perf_counter()
+    ready = client.get("/ready").status_code
+    ready_at = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "serving": serving - started,
+    "health": health_at - started,
+    "health_status": health,
+    "ready_status": ready,
+    "ready": ready_at - started,
+}))
+"""
+
+
+def _run(code: str, env: Dict[str, str]) -> Dict[str, Any]:
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["ANTHROPIC_API_KEY"] = env.get("ANTHROPIC_API_KEY") or "startup-bench"
+    env.setdefault("JOBS_DB_PATH", "/tmp/formai-startup-bench/jobs.db")
+
+    print(f"{'import':<16} {'median ms':>10} {'min ms':>8}  heavy packages loaded")
+    print("-" * 72)
+    for module in ("app.main", "app.form_agent"):
+        runs = [_run(IMPORT_PROBE.format(module=module, heavy=HEAVY), env) for _ in range(args.repeat)]
+        seconds: List[float] = [r["seconds"] for r in runs]
+        print(
+            f"{module:<16} {statistics.median(seconds) * 1000:>10.0f} {min(seconds) * 1000:>8.0f}  "
+            f"{', '.join(runs[0]['heavy']) or 'none'}"
+        )
+
+    runs = [_run(PROBE_PROBE, env) for _ in range(args.repeat)]
+    print()
+    print(f"{'process start ->':<24} {'median ms':>10}")
+    print("-" * 36)
+    for key, label in (("import", "app.main imported"), ("serving", "lifespan started"),
+                       ("health", "first /health"), ("ready", "first /ready")):
+        print(f"{label:<24} {statistics.median(r[key] for r in runs) * 1000:>10.0f}")
+    print(f"\n/health {runs[-1]['health_status']}, /ready {runs[-1]['ready_status']} "
+          f"(503 while the browser pool is still warming up)")
+
+
+if __name__ == "__main__":
+    main()
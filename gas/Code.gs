@@ -13,15 +13,26 @@
  */
 
 // === 設定 ===
-const API_ENDPOINT = 'https://your-railway-app.railway.app/api/submit';
+const API_BASE_URL = 'https://your-railway-app.railway.app';
 // Railwayデプロイ後、上記のURLを実際のURLに変更してください
 
+// 1回の POST /api/jobs/batch に載せる行数
+const ENQUEUE_CHUNK_SIZE = 50;
+// 1回の fetchAll で状態を確認するジョブ数
+const POLL_CHUNK_SIZE = 20;
+// 1回の結果取得に使う時間（Apps Script の実行上限 6 分より短く）
+const POLL_TIME_BUDGET_MS = 4 * 60 * 1000;
+
+const PENDING_LABEL = '送信中...';
+const JOB_PREFIX = 'job:';
+
 // === メニューに追加 ===
 function onOpen() {
   const ui = SpreadsheetApp.getUi();
   ui.createMenu('📧 Form AI')
       .addItem('🚀 選択行を送信', 'submitSelectedRows')
       .addItem('📊 全件送信', 'submitAllRows')
+      .addItem('📥 結果を今すぐ取得', 'pollJobs')
       .addItem('🔄 ステータスクリア', 'clearStatus')
       .addItem('⚙️ 設定', 'showSettings')
       .addToUi();
@@ -53,7 +64,8 @@ function submitSelectedRows() {
     return;
   }
 
-  submitRows(sheet, startRow, numRows);
+  const count = submitRows(sheet, startRow, numRows, false);
+  ui.alert(`${count}件をキューに登録しました。結果は1分ごとに自動で反映されます`);
 }
 
 /**
@@ -79,115 +91,222 @@ function submitAllRows() {
     return;
   }
 
-  // ステータスが空白の行のみ送信
-  const statusRange = sheet.getRange(2, 3, lastRow - 1, 1);
-  const statusValues = statusRange.getValues();
-
-  let count = 0;
-  for (let i = 0; i < statusValues.length; i++) {
-    if (statusValues[i][0] === '') {
-      const row = i + 2; // ヘッダー分+1、インデックス分+1
-      submitRows(sheet, row, 1);
-      count++;
+  const count = submitRows(sheet, 2, lastRow - 1, true);
+  ui.alert(`${count}件をキューに登録しました。結果は1分ごとに自動で反映されます`);
+}
 
-      // APIレート制限対策: 1件ごとに少し待つ
-      Utilities.sleep(2000);
+/**
+ * 指定された行をジョブキューに登録
+ *
+ * 送信は数分かかることがあり、結果を待つと Apps Script の実行時間
+ * 上限（6分）を超えるため、POST /api/jobs/batch で登録だけ行う。
+ * 登録した行はステータスを「送信中...」、詳細をジョブIDにしておき、
+ * 時間主導トリガーの pollJobs が完了したものから結果を書き込む。
+ *
+ * @return {number} 登録した件数
+ */
+function submitRows(sheet, startRow, numRows, onlyBlank) {
+  const values = sheet.getRange(startRow, 1, numRows, 5).getValues();
+  const output = values.map(row => [row[2], row[3], row[4]]);
+  const backgrounds = sheet.getRange(startRow, 3, numRows, 1).getBackgrounds();
+
+  // 送信対象の行（シート内の位置）とリクエスト
+  const targets = [];
+  const requests = [];
+  values.forEach((row, i) => {
+    const url = row[0];
+    const message = row[1];
+    if (onlyBlank && row[2] !== '') {
+      return;
+    }
+    if (!url || !message) {
+      output[i] = ['エラー', 'URLまたはメッセージが空です', ''];
+      return;
+    }
+    targets.push(i);
+    requests.push({
+      url: String(url),
+      message: String(message),
+      use_complex_model: false  // モデルはフォームの複雑さに応じて自動選択（trueで常に高精度モデル）
+    });
+  });
+
+  let queued = 0;
+  for (let start = 0; start < targets.length; start += ENQUEUE_CHUNK_SIZE) {
+    const chunk = targets.slice(start, start + ENQUEUE_CHUNK_SIZE);
+    try {
+      const jobs = callJobsAPI(requests.slice(start, start + ENQUEUE_CHUNK_SIZE));
+      chunk.forEach((i, n) => {
+        output[i] = [PENDING_LABEL, JOB_PREFIX + jobs[n].id, ''];
+        backgrounds[i][0] = null;
+      });
+      queued += chunk.length;
+    } catch (error) {
+      chunk.forEach(i => {
+        output[i] = ['⚠️ エラー', error.toString(), ''];
+        backgrounds[i][0] = '#f8d7da';
+      });
     }
   }
 
-  SpreadsheetApp.getUi().alert(`${count}件の送信が完了しました`);
+  // 書き込みとトリガー作成は pollJobs のトリガー削除と同じロックの中で行う
+  const lock = LockService.getScriptLock();
+  lock.waitLock(30000);
+  try {
+    sheet.getRange(startRow, 3, numRows, 3).setValues(output);
+    sheet.getRange(startRow, 3, numRows, 1).setBackgrounds(backgrounds);
+    SpreadsheetApp.flush();
+    if (queued > 0) {
+      ensurePollTrigger();
+    }
+  } finally {
+    lock.releaseLock();
+  }
+  return queued;
 }
 
 /**
- * 指定された行のフォームを送信
+ * 完了したジョブの結果をシートに書き込む（1分ごとのトリガーから実行）
+ *
+ * 各シートの「送信中...」の行を GET /api/jobs/{id} で確認し、完了した
+ * ものを fetchAll 1回分ずつ書き込む。POLL_TIME_BUDGET_MS を超えたら
+ * 残りは次回に回し、送信中の行がなくなればトリガーを削除する。
  */
-function submitRows(sheet, startRow, numRows) {
-  for (let i = 0; i < numRows; i++) {
-    const row = startRow + i;
-
-    // データ取得
-    const url = sheet.getRange(row, 1).getValue();
-    const message = sheet.getRange(row, 2).getValue();
-
-    // バリデーション
-    if (!url || !message) {
-      sheet.getRange(row, 3).setValue('エラー');
-      sheet.getRange(row, 4).setValue('URLまたはメッセージが空です');
-      continue;
+function pollJobs() {
+  const started = Date.now();
+  let open = 0;
+  SpreadsheetApp.getActiveSpreadsheet().getSheets().forEach(sheet => {
+    const pending = pendingJobs(sheet);
+    for (let start = 0; start < pending.length; start += POLL_CHUNK_SIZE) {
+      if (Date.now() - started > POLL_TIME_BUDGET_MS) {
+        open += pending.length - start;
+        return;
+      }
+      open += pollChunk(sheet, pending.slice(start, start + POLL_CHUNK_SIZE));
+      SpreadsheetApp.flush();
     }
+  });
 
-    // ステータスを「送信中」に更新
-    sheet.getRange(row, 3).setValue('送信中...');
-    SpreadsheetApp.flush();
-
+  if (open === 0) {
+    // submitRows と同じロックの中で、直前に登録された行がないことを確かめてから止める
+    const lock = LockService.getScriptLock();
+    lock.waitLock(30000);
     try {
-      // APIリクエスト
-      const result = callFormAPI(url, message);
-
-      // 結果を書き込み
-      if (result.status === 'success') {
-        sheet.getRange(row, 3).setValue('✅ 成功');
-        sheet.getRange(row, 3).setBackground('#d4edda');
-      } else if (result.status === 'captcha_detected') {
-        sheet.getRange(row, 3).setValue('🔒 CAPTCHA');
-        sheet.getRange(row, 3).setBackground('#fff3cd');
-      } else if (result.status === 'failed') {
-        sheet.getRange(row, 3).setValue('❌ 失敗');
-        sheet.getRange(row, 3).setBackground('#f8d7da');
-      } else {
-        sheet.getRange(row, 3).setValue('⚠️ エラー');
-        sheet.getRange(row, 3).setBackground('#f8d7da');
+      const stillPending = SpreadsheetApp.getActiveSpreadsheet().getSheets()
+          .some(sheet => pendingJobs(sheet).length > 0);
+      if (!stillPending) {
+        deletePollTrigger();
       }
+    } finally {
+      lock.releaseLock();
+    }
+  }
+}
 
-      sheet.getRange(row, 4).setValue(result.details || result.message);
-
-      // コスト情報
-      if (result.cost_estimate) {
-        sheet.getRange(row, 5).setValue(`$${result.cost_estimate.toFixed(6)}`);
-      }
+/**
+ * シート内の「送信中...」の行とそのジョブID
+ */
+function pendingJobs(sheet) {
+  const lastRow = sheet.getLastRow();
+  if (lastRow <= 1 || sheet.getLastColumn() < 4) {
+    return [];
+  }
+  const pending = [];
+  sheet.getRange(2, 3, lastRow - 1, 2).getValues().forEach((row, i) => {
+    if (row[0] === PENDING_LABEL && String(row[1]).indexOf(JOB_PREFIX) === 0) {
+      pending.push({row: i + 2, id: String(row[1]).slice(JOB_PREFIX.length)});
+    }
+  });
+  return pending;
+}
 
-    } catch (error) {
-      sheet.getRange(row, 3).setValue('⚠️ エラー');
-      sheet.getRange(row, 3).setBackground('#f8d7da');
-      sheet.getRange(row, 4).setValue(error.toString());
+/**
+ * ジョブの状態をまとめて取得し、完了したものを書き込む
+ *
+ * @return {number} まだ完了していないジョブの数
+ */
+function pollChunk(sheet, jobs) {
+  const responses = UrlFetchApp.fetchAll(jobs.map(job => ({
+    url: `${API_BASE_URL}/api/jobs/${job.id}`,
+    muteHttpExceptions: true
+  })));
+  let open = 0;
+  jobs.forEach((job, n) => {
+    const code = responses[n].getResponseCode();
+    if (code === 404) {
+      writeResult(sheet, job.row, ['⚠️ エラー', 'ジョブが見つかりません', ''], '#f8d7da');
+      return;
     }
+    const info = code === 200 ? JSON.parse(responses[n].getContentText()) : null;
+    if (!info || info.state !== 'completed' || !info.result) {
+      open += 1;  // 実行中、またはAPIの一時的なエラー
+      return;
+    }
+    const [label, color] = statusLabel(info.result.status);
+    writeResult(sheet, job.row, [
+      label,
+      info.result.details || info.result.message,
+      info.result.cost_estimate ? `$${info.result.cost_estimate.toFixed(6)}` : ''
+    ], color);
+  });
+  return open;
+}
 
-    SpreadsheetApp.flush();
+function writeResult(sheet, row, values, color) {
+  sheet.getRange(row, 3, 1, 3).setValues([values]);
+  sheet.getRange(row, 3).setBackground(color);
+}
 
-    // レート制限対策
-    if (i < numRows - 1) {
-      Utilities.sleep(2000);
-    }
+/**
+ * ステータスの表示とセルの背景色
+ */
+function statusLabel(status) {
+  if (status === 'success') {
+    return ['✅ 成功', '#d4edda'];
+  } else if (status === 'captcha_detected') {
+    return ['🔒 CAPTCHA', '#fff3cd'];
+  } else if (status === 'failed') {
+    return ['❌ 失敗', '#f8d7da'];
   }
+  return ['⚠️ エラー', '#f8d7da'];
 }
 
 /**
- * Form AI APIを呼び出し
+ * Form AI ジョブAPIにまとめて登録
+ *
+ * @param {Object[]} requests FormSubmissionRequest の配列
+ * @return {Object[]} 入力順の JobInfo（id を含む）
  */
-function callFormAPI(url, message) {
-  const payload = {
-    url: url,
-    message: message,
-    use_complex_model: false  // 複雑なフォームの場合はtrueに変更
-  };
-
+function callJobsAPI(requests) {
   const options = {
     method: 'post',
     contentType: 'application/json',
-    payload: JSON.stringify(payload),
+    payload: JSON.stringify(requests),
     muteHttpExceptions: true
   };
 
-  const response = UrlFetchApp.fetch(API_ENDPOINT, options);
+  const response = UrlFetchApp.fetch(`${API_BASE_URL}/api/jobs/batch`, options);
   const responseCode = response.getResponseCode();
 
-  if (responseCode !== 200) {
+  if (responseCode !== 202) {
     throw new Error(`API Error: ${responseCode} - ${response.getContentText()}`);
   }
-
   return JSON.parse(response.getContentText());
 }
 
+function ensurePollTrigger() {
+  const exists = ScriptApp.getProjectTriggers().some(t => t.getHandlerFunction() === 'pollJobs');
+  if (!exists) {
+    ScriptApp.newTrigger('pollJobs').timeBased().everyMinutes(1).create();
+  }
+}
+
+function deletePollTrigger() {
+  ScriptApp.getProjectTriggers()
+      .filter(t => t.getHandlerFunction() === 'pollJobs')
+      .forEach(t => ScriptApp.deleteTrigger(t));
+}
+
 /**
  * ステータス列をクリア
  */
@@ -223,7 +342,7 @@ function clearStatus() {
  */
 function showSettings() {
   const ui = SpreadsheetApp.getUi();
-  const currentEndpoint = API_ENDPOINT;
+  const currentEndpoint = API_BASE_URL;
 
   const html = `
     <div style="padding: 20px; font-family: Arial, sans-serif;">
@@ -237,7 +356,7 @@ function showSettings() {
       <ol>
         <li>拡張機能 → Apps Script を開く</li>
         <li>Code.gs ファイルを開く</li>
-        <li>上部の API_ENDPOINT を編集</li>
+        <li>上部の API_BASE_URL を編集</li>
         <li>保存</li>
       </ol>
     </div>
@@ -2,7 +2,11 @@
 
 import os
 import sys
+import time
+import signal
 import builtins
+import subprocess
+import threading
 import uvicorn
 
 # Monkey-patch input() to prevent EOF errors in non-interactive environments
@@ -28,6 +32,38 @@ os.environ["PLAYWRIGHT_BROWSERS_PATH"] = os.environ.get("PLAYWRIGHT_BROWSERS_PAT
 os.environ["HEADLESS"] = "true"
 os.environ["BROWSER_HEADLESS"] = "true"
 
+
+def start_workers(count):
+    """Start `count` browser worker processes and restart any that exit"""
+    def spawn():
+        return subprocess.Popen([sys.executable, "-m", "app.worker"], stdin=subprocess.DEVNULL)
+
+    processes = [spawn() for _ in range(count)]
+    stopping = threading.Event()
+
+    def supervise():
+        while not stopping.is_set():
+            for i, process in enumerate(processes):
+                if process.poll() is not None and not stopping.is_set():
+                    print(f"[WARNING] Worker process {process.pid} exited ({process.returncode}); restarting")
+                    processes[i] = spawn()
+            time.sleep(2)
+
+    def stop():
+        stopping.set()
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes:
+            try:
+                process.wait(timeout=int(os.environ.get("JOB_TIMEOUT", "300")))
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    threading.Thread(target=supervise, daemon=True).start()
+    return stop
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("🚀 Starting Form AI Server")
@@ -83,15 +119,26 @@ if __name__ == "__main__":
     print(f"\n🌐 Server Configuration:")
     print(f"   Host: {host}")
     print(f"   Port: {port}")
+    worker_processes = int(os.environ.get("WORKER_PROCESSES", "0"))
+    if worker_processes > 0:
+        print(f"   Browser worker processes: {worker_processes}")
     print("=" * 60)
 
     if not all_set:
         print("\n⚠️  WARNING: Some required environment variables are missing!")
         print("The application may not work correctly.\n")
 
-    uvicorn.run(
-        "app.main:app",
-        host=host,
-        port=port,
-        log_level="info"
-    )
+    # Worker mode: this process only serves the API; jobs run in separate
+    # browser worker processes sharing the SQLite job queue
+    stop_workers = start_workers(worker_processes) if worker_processes > 0 else None
+
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=host,
+            port=port,
+            log_level="info"
+        )
+    finally:
+        if stop_workers is not None:
+            stop_workers()